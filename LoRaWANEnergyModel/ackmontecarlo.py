@@ -0,0 +1,114 @@
+""" Monte Carlo engine for the ACK timeout of the LoRaWAN Energy Model
+LoRaWANEnergyModel.calcAveCurrentAck draws one ACK timeout per
+retransmission from the global random module, so its results change from
+call to call. AckMonteCarlo replays that draw for N independent
+replications in one vectorized pass with its own random generator, and
+reports the mean, variance and confidence interval of the average current
+and of the active time. For the deterministic counterpart construct the
+model with expectedAckTO=True.
+
+Examples:
+	lora = LoRaWANEnergyModel(dr=5, ackmode=1, pl=100, p_c=0.01, t_notif=600000)
+	mc = AckMonteCarlo(lora, seed=1)
+	results = mc.run(1000000)
+	print "Average current is %.6f mA, 95%% CI %s" % (results['aveCurrent']['mean'], results['aveCurrent']['ci'])
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import math
+
+import numpy as np
+
+
+def _normalQuantile(p):
+	"""Inverse of the standard normal distribution function, by bisection on erf"""
+	lo, hi = -40.0, 40.0
+	for _ in xrange(200):
+		mid = (lo+hi)/2.0
+		if .5*(1+math.erf(mid/math.sqrt(2))) < p:
+			lo = mid
+		else:
+			hi = mid
+	return (lo+hi)/2.0
+
+
+class AckMonteCarlo:
+
+	def __init__(self, model, seed=None):
+		"""AckMonteCarlo Initialization
+		Args:
+			model: LoRaWANEnergyModel in acknowledgement mode
+			seed: int seed, numpy RandomState or numpy Generator
+		"""
+		# without acknowledgement there is no ACK timeout to draw
+		assert(model._acknowledgement), "AckMonteCarlo needs a model with ackmode=1"
+		self.model = model
+		if isinstance(seed, np.random.RandomState) or hasattr(seed, 'integers'):
+			self.rng = seed
+		else:
+			self.rng = np.random.RandomState(seed)
+
+
+	def drawAckTimeouts(self, size):
+		"""ACK timeouts (ms), uniform on the integers of [T_ackTOMin, T_ackTOMax]"""
+		p = self.model.profile
+		if hasattr(self.rng, 'integers'):
+			return self.rng.integers(p.T_ackTOMin, p.T_ackTOMax, size=size, endpoint=True)
+		return self.rng.randint(p.T_ackTOMin, p.T_ackTOMax+1, size=size)
+
+
+	def simulate(self, replications):
+		"""Returns the average current (mA) and active time (ms) arrays of the
+		given number of replications of calcAveCurrentAck"""
+		model = self.model
+		numofRetransMax = model.profile.numofRetransMax
+		P_0, I_ok, T_ok, I_ackTO, T_recv2, Q_err, T_err = model.calcRetransTerms()
+
+		k = np.arange(numofRetransMax+1)
+		P_k = ((1-P_0)**k)*P_0
+
+		# one ACK timeout per replication and retransmission, the same timeout
+		# is used for every earlier attempt of a k-retransmission outcome
+		T_wait = self.drawAckTimeouts((replications, numofRetransMax+1)) - T_recv2
+		T_k = T_ok + k*(T_wait+T_err)
+		I_k = (I_ok*T_ok + (k+1)*(I_ackTO*T_wait+Q_err))/T_k
+		I_act = I_k.dot(P_k)
+		T_act = T_k.dot(P_k)
+
+		I_aveAck = (I_act*T_act+model.I_sleep*(model.T_notif-T_act))/model.T_notif
+		return I_aveAck, T_act
+
+
+	def run(self, replications=100000, confidence=.95, chunkSize=2**17):
+		"""Runs the replications in chunks of bounded memory
+		Returns:
+			dict with the 'mean', 'variance' and 'ci' (confidence interval of the
+			mean) of 'aveCurrent' (mA) and 'activeTime' (ms), and 'replications'
+		"""
+		n = 0
+		mean = np.zeros(2)
+		M2 = np.zeros(2)
+		while n < replications:
+			size = min(chunkSize, replications-n)
+			samples = np.array(self.simulate(size))
+			chunkMean = samples.mean(axis=1)
+			chunkM2 = ((samples-chunkMean[:, None])**2).sum(axis=1)
+			# combine the running and the chunk moments
+			delta = chunkMean-mean
+			total = n+size
+			mean = mean + delta*size/float(total)
+			M2 = M2 + chunkM2 + delta**2*n*size/float(total)
+			n = total
+
+		variance = M2/(n-1) if n > 1 else np.zeros(2)
+		z = _normalQuantile(.5+confidence/2.0)
+		halfWidth = z*np.sqrt(variance/n)
+		results = {'replications': n}
+		for i, name in enumerate(('aveCurrent', 'activeTime')):
+			results[name] = {'mean': mean[i],
+							'variance': variance[i],
+							'ci': (mean[i]-halfWidth[i], mean[i]+halfWidth[i])}
+		return results
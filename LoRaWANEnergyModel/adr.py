@@ -0,0 +1,418 @@
+""" LoRaWAN adaptive data rate evaluator
+Replays the data rate decisions of an ADR policy over per-device SNR
+traces, one SNR per uplink, and accounts the energy and airtime of every
+uplink at the data rate it was sent with. A frame whose SNR is below the
+demodulation floor of its data rate (DEMOD_SNR) is not heard by the
+network; in acknowledgement mode it costs every retransmission, without
+acknowledgement a plain transmission, and it delivers nothing.
+
+The costs of one uplink at every data rate, its active charge, active
+time, airtime, transmit charge and data delivered and those of an unheard
+uplink, are computed once per device with LoRaWANBatchModel for all data
+rates (calcDRCosts); the replay only counts the heard and unheard uplinks
+of every device at every data rate, and the totals are the counts times
+the costs. A policy never rebuilds a model when it changes the data rate.
+
+The collision probability of every data rate follows from the pure ALOHA
+load of the heard uplinks of the fleet at that data rate (one cell of
+numofChannels uplink channels, the spreading factors are orthogonal),
+solved like the capacity planner does, unless p_c is given. The models
+clamp P_c to ChipProfile.maxCollisionProbability(); the results report the
+clamped value the costs are computed at, and flag the data rates whose
+fixed point lies above it (collisionLimited).
+
+The same pass counts the unheard uplinks of every fixed data rate, so the
+fixed-DR baselines of the same traces, with the ALOHA load of the whole
+fleet at that data rate, are reported next to the policy.
+
+Policies are objects with start(dr, ackmode), called once with the initial
+data rates, and decide(dr, snr, heard), called after every uplink with
+arrays over the devices, returning the data rate of the next uplink.
+SemtechADR is the network server algorithm with the device side ADR
+backoff, FixedDR keeps the data rates.
+
+Examples:
+	rng = np.random.RandomState(1)
+	trace = SyntheticTrace(rng.uniform(-22, 5, 100000), 8760, seed=1)
+	adr = ADREvaluator(trace, SemtechADR(), pl=20, t_notif=3600000)
+	results = adr.run()
+	print results['lifetime'].mean(), results['baselines']['lifetime'].mean(axis=1)
+	for row in adr.summary(results):
+		print row
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import numpy as np
+
+import airtime
+from capacityplanner import MAX_PL, NUMOF_DRS, calcCollisionProbability
+from lorawanbatch import LoRaWANBatchModel
+
+# (dB) demodulation floor of DR0 to DR5, SF12 down to SF7 at 125 KHz
+DEMOD_SNR = np.array([-20.0, -17.5, -15.0, -12.5, -10.0, -7.5])
+
+COST_FIELDS = ('charge', 'activeTime', 'airtime', 'transmitCharge', 'dataDelivered',
+		'lostCharge', 'lostActiveTime', 'lostAirtime')
+
+
+def calcDRCosts(cr=1, pl=20, t_notif=3600000, ackmode=1, p_c=0, profile='default'):
+	"""Costs of one uplink at every data rate
+	Args:
+		cr, pl, t_notif, ackmode: LoRaWAN settings, scalars or arrays of one value per device
+		p_c: collision probability, scalar or one per data rate
+		profile: chipprofile.ChipProfile or name of a registered one
+	Returns:
+		dict of COST_FIELDS arrays of shape (NUMOF_DRS,) + device shape, charges
+		in mA ms and times in ms, NaN where the payload does not fit the data rate;
+		the lost fields are those of an uplink that is not heard
+	"""
+	pl = np.asarray(pl)
+	dr = np.arange(NUMOF_DRS).reshape((-1,) + (1,)*max(np.ndim(cr), pl.ndim, np.ndim(t_notif), np.ndim(ackmode)))
+	p_c = np.broadcast_to(p_c, (NUMOF_DRS,)).reshape(dr.shape)
+	lora = LoRaWANBatchModel(dr=dr, cr=cr, pl=np.minimum(pl, MAX_PL[dr]), t_notif=t_notif, p_c=p_c,
+				ackmode=ackmode, profile=profile)
+	summary = lora.calcNotificationSummary()
+	P_k, I_k, T_k = lora.calcRetransDistribution()
+	ack = lora._acknowledgement
+	m = lora.profile.numofRetransMax
+
+	# expected transmissions as the model weighs them, and all of them for a frame nobody hears
+	k = np.arange(m+1).reshape((-1,) + (1,)*(P_k.ndim-1))
+	attempts = np.where(ack, ((k+1)*P_k).sum(axis=0), 1.0)
+	lostAttempts = np.where(ack, m+1.0, 1.0)
+	costs = {'charge': summary.Q_active,
+			'activeTime': summary.T_active,
+			'airtime': attempts*lora.T_trans,
+			'transmitCharge': attempts*lora.T_trans*lora.profile.I_trans,
+			'dataDelivered': summary.dataDelivered,
+			'lostCharge': np.where(ack, I_k[m]*T_k[m], summary.Q_active),
+			'lostActiveTime': np.where(ack, T_k[m], summary.T_active),
+			'lostAirtime': lostAttempts*lora.T_trans}
+	fits = pl <= MAX_PL[dr]
+	return dict((field, np.where(fits, np.broadcast_to(costs[field], fits.shape), np.nan)) for field in COST_FIELDS)
+
+
+class ADRPolicy(object):
+	"""Base of the ADR policies, decides the data rate of every device after
+	each of its uplinks"""
+
+	def start(self, dr, ackmode):
+		"""Called once before the replay with the initial data rates and the
+		acknowledgement mode of the devices"""
+		pass
+
+	def decide(self, dr, snr, heard):
+		"""Returns the data rates of the next uplink
+		Args:
+			dr: data rates of the uplink
+			snr: SNR of the uplink (dB)
+			heard: True where the network received the uplink
+		"""
+		raise NotImplementedError
+
+
+class FixedDR(ADRPolicy):
+	"""Keeps the initial data rates"""
+
+	def decide(self, dr, snr, heard):
+		return dr
+
+
+class SemtechADR(ADRPolicy):
+
+	def __init__(self, margin=10.0, history=20, step=3.0, maxDR=5, ackLimit=64, ackDelay=32):
+		"""SemtechADR Initialization
+		The network raises the data rate by one per step dB of the margin of
+		the best SNR of the last history heard uplinks above the demodulation
+		floor and the installation margin, once history uplinks are heard. A
+		device lowers its data rate by one after ackLimit+ackDelay uplinks
+		without a downlink and again every ackDelay uplinks; acknowledged
+		uplinks, data rate changes and, after ackLimit uplinks, any heard
+		uplink bring a downlink.
+		Args:
+			margin: installation margin (dB)
+			history: heard uplinks the best SNR is taken from
+			step: margin per data rate step (dB)
+			maxDR: highest data rate the network assigns
+			ackLimit, ackDelay: ADR_ACK_LIMIT and ADR_ACK_DELAY of the devices
+		"""
+		self.margin = margin
+		self.history = history
+		self.step = step
+		self.maxDR = maxDR
+		self.ackLimit = ackLimit
+		self.ackDelay = ackDelay
+
+	def start(self, dr, ackmode):
+		n = len(dr)
+		self.ack = np.broadcast_to(ackmode, (n,)).astype(bool)
+		self.snr = np.full((n, self.history), -np.inf)
+		self.bestSNR = np.full(n, -np.inf)
+		self.heardCount = np.zeros(n, np.int64)
+		self.ackCount = np.zeros(n, np.int64)
+
+	def decide(self, dr, snr, heard):
+		devices = np.flatnonzero(heard)
+		slots = self.heardCount[devices] % self.history
+		evicted = self.snr[devices, slots]
+		received = snr[devices]
+		self.snr[devices, slots] = received
+		self.heardCount[devices] += 1
+		# running best SNR of the history, searched again only where the best leaves it
+		best = self.bestSNR[devices]
+		self.bestSNR[devices] = np.maximum(best, received)
+		again = devices[(evicted >= best) & (received < best)]
+		self.bestSNR[again] = self.snr[again].max(axis=1)
+
+		# network side, for the heard uplinks of devices with a full history
+		devices = devices[self.heardCount[devices] >= self.history]
+		nextDR = dr.copy()
+		nStep = np.floor((self.bestSNR[devices] - DEMOD_SNR[dr[devices]] - self.margin)/self.step)
+		nextDR[devices] = np.minimum(dr[devices] + np.maximum(nStep, 0).astype(int), np.maximum(self.maxDR, dr[devices]))
+
+		# device side backoff
+		downlink = (heard & (self.ack | (self.ackCount + 1 >= self.ackLimit))) | (nextDR != dr)
+		self.ackCount += 1
+		self.ackCount[downlink] = 0
+		backoff = np.flatnonzero(self.ackCount >= self.ackLimit + self.ackDelay)
+		backoff = backoff[(self.ackCount[backoff] - self.ackLimit) % self.ackDelay == 0]
+		nextDR[backoff] = np.maximum(nextDR[backoff] - 1, 0)
+		return nextDR
+
+
+class ArrayTrace(object):
+	"""SNR trace of an array of shape (numofDevices, numofUplinks) (dB), a
+	numpy.memmap streams it from disk"""
+
+	def __init__(self, snr):
+		self.snr = snr
+		self.numofDevices, self.numofUplinks = snr.shape
+
+	def read(self, start, stop):
+		"""Returns the SNR of the uplinks start to stop, shape (stop-start, numofDevices)"""
+		return np.ascontiguousarray(self.snr[:, start:stop].T, dtype=float)
+
+
+class SyntheticTrace(object):
+	"""SNR trace around a mean SNR per device, with AR(1) shadowing of the
+	given correlation between consecutive uplinks and independent fading
+	per uplink; the uplinks are generated block by block as they are read"""
+
+	def __init__(self, meanSNR, numofUplinks, shadowing=4.0, correlation=.95, fading=2.0, seed=None):
+		"""SyntheticTrace Initialization
+		Args:
+			meanSNR: mean SNR of every device (dB)
+			numofUplinks: uplinks of every device
+			shadowing: standard deviation of the shadowing (dB)
+			correlation: correlation of the shadowing of consecutive uplinks
+			fading: standard deviation of the fading (dB)
+			seed: random seed, the same seed gives the same trace
+		"""
+		self.meanSNR = np.asarray(meanSNR, dtype=float).ravel()
+		self.numofDevices = len(self.meanSNR)
+		self.numofUplinks = numofUplinks
+		self.shadowing = shadowing
+		self.correlation = correlation
+		self.fading = fading
+		self.seed = seed
+		self._next = None
+
+	def read(self, start, stop):
+		"""Returns the SNR of the uplinks start to stop, shape (stop-start,
+		numofDevices); reads continue where the last one stopped or restart at 0"""
+		if start == 0:
+			self._rng = np.random.RandomState(self.seed)
+			self._state = self._rng.standard_normal(self.numofDevices)
+		else:
+			assert start == self._next, "a synthetic trace is read in order"
+		innovation = np.sqrt(1 - self.correlation**2)
+		snr = self._rng.standard_normal((stop - start, self.numofDevices))
+		state = self._state
+		for row in snr:
+			state = self.correlation*state + innovation*row
+			row[:] = state
+		self._state = state
+		self._next = stop
+		snr *= self.shadowing
+		snr += self.meanSNR
+		snr += self.fading*self._rng.standard_normal(snr.shape)
+		return snr
+
+
+class ADREvaluator:
+
+	def __init__(self, trace, policy, dr=0, cr=1, pl=20, t_notif=3600000, ackmode=1, p_c=None,
+			numofChannels=None, maxDR=5, blockLength=256, profile='default'):
+		"""ADREvaluator Initialization
+		Args:
+			trace: SNR trace, with numofDevices, numofUplinks and read(start, stop)
+			policy: ADRPolicy
+			dr: initial data rates
+			cr, pl, t_notif, ackmode: LoRaWAN settings, scalars or arrays of one value per device
+			p_c: collision probability, scalar or one per data rate; from the ALOHA load if None
+			numofChannels: number of uplink channels, numof125KHzChannels by default
+			maxDR: highest data rate a device uses
+			blockLength: uplinks read from the trace at once
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.trace = trace
+		self.policy = policy
+		n = trace.numofDevices
+		self.initialDR = np.broadcast_to(dr, (n,)).astype(int)
+		self.CR = np.broadcast_to(cr, (n,)).astype(int)
+		self.PL = np.broadcast_to(pl, (n,))
+		self.T_notif = np.broadcast_to(t_notif, (n,))*1.0
+		self.ackmode = np.broadcast_to(ackmode, (n,)).astype(int)
+		self.P_c = p_c
+		self.profile = LoRaWANBatchModel(profile=profile).profile
+		self.numofChannels = int(numofChannels or self.profile.numof125KHzChannels)
+		self.maxDR = maxDR
+		self.blockLength = blockLength
+
+		# lowest data rate that carries the payload of every device
+		self.minDR = np.searchsorted(MAX_PL, self.PL)
+		assert np.all(self.minDR <= maxDR), "payload above the maximum of DR %d" % maxDR
+		self._T_trans = np.empty((NUMOF_DRS, n))
+		for dr in range(NUMOF_DRS):
+			self._T_trans[dr] = airtime.lookupArrays(dr, self.CR, np.minimum(self.PL, MAX_PL[dr]),
+					self.profile.CRC, self.profile.numofPreambleSymbols)['T_trans']
+		BER = self.profile.BER
+		self.P_frameOk = (1-BER)**(np.asarray(self.PL, float) + 13 + 4.5)*np.where(self.ackmode, (1-BER)**14.5, 1.0)
+
+
+	def replay(self):
+		"""Replays the policy over the trace
+		Returns:
+			heard and unheard uplinks of every data rate and device, shape
+			(NUMOF_DRS, numofDevices), the unheard uplinks of every fixed data
+			rate, same shape, and the data rate changes of every device
+		"""
+		n = self.trace.numofDevices
+		numofUplinks = self.trace.numofUplinks
+		devices = np.arange(n)
+		# heard and unheard counts interleaved, flat index (2*dr + unheard)*n + device
+		counts = np.zeros((2*NUMOF_DRS, n), np.int64)
+		flat = counts.ravel()
+		# uplinks of every device by the number of data rates whose floor they reach,
+		# an uplink is heard at the data rates below that number
+		levels = np.zeros((NUMOF_DRS+1, n), np.int64)
+		changes = np.zeros(n, np.int64)
+
+		dr = np.clip(self.initialDR, self.minDR, self.maxDR)
+		self.policy.start(dr.copy(), self.ackmode)
+		for start in range(0, numofUplinks, self.blockLength):
+			block = self.trace.read(start, min(start + self.blockLength, numofUplinks))
+			for snr in block:
+				level = np.searchsorted(DEMOD_SNR, snr, 'right')
+				levels.ravel()[level*n + devices] += 1
+				unheard = dr >= level
+				flat[(2*dr + unheard)*n + devices] += 1
+				nextDR = np.clip(self.policy.decide(dr, snr, ~unheard), self.minDR, self.maxDR)
+				changes += nextDR != dr
+				dr = nextDR
+		return counts[0::2], counts[1::2], levels.cumsum(axis=0)[:NUMOF_DRS], changes
+
+	def calcCollisionProbability(self, heard):
+		"""Collision probability of every data rate from the ALOHA load of the
+		heard uplinks, counts of shape (NUMOF_DRS, numofDevices)"""
+		duration = self.trace.numofUplinks*self.T_notif
+		weight = heard*self._T_trans/duration/self.numofChannels
+		load = weight.sum(axis=1)
+		retrans = np.where(self.ackmode == 1, weight, 0)
+		frameOk = (retrans*self.P_frameOk).sum(axis=1)/np.maximum(retrans.sum(axis=1), 1e-300)
+		ackShare = retrans.sum(axis=1)/np.maximum(load, 1e-300)
+		return calcCollisionProbability(load, frameOk, ackShare, self.profile.numofRetransMax)
+
+	def _totals(self, heard, unheard, costs):
+		"""Charge, times and data of the counted uplinks, per data rate"""
+		def total(count, cost):
+			return np.where(count > 0, count*cost, 0)
+		return {'charge': total(heard, costs['charge']) + total(unheard, costs['lostCharge']),
+				'activeTime': total(heard, costs['activeTime']) + total(unheard, costs['lostActiveTime']),
+				'airtime': total(heard, costs['airtime']) + total(unheard, costs['lostAirtime']),
+				'transmitCharge': total(heard, costs['transmitCharge']) +\
+						total(unheard, costs['lostAirtime']*self.profile.I_trans),
+				'dataDelivered': total(heard, costs['dataDelivered'])}
+
+	def _results(self, totals):
+		p = self.profile
+		numofUplinks = self.trace.numofUplinks
+		duration = numofUplinks*self.T_notif
+		charge = totals['charge'] + p.I_sleep*(duration - totals['activeTime'])
+		I_ave = charge/duration
+		return {'aveCurrent': I_ave,
+				'lifetime': p.battery/I_ave/24.0/365.0,
+				'energyperBit': charge*p.voltage/totals['dataDelivered']/1000.0/8.0,
+				'airtime': totals['airtime'],
+				'dutyCycle': totals['airtime']/duration,
+				'transmitShare': totals['transmitCharge']/charge,
+				'deliveryRatio': totals['dataDelivered']/(numofUplinks*self.PL)}
+
+	def run(self):
+		"""Replays the policy and evaluates it and the fixed-DR baselines
+		Returns:
+			dict of per device arrays of the policy, lifetime (years), aveCurrent
+			(mA), energyperBit, airtime (ms), dutyCycle, transmitShare,
+			deliveryRatio and drChanges, the share of the uplinks (drShare),
+			collisionProbability, clamped to the limit of the models, and
+			collisionLimited, True where the fixed point lies above it, of every
+			data rate, and baselines, a dict of the same arrays for every fixed
+			data rate, shape (NUMOF_DRS, numofDevices), NaN where the payload
+			does not fit
+		"""
+		heard, unheard, fixedUnheard, changes = self.replay()
+		numofUplinks = self.trace.numofUplinks
+		fixedHeard = numofUplinks - fixedUnheard
+		if self.P_c is None:
+			P_c = self.calcCollisionProbability(heard)
+			fixedP_c = self.calcCollisionProbability(np.where(self.PL <= MAX_PL[:, None], fixedHeard, 0))
+		else:
+			P_c = fixedP_c = np.broadcast_to(self.P_c, (NUMOF_DRS,))*1.0
+		limit = self.profile.maxCollisionProbability()
+		limited, fixedLimited = P_c > limit, fixedP_c > limit
+		P_c, fixedP_c = np.minimum(P_c, limit), np.minimum(fixedP_c, limit)
+
+		costs = calcDRCosts(self.CR, self.PL, self.T_notif, self.ackmode, P_c, self.profile)
+		totals = dict((name, value.sum(axis=0)) for name, value in self._totals(heard, unheard, costs).items())
+		results = self._results(totals)
+		results['drChanges'] = changes
+		results['drShare'] = (heard + unheard).sum(axis=1)/float(numofUplinks*len(changes))
+		results['collisionProbability'] = P_c
+		results['collisionLimited'] = limited
+
+		fixedCosts = calcDRCosts(self.CR, self.PL, self.T_notif, self.ackmode, fixedP_c, self.profile)
+		baselines = self._results(self._totals(fixedHeard, fixedUnheard, fixedCosts))
+		fits = self.PL <= MAX_PL[:, None]
+		results['baselines'] = dict((name, np.where(fits, value, np.nan)) for name, value in baselines.items())
+		results['baselines']['collisionProbability'] = fixedP_c
+		results['baselines']['collisionLimited'] = fixedLimited
+		return results
+
+	def summary(self, results):
+		"""Returns one row for the policy and one for every fixed data rate
+		with the mean and 10th percentile lifetime, the mean airtime per
+		uplink and delivery ratio, and for the baselines the mean ratio of the
+		policy's lifetime and airtime to theirs; collisionLimited is True where
+		uplinks are sent at a data rate whose fixed point lies above the limit"""
+		numofUplinks = self.trace.numofUplinks
+		def row(name, values, P_c, limited):
+			return {'scenario': name,
+					'meanLifetime': np.nanmean(values['lifetime']),
+					'p10Lifetime': np.nanpercentile(values['lifetime'], 10),
+					'airtimeperUplink': np.nanmean(values['airtime'])/numofUplinks,
+					'deliveryRatio': np.nanmean(values['deliveryRatio']),
+					'collisionProbability': P_c,
+					'collisionLimited': bool(limited)}
+		rows = [row('adr', results, np.dot(results['drShare'], results['collisionProbability']),
+				np.any(results['collisionLimited'] & (results['drShare'] > 0)))]
+		baselines = results['baselines']
+		for dr in range(self.maxDR + 1):
+			values = dict((name, value[dr]) for name, value in baselines.items())
+			rows.append(row('DR%d' % dr, values, baselines['collisionProbability'][dr],
+					baselines['collisionLimited'][dr]))
+			rows[-1]['lifetimeRatio'] = np.nanmean(results['lifetime']/values['lifetime'])
+			rows[-1]['airtimeRatio'] = np.nanmean(results['airtime']/values['airtime'])
+		return rows
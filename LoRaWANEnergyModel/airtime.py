@@ -0,0 +1,117 @@
+""" LoRa airtime table
+Symbol counts and frame, preamble and receive window timings only depend
+on DR, CR, payload size and the radio configuration (CRC, preamble
+length), so they are computed once for every DR 0-6, CR 1-4 and payload
+0-242 bytes and stored as one float array of shape (7, 4, 243, FIELDS).
+The table is saved under AIRTIME_DIR and opened memory-mapped, so worker
+processes share the pages instead of rebuilding it. A table only depends
+on the CRC and numofPreambleSymbols of the profile, which key it; the ACK
+receive windows T_txMin are read from the profile by the models. The
+batch models look their timings up here, the scalar LoRaWANEnergyModel
+computes the same closed form in pure Python and does not load numpy.
+
+Examples:
+	table = getTable(CRC=1, numofPreambleSymbols=8.0)
+	print table[5, 0, 20, FIELDS.index('T_trans')]
+	print lookup(5, 1, 20)['T_trans']
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+import config
+from lorawanenergymodel import MAX_PL
+
+FIELDS = ('numofMessageSymbols', 'timeperSymbol', 'timeofPreamble', 'timeofMessage',
+		'T_trans', 'T_recv1', 'T_delay2', 'T_recv2')
+VERSION = 2
+
+AIRTIME_DIR = os.environ.get('LORAWAN_AIRTIME_DIR',
+		os.path.join(os.path.expanduser('~'), '.cache', 'lorawanenergymodel'))
+
+_tables = {}
+
+
+def calcSFandBW(dr):
+	"""Spreading factor and bandwidth (KHz) of the EU data rates"""
+	dr = np.asarray(dr)
+	return np.where(dr <= 5, 12 - dr, 7), np.where(dr <= 5, 125.0, 250.0)
+
+def calcAirtime(dr, cr, pl, CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	"""Evaluates the airtime fields for broadcast dr, cr and pl arrays
+	Returns:
+		float array with the FIELDS along the last axis
+	"""
+	SF, BW = calcSFandBW(dr)
+	DE = (SF > 10).astype(int)  # drift correction is used for SF 11 and 12
+	numofRecvSymbols = np.where(DE, 8, 12)
+	physicalPL = np.asarray(pl) + 13
+
+	numofMessageSymbols = 8 + np.maximum(np.ceil((28+8*physicalPL+16*\
+							CRC-4*SF)/(4.0*(SF-2*DE)))*(np.asarray(cr)+4), 0)
+	timeperSymbol = np.power(2.0, SF)/BW
+	timeofPreamble = (numofPreambleSymbols+4.25)*timeperSymbol
+	timeofMessage = numofMessageSymbols*timeperSymbol
+	T_recv1 = timeperSymbol*numofRecvSymbols
+
+	return np.stack(np.broadcast_arrays(numofMessageSymbols, timeperSymbol, timeofPreamble, timeofMessage,
+			timeofMessage+timeofPreamble, T_recv1, 1000 - T_recv1,
+			(np.power(2.0, SF)+32)/BW), axis=-1)
+
+def buildTable(CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	dr, cr, pl = np.ix_(np.arange(7), np.arange(1, 5), np.arange(max(MAX_PL)+1))
+	return calcAirtime(dr, cr, pl, CRC, numofPreambleSymbols)
+
+
+def tablePath(CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	key = repr((VERSION, CRC, float(numofPreambleSymbols)))
+	return os.path.join(AIRTIME_DIR, 'airtime-%s.npy' % hashlib.sha1(key).hexdigest()[:16])
+
+def getTable(CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	"""Returns the airtime table of a radio configuration, memory-mapped from
+	AIRTIME_DIR. It is built and saved on first use; if the directory is not
+	writable the table is kept in memory only."""
+	key = (CRC, float(numofPreambleSymbols))
+	if key not in _tables:
+		path = tablePath(CRC, numofPreambleSymbols)
+		if not os.path.exists(path):
+			table = buildTable(CRC, numofPreambleSymbols)
+			try:
+				if not os.path.isdir(AIRTIME_DIR):
+					os.makedirs(AIRTIME_DIR)
+				# concurrent builders each write their own file and rename it in place
+				fd, tmpPath = tempfile.mkstemp(dir=AIRTIME_DIR, suffix='.npy')
+				with os.fdopen(fd, 'wb') as f:
+					np.save(f, table)
+				os.rename(tmpPath, path)
+			except (IOError, OSError):
+				_tables[key] = table
+				return table
+		_tables[key] = np.load(path, mmap_mode='r')
+	return _tables[key]
+
+def lookup(dr, cr, pl, CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	"""Returns the airtime fields of one configuration as a dict of floats,
+	from the table for integral payloads and computed otherwise"""
+	if pl == int(pl) and 0 <= pl <= max(MAX_PL):
+		row = getTable(CRC, numofPreambleSymbols)[dr, cr-1, int(pl)]
+	else:
+		row = calcAirtime(dr, cr, pl, CRC, numofPreambleSymbols)
+	return dict(zip(FIELDS, row.tolist()))
+
+def lookupArrays(dr, cr, pl, CRC=config.CRC, numofPreambleSymbols=config.numofPreambleSymbols):
+	"""Returns the airtime fields of broadcast dr, cr and pl arrays as a dict
+	of arrays, from the table if every payload is integral"""
+	dr, cr, pl = np.broadcast_arrays(dr, cr, pl)
+	if np.all((pl == np.floor(pl)) & (pl >= 0) & (pl <= max(MAX_PL))):
+		rows = getTable(CRC, numofPreambleSymbols)[dr.astype(int), cr.astype(int)-1, pl.astype(int)]
+	else:
+		rows = calcAirtime(dr, cr, pl, CRC, numofPreambleSymbols)
+	return dict((field, rows[..., i]) for i, field in enumerate(FIELDS))
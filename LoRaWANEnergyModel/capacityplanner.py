@@ -0,0 +1,321 @@
+""" LoRaWAN multi-gateway capacity planner
+Plans a deployment of many gateways and devices with their own payload,
+coding rate and notification period. Every device is assigned to its
+nearest gateway through a grid index of the gateways and gets the
+fastest data rate whose range covers that distance (DR_RANGES). The
+offered load of a gateway is the sum of T_trans/T_notif of its devices,
+per data rate since the spreading factors are orthogonal, spread over
+the uplink channels and multiplied by the expected number of attempts of
+the acknowledgement mode. The pure ALOHA collision probability of that
+load, 1-exp(-2G), is found as a fixed point, the lowest root of every
+gateway and data rate bracketed and bisected to machine precision, and
+fed back into the lifetime and energy per bit of every device through
+LoRaWANBatchModel. The models clamp the collision probability to
+ChipProfile.maxCollisionProbability(); the devices and the summary report
+the clamped value the costs are computed at, and the summary counts the
+gateways and data rates whose fixed point lies above it.
+
+Adding or removing a gateway only reassigns the devices that move, and
+only the devices of the gateways whose load changed are evaluated again.
+
+Every device is heard by its nearest gateway only; frames of devices
+assigned to a neighbouring gateway do not interfere.
+
+Examples:
+	rng = np.random.RandomState(1)
+	planner = CapacityPlanner(rng.uniform(0, 50000, (1000000, 2)), rng.uniform(0, 50000, (500, 2)),
+			pl=rng.randint(10, 51, 1000000), t_notif=rng.uniform(6e5, 6e6, 1000000))
+	print planner.summary()
+	g = planner.addGateway((25000, 25000))
+	planner.removeGateway(g)
+	print planner.lifetime[planner.served].mean()
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import numpy as np
+
+import airtime
+import lorawanenergymodel
+from lorawanbatch import LoRaWANBatchModel
+
+# (m) range of each data rate, DR5 down to DR0; illustrative suburban values,
+# replace them with the link budget of the deployment
+DR_RANGES = ((5, 2000.0), (4, 2800.0), (3, 4000.0), (2, 5600.0), (1, 7900.0), (0, 11000.0))
+NUMOF_DRS = 6
+# max PL bytes of DR0 to DR5
+MAX_PL = np.array(lorawanenergymodel.MAX_PL[:NUMOF_DRS])
+
+
+def _collisionResidual(P_c, load, frameOk, ackShare, m):
+	# expected attempts 1+q+...+q**m of an acknowledged frame lost with probability q
+	q = 1 - (1-P_c)*frameOk
+	attempts = np.ones(np.shape(q))
+	for _ in range(m):
+		attempts = 1 + q*attempts
+	return -np.expm1(-2*load*(1 - ackShare + ackShare*attempts)) - P_c
+
+def calcCollisionProbability(load, frameOk, ackShare, numofRetransMax, numofPoints=32):
+	"""Pure ALOHA collision probability of an offered load per channel
+	without retransmissions, solving the fixed point G = G_0*attempts(1-exp(-2G))
+	for every element on its own. The right side grows with P_c, so the lowest
+	fixed point lies between the collision probability of the first attempts
+	alone and that of every attempt used; the first sign change of the residual
+	on numofPoints points of that bracket is bisected to machine precision.
+	Args:
+		load: offered load per channel of the first attempts
+		frameOk: frame success without collisions of the acknowledged frames
+		ackShare: share of the load sent in acknowledgement mode
+		numofRetransMax: retransmission limit of the acknowledged frames
+		numofPoints: points the bracket is searched on for the first root
+	"""
+	m = numofRetransMax
+	load, frameOk, ackShare = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (load, frameOk, ackShare)])
+	lo = -np.expm1(-2*load)
+	hi = -np.expm1(-2*load*(1 - ackShare + ackShare*(m+1)))
+	grid = lo + (hi - lo)*np.linspace(0, 1, numofPoints+1).reshape((-1,) + (1,)*load.ndim)
+	residual = _collisionResidual(grid, load, frameOk, ackShare, m)
+	# the residual is >= 0 at lo and <= 0 at hi up to rounding
+	first = np.argmax(np.concatenate([residual[1:] <= 0, np.ones((1,) + load.shape, bool)]), axis=0)
+	a = np.take_along_axis(grid, first[None], 0)[0]
+	b = np.take_along_axis(grid, np.minimum(first+1, numofPoints)[None], 0)[0]
+	for _ in range(64):
+		c = (a + b)/2
+		if not np.any((a < c) & (c < b)):
+			break
+		above = _collisionResidual(c, load, frameOk, ackShare, m) > 0
+		a = np.where(above, c, a)
+		b = np.where(above, b, c)
+	return (a + b)/2
+
+
+class GatewayIndex:
+	"""Uniform grid of gateway positions for nearest gateway queries"""
+
+	def __init__(self, xy, active=None, cellSize=None):
+		"""GatewayIndex Initialization
+		Args:
+			xy: gateway coordinates (m), shape (numofGateways, 2)
+			active: bool mask of the gateways to index, all by default
+			cellSize: grid cell (m), by default about one gateway per cell
+		"""
+		self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+		indices = np.arange(len(self.xy)) if active is None else np.flatnonzero(active)
+		if cellSize is None:
+			extent = np.ptp(self.xy[indices], axis=0).max() if len(indices) > 1 else 1.0
+			cellSize = max(extent/np.sqrt(max(len(indices), 1)), 1.0)
+		self.cellSize = float(cellSize)
+		cells = np.floor(self.xy[indices]/self.cellSize).astype(np.int64)
+		self.origin = cells.min(axis=0) if len(indices) else np.zeros(2, np.int64)
+		self.shape = (cells.max(axis=0) - self.origin + 1) if len(indices) else np.ones(2, np.int64)
+		keys = self._key(cells)
+		order = np.argsort(keys, kind='mergesort')
+		self.gateways = indices[order]
+		self.keys, self.starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+		self.counts = counts
+		self.maxOccupancy = counts.max() if len(counts) else 0
+
+	def _key(self, cells):
+		cells = cells - self.origin
+		return cells[..., 0]*self.shape[1] + cells[..., 1]
+
+	def nearest(self, points, maxDistance=np.inf):
+		"""Returns the index of the nearest indexed gateway of every point and
+		its distance (m); -1 and inf where none is within maxDistance"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		n = len(points)
+		best = np.full(n, -1, np.int64)
+		distance = np.full(n, np.inf)
+		if len(self.gateways) == 0:
+			return best, distance
+		cells = np.floor(points/self.cellSize).astype(np.int64)
+		pending = np.arange(n)
+		# rings of cells around the cell of a point, a gateway of ring r+1 is
+		# at least r cells away, so a point is done once its best is within that
+		maxRing = int(np.ceil(min(maxDistance/self.cellSize, self.shape.max() + np.abs(cells - self.origin).max()))) + 1
+		for ring in range(maxRing + 1):
+			offsets = [(dx, dy) for dx in range(-ring, ring+1) for dy in range(-ring, ring+1)
+					if max(abs(dx), abs(dy)) == ring]
+			for dx, dy in offsets:
+				cell = cells[pending] + (dx, dy)
+				inside = np.all((cell >= self.origin) & (cell < self.origin + self.shape), axis=1)
+				key = self._key(cell)
+				slot = np.minimum(np.searchsorted(self.keys, key), len(self.keys) - 1)
+				found = inside & (self.keys[slot] == key)
+				for j in range(self.maxOccupancy):
+					hit = found & (self.counts[slot] > j)
+					if not hit.any():
+						break
+					who = pending[hit]
+					gateway = self.gateways[self.starts[slot[hit]] + j]
+					d = np.hypot(*(points[who] - self.xy[gateway]).T)
+					closer = d < distance[who]
+					best[who[closer]] = gateway[closer]
+					distance[who[closer]] = d[closer]
+			done = distance[pending] <= min(ring*self.cellSize, maxDistance)
+			pending = pending[~done]
+			if len(pending) == 0:
+				break
+		outside = distance > maxDistance
+		best[outside] = -1
+		distance[outside] = np.inf
+		return best, distance
+
+
+class CapacityPlanner:
+
+	def __init__(self, devices, gateways, cr=1, pl=20, t_notif=3600000, ackmode=1, drRanges=DR_RANGES,
+			numofChannels=None, cellSize=None, profile='default'):
+		"""CapacityPlanner Initialization
+		Args:
+			devices: device coordinates (m), shape (numofDevices, 2)
+			gateways: gateway coordinates (m), shape (numofGateways, 2)
+			cr, pl, t_notif, ackmode: LoRaWAN settings, scalars or arrays of one value per device
+			drRanges: (dr, range in m) pairs, fastest data rate first
+			numofChannels: number of uplink channels, numof125KHzChannels by default
+			cellSize: grid cell of the gateway index (m)
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.devices = np.asarray(devices, dtype=float).reshape(-1, 2)
+		n = len(self.devices)
+		self.CR = np.broadcast_to(cr, (n,)).astype(int)
+		self.PL = np.broadcast_to(pl, (n,))
+		self.T_notif = np.broadcast_to(t_notif, (n,))*1.0
+		self.ackmode = np.broadcast_to(ackmode, (n,)).astype(int)
+		self.profile = LoRaWANBatchModel(profile=profile).profile
+		self.numofChannels = int(numofChannels or self.profile.numof125KHzChannels)
+		self.drOrder = np.array([dr for dr, _ in drRanges])
+		self.ranges = np.array([distance for _, distance in drRanges])
+		self.cellSize = cellSize
+
+		# per device airtime of every data rate and the frame success without collisions
+		self._T_trans = np.empty((NUMOF_DRS, n))
+		for dr in range(NUMOF_DRS):
+			fits = self.PL <= MAX_PL[dr]
+			self._T_trans[dr] = np.where(fits, airtime.lookupArrays(dr, self.CR, np.minimum(self.PL, MAX_PL[dr]),
+					self.profile.CRC, self.profile.numofPreambleSymbols)['T_trans'], np.nan)
+		BER = self.profile.BER
+		self.P_frameOk = (1-BER)**(np.asarray(self.PL, float) + 13 + 4.5)*np.where(self.ackmode, (1-BER)**14.5, 1.0)
+
+		self.gatewayXY = np.asarray(gateways, dtype=float).reshape(-1, 2)
+		self.active = np.ones(len(self.gatewayXY), bool)
+		self.gateway = np.full(n, -1, np.int64)
+		self.distance = np.full(n, np.inf)
+		self.DR = np.full(n, -1, np.int64)
+		self.P_c = np.zeros(n)
+		self.lifetime = np.full(n, np.nan)
+		self.energyperBit = np.full(n, np.nan)
+
+		self._buildIndex()
+		self._assign(np.arange(n))
+		self._update(None)
+
+
+	def _buildIndex(self):
+		self.index = GatewayIndex(self.gatewayXY, self.active, self.cellSize)
+
+	def _assign(self, devices):
+		"""Nearest active gateway and data rate of some devices"""
+		self.gateway[devices], self.distance[devices] = self.index.nearest(self.devices[devices], self.ranges.max())
+		self._setDR(devices)
+
+	def _setDR(self, devices):
+		step = np.searchsorted(self.ranges, self.distance[devices])
+		dr = np.where(step < len(self.drOrder), self.drOrder[np.minimum(step, len(self.drOrder) - 1)], -1)
+		fits = (dr >= 0) & (self.PL[devices] <= MAX_PL[np.maximum(dr, 0)])
+		self.DR[devices] = np.where(fits, dr, -1)
+
+	@property
+	def served(self):
+		"""True for devices in range of a gateway at a data rate that carries their payload"""
+		return self.DR >= 0
+
+	def _buckets(self):
+		served = self.served
+		bucket = np.where(served, self.gateway*NUMOF_DRS + self.DR, 0)
+		return served, bucket, len(self.gatewayXY)*NUMOF_DRS
+
+	def calcLoad(self):
+		"""Returns the offered load per channel without retransmissions, the
+		collision probability fixed point, not clamped, and the number of
+		devices of every gateway and data rate, arrays of shape (numofGateways, 6)"""
+		served, bucket, size = self._buckets()
+		T_trans = self._T_trans[np.maximum(self.DR, 0), np.arange(len(self.DR))]
+		weight = np.where(served, T_trans/self.T_notif/self.numofChannels, 0)
+		load = np.bincount(bucket, weight, size)
+		# load weighted frame success and retransmission share of the buckets
+		retrans = np.where(served & (self.ackmode == 1), weight, 0)
+		frameOk = np.bincount(bucket, retrans*self.P_frameOk, size)/np.maximum(np.bincount(bucket, retrans, size), 1e-300)
+		ackShare = np.bincount(bucket, retrans, size)/np.maximum(load, 1e-300)
+		P_c = calcCollisionProbability(load, frameOk, ackShare, self.profile.numofRetransMax)
+		devices = np.bincount(bucket, served, size)
+		shape = (len(self.gatewayXY), NUMOF_DRS)
+		return load.reshape(shape), P_c.reshape(shape), devices.reshape(shape)
+
+	def _update(self, changed):
+		"""Recomputes the loads and evaluates the devices whose collision
+		probability or data rate changed, of the devices changed or all"""
+		_, P_c, _ = self.calcLoad()
+		served, bucket, _ = self._buckets()
+		P_c = np.minimum(P_c, self.profile.maxCollisionProbability())
+		P_c = np.where(served, P_c.ravel()[bucket], np.nan)
+		stale = ~np.isclose(P_c, self.P_c, rtol=1e-12, atol=0) | (np.isnan(self.lifetime) == served)
+		if changed is not None:
+			stale[changed] = True
+		self.P_c = P_c
+		devices = np.flatnonzero(stale & served)
+		unserved = np.flatnonzero(stale & ~served)
+		self.lifetime[unserved] = np.nan
+		self.energyperBit[unserved] = np.nan
+		if len(devices):
+			lora = LoRaWANBatchModel(dr=self.DR[devices], cr=self.CR[devices], pl=self.PL[devices],
+						t_notif=self.T_notif[devices], p_c=self.P_c[devices], ackmode=self.ackmode[devices],
+						profile=self.profile)
+			self.lifetime[devices] = lora.calcLifetime()
+			self.energyperBit[devices] = lora.calcEnergyperBit()
+		return len(devices)
+
+	def addGateway(self, xy):
+		"""Adds a gateway, moves the devices it is nearest to and evaluates the
+		affected devices again
+		Returns:
+			index of the new gateway
+		"""
+		g = len(self.gatewayXY)
+		self.gatewayXY = np.vstack([self.gatewayXY, np.reshape(xy, (1, 2))])
+		self.active = np.append(self.active, True)
+		d = np.hypot(*(self.devices - self.gatewayXY[g]).T)
+		moved = np.flatnonzero((d < self.distance) & (d <= self.ranges.max()))
+		self.gateway[moved] = g
+		self.distance[moved] = d[moved]
+		self._setDR(moved)
+		self._buildIndex()
+		self._update(moved)
+		return g
+
+	def removeGateway(self, g):
+		"""Removes a gateway and assigns its devices to their nearest remaining one"""
+		assert self.active[g], "gateway %d is not active" % g
+		self.active[g] = False
+		self._buildIndex()
+		moved = np.flatnonzero(self.gateway == g)
+		self._assign(moved)
+		self._update(moved)
+
+	def summary(self):
+		"""Returns the fleet and gateway totals of the plan"""
+		load, P_c, devices = self.calcLoad()
+		served = self.served
+		limit = self.profile.maxCollisionProbability()
+		return {'devices': len(self.devices),
+				'served': int(served.sum()),
+				'gateways': int(self.active.sum()),
+				'devicesperDR': np.bincount(self.DR[served], minlength=NUMOF_DRS),
+				'maxLoad': load.max(),
+				'maxCollisionProbability': min(P_c.max(), limit),
+				'collisionLimited': int(((P_c > limit) & (devices > 0)).sum()),
+				'overloaded': int((load.max(axis=1) > .5/np.e).sum()),
+				'meanLifetime': self.lifetime[served].mean() if served.any() else np.nan,
+				'minLifetime': self.lifetime[served].min() if served.any() else np.nan}
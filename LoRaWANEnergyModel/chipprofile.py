@@ -0,0 +1,72 @@
+""" LoRaWAN chip and network profiles
+A ChipProfile holds the measured chip currents and timings, the battery,
+the LoRaWAN radio settings and the acknowledgement settings that
+LoRaWANEnergyModel used to read from the config module. It is the
+profilebase.ChipProfile of the LoRaWAN fields. Profiles are immutable
+and hashable, so every model built with the same profile shares one
+object, and a profile can be used as a cache key. Profiles are registered
+by name; 'default' holds the config values and 'alt1' the alternative
+chip currents noted next to them in config.py.
+
+Examples:
+	profile = get('alt1')
+	print profile.I_trans
+	lora = LoRaWANEnergyModel(dr=5, pl=20, profile=profile)
+	register('lowSleep', get('default').replace(I_sleep=.00005))
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import config
+import profilebase
+from profilebase import profileProperty
+
+FIELDS = ('I_sleep', 'I_wakeup', 'I_radioPrep', 'I_trans', 'I_delay1', 'I_delay2', 'I_recv1', 'I_recv2',
+		'I_radioOff', 'I_postproc', 'I_turnoff', 'T_wakeup', 'T_radioPrep', 'T_radioOff', 'T_postproc',
+		'T_turnoff', 'battery', 'voltage', 'CRC', 'BER', 'receive_delay1', 'receive_delay2',
+		'numofPreambleSymbols', 'numof125KHzChannels', 'T_txMin', 'P_recv1', 'P_recv2', 'T_radioOffAck',
+		'T_ackTOMin', 'T_ackTOMax', 'numofRetransMax')
+
+
+class ChipProfile(profilebase.ChipProfile):
+	"""Immutable chip and network settings, currents in mA, times in ms,
+	battery in mAh, voltage in V; T_txMin is a tuple of (SF, ms) pairs"""
+	FIELDS = FIELDS
+	__slots__ = FIELDS
+
+	def __init__(self, **values):
+		if not isinstance(values.get('T_txMin', ()), tuple):
+			values['T_txMin'] = tuple(sorted(dict(values['T_txMin']).items()))
+		profilebase.ChipProfile.__init__(self, **values)
+
+	def txMin(self, SF):
+		"""Receive window of the ACK (ms) for a spreading factor"""
+		return dict(self.T_txMin)[SF]
+
+	def expectedAckTimeout(self):
+		"""Mean ACK timeout (ms) of the uniform draw from [T_ackTOMin, T_ackTOMax]"""
+		return (self.T_ackTOMin + self.T_ackTOMax)/2.0
+
+	def maxCollisionProbability(self):
+		"""Largest collision probability the models use, a higher one is clamped to it"""
+		return .1*self.numofRetransMax
+
+
+def fromConfig():
+	"""Returns the profile of the current config module values"""
+	values = dict((field, getattr(config, field)) for field in FIELDS if field not in ('battery', 'voltage'))
+	return ChipProfile(battery=config._battery, voltage=config._voltage, **values)
+
+
+_registry = profilebase.Registry(ChipProfile)
+PROFILES = _registry.profiles
+register = _registry.register
+get = _registry.get
+
+
+register('default', fromConfig())
+register('alt1', get('default').replace(I_sleep=.045, I_wakeup=22.1, I_radioPrep=13.3, I_trans=83.0,
+		I_delay1=27.0, I_delay2=27.0, I_recv1=38.0, I_recv2=38.0, I_radioOff=13.0, I_postproc=21.0,
+		I_turnoff=13.0))
@@ -35,5 +35,8 @@ numof125KHzChannels = 6.0
 P_recv1 = .5
 P_recv2 = 1 - P_recv1
 T_radioOffAck = 337.8
+T_txMin = {12:991.8, 11:577.5, 10:288.7, 9:144.4, 8:72.2, 7:41.2} # (ms) receive window per SF
+T_ackTOMin = 1000 # (ms) ACK_TIMEOUT is drawn uniformly from [T_ackTOMin, T_ackTOMax]
+T_ackTOMax = 3000
 
 numofRetransMax = 7 # default is set as 7
@@ -0,0 +1,304 @@
+""" LoRaWAN fleet simulator
+Discrete-event simulation of a fleet of devices that send one frame per
+notification period on a random channel, with the T_trans of the model,
+and in acknowledgement mode retransmit a lost frame after the receive
+windows and an ACK timeout, up to numofRetransMax times. Two frames
+collide if they overlap in time on the same channel and, with
+orthogonalSF, the same data rate; there is no capture effect.
+
+Time is processed in blocks. The periodic frames of a block are generated
+as arrays, the retransmissions wait in a heap ordered by start time, and
+the collisions of all frames of the block are found in one sort. A lost
+frame schedules its retransmission as soon as it is known to be lost;
+retransmissions that start inside the block are added to it and the
+collisions recomputed until no new frame appears. A frame that ends after
+the block is carried over to the next one, so the result does not depend
+on the block length.
+
+The simulated collision probability per transmission can replace the
+fitted N_dev curve of the models through their pcModel argument.
+
+Examples:
+	sim = FleetSimulator(100000, dr=5, pl=20, t_notif=3600000, seed=1)
+	results = sim.run(24*3600000)
+	print "Collision probability is %.4f" % results['collisionProbability']
+	print "Mean device energy is %.1f mJ" % results['energy'].mean()
+
+	curve = simulateCollisionCurve([1000, 10000, 100000], 3600000, dr=5, pl=20, t_notif=600000)
+	lora = LoRaWANEnergyModel(dr=5, pl=20, t_notif=600000, N_dev=50000, pcModel=curve)
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import heapq
+
+import numpy as np
+
+from lorawanbatch import LoRaWANBatchModel
+
+
+_COLUMNS = ('start', 'end', 'key', 'device', 'attempt', 'dataOk', 'ackOk', 'window', 'collided', 'spawned')
+
+
+def _concatenate(parts):
+	return dict((name, np.concatenate([part[name] for part in parts])) for name in _COLUMNS)
+
+def detectCollisions(start, end, key):
+	"""Returns a bool array, True for every frame that overlaps another frame
+	with the same key (channel)"""
+	n = len(start)
+	if n == 0:
+		return np.zeros(0, bool)
+	t0 = start.min()
+	# shifting every channel by its own span sorts the frames by channel and
+	# start at once and lets one running maximum cover all channels
+	span = end.max() - t0 + 1.0
+	s = start - t0 + key*span
+	order = np.argsort(s)
+	s = s[order]
+	e = end[order] - t0 + key[order]*span
+
+	prevEnd = np.empty(n)
+	prevEnd[0] = -np.inf
+	prevEnd[1:] = np.maximum.accumulate(e)[:-1]
+	collided = s < prevEnd
+	collided[:-1] |= s[1:] < e[:-1]
+
+	result = np.empty(n, bool)
+	result[order] = collided
+	return result
+
+
+class FleetSimulator:
+
+	def __init__(self, numofDevices, dr=5, cr=1, pl=20, t_notif=3600000, ackmode=1,
+			numofChannels=None, orthogonalSF=True, seed=None, profile='default'):
+		"""FleetSimulator Initialization
+		Args:
+			numofDevices: number of devices of the fleet
+			dr, cr, pl, t_notif: LoRaWAN settings, scalars or arrays of one value per device
+			ackmode: 1 for with acknowledgement, 0 for without acknowledgement mode
+			numofChannels: number of uplink channels, numof125KHzChannels by default
+			orthogonalSF: frames of different data rates do not collide
+			seed: int seed or numpy RandomState
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.numofDevices = numofDevices
+		self.ackmode = ackmode
+		self.orthogonalSF = orthogonalSF
+		if isinstance(seed, np.random.RandomState):
+			self.rng = seed
+		else:
+			self.rng = np.random.RandomState(seed)
+
+		# per device timings and charges (mA*ms) of one active cycle
+		lora = LoRaWANBatchModel(dr=np.broadcast_to(dr, (numofDevices,)), cr=cr, pl=pl,
+								t_notif=t_notif, p_c=0, ackmode=ackmode, profile=profile)
+		self.lora = lora
+		self.profile = p = lora.profile
+		self.numofChannels = int(numofChannels or p.numof125KHzChannels)
+		self.DR = lora.DR
+		self.T_notif = lora.T_notif
+		self.T_trans = lora.T_trans
+		(I_noAck, self.T_noAck), (I_ack1, self.T_ack1), (I_ack2, self.T_ack2) = lora.calcACandAT()
+		self.Q_noAck = (I_noAck - p.I_sleep)*self.T_notif + p.I_sleep*self.T_noAck
+		self.Q_ack1 = (I_ack1 - p.I_sleep)*self.T_notif + p.I_sleep*self.T_ack1
+		self.Q_ack2 = (I_ack2 - p.I_sleep)*self.T_notif + p.I_sleep*self.T_ack2
+		# a retransmission starts at least this long after the frame it repeats
+		self.T_retransMin = np.min(self.T_noAck + p.T_ackTOMin - lora.T_txMin)
+
+		self.P_dataOk = (1-p.BER)**(lora.physicalPL + 4.5)
+		self.P_ackOk = (1-p.BER)**14.5 * np.ones(numofDevices)
+
+
+	def _newFrames(self, device, start, attempt):
+		"""Draws the channel and the radio fate of new frames"""
+		n = len(device)
+		channel = self.rng.randint(self.numofChannels, size=n)
+		key = channel*7 + self.DR[device] if self.orthogonalSF else channel
+		return {'start': start, 'end': start + self.T_trans[device], 'key': key,
+				'device': device, 'attempt': attempt,
+				'dataOk': self.rng.random_sample(n) < self.P_dataOk[device],
+				'ackOk': self.rng.random_sample(n) < self.P_ackOk[device],
+				'window': np.where(self.rng.random_sample(n) < self.profile.P_recv1, 1, 2),
+				'collided': np.zeros(n, bool), 'spawned': np.zeros(n, bool)}
+
+	def _periodicFrames(self, windowStart, windowEnd):
+		"""Devices and start times of the notifications in [windowStart, windowEnd), by start time"""
+		first = np.ceil((windowStart - self.phase)/self.T_notif).astype(np.int64)
+		last = np.ceil((windowEnd - self.phase)/self.T_notif).astype(np.int64)
+		counts = np.maximum(last - first, 0)
+		device = np.repeat(np.arange(self.numofDevices), counts)
+		index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		start = self.phase[device] + (first[device] + index)*self.T_notif[device]
+		order = np.argsort(start)
+		return device[order], start[order]
+
+	def _record(self, device, charge, active, frames, collided, acked):
+		# the per device totals are updated in batches, a bincount per block would cost O(devices)
+		self._ledger.append((device, charge, active, frames, collided, acked))
+		self._ledgerSize += len(device)
+
+	def _flush(self):
+		if not self._ledger:
+			return
+		device, charge, active, frames, collided, acked = (np.concatenate(column) for column in zip(*self._ledger))
+		n = self.numofDevices
+		self.charge += np.bincount(device, charge, n)
+		self.activeTime += np.bincount(device, active, n)
+		self.frames += np.bincount(device, frames, n).astype(int)
+		self.collisions += np.bincount(device, collided, n).astype(int)
+		self.successes += np.bincount(device, acked, n).astype(int)
+		self._ledger = []
+		self._ledgerSize = 0
+
+	def _account(self, frames):
+		"""Records the charge, active time and outcome of finished frames"""
+		device = frames['device']
+		delivered = ~frames['collided'] & frames['dataOk']
+		if self.ackmode:
+			acked = delivered & frames['ackOk']
+			window1 = acked & (frames['window'] == 1)
+			window2 = acked & (frames['window'] == 2)
+			charge = np.where(window1, self.Q_ack1[device], np.where(window2, self.Q_ack2[device], self.Q_noAck[device]))
+			active = np.where(window1, self.T_ack1[device], np.where(window2, self.T_ack2[device], self.T_noAck[device]))
+		else:
+			acked = delivered
+			charge = self.Q_noAck[device]
+			active = self.T_noAck[device]
+		self._record(device, charge, active, np.ones(len(device)), frames['collided'].astype(float), acked.astype(float))
+
+	def _spawn(self, frames, blockEnd):
+		"""Schedules the retransmission of every lost frame that has not scheduled
+		one yet. Returns the new frames that start before blockEnd, the others
+		are pushed on the heap."""
+		lost = frames['collided'] | ~frames['dataOk'] | ~frames['ackOk']
+		spawn = np.flatnonzero(lost & ~frames['spawned'] & (frames['attempt'] < self.profile.numofRetransMax))
+		frames['spawned'][spawn] = True
+		device = frames['device'][spawn]
+		attempt = frames['attempt'][spawn] + 1
+
+		# the device listens in both receive windows, waits for the ACK timeout and starts over
+		T_wait = self.rng.randint(self.profile.T_ackTOMin, self.profile.T_ackTOMax+1, size=len(spawn)) - self.lora.T_txMin[device]
+		start = frames['start'][spawn] + self.T_noAck[device] + T_wait
+		zeros = np.zeros(len(spawn))
+		self._record(device, self.profile.I_delay1*T_wait, T_wait, zeros, zeros, zeros)
+
+		inBlock = start < blockEnd
+		for t, d, a in zip(start[~inBlock].tolist(), device[~inBlock].tolist(), attempt[~inBlock].tolist()):
+			heapq.heappush(self.queue, (t, d, a))
+		return self._newFrames(device[inBlock], start[inBlock], attempt[inBlock])
+
+	def run(self, horizon, blockFrames=200000):
+		"""Simulates the fleet for horizon ms
+		Args:
+			horizon: simulated time (ms)
+			blockFrames: expected number of periodic frames generated at once;
+				in acknowledgement mode a block is at most T_retransMin long,
+				so its retransmissions always land in a later block
+		Returns:
+			dict with the fleet totals and the per device arrays energy (mJ),
+			aveCurrent (mA), lifetime (year), frames and collisions
+		"""
+		n = self.numofDevices
+		self.phase = self.rng.random_sample(n)*self.T_notif
+		self.queue = []
+		self.charge = np.zeros(n)
+		self.activeTime = np.zeros(n)
+		self.frames = np.zeros(n, int)
+		self.collisions = np.zeros(n, int)
+		self.successes = np.zeros(n, int)
+		self._ledger = []
+		self._ledgerSize = 0
+		notifications = 0
+
+		windowLength = blockFrames/np.sum(1.0/self.T_notif)
+		blockLength = min(windowLength, self.T_retransMin) if self.ackmode else windowLength
+		# periodic frames are generated a window at a time and handed out per block
+		periodicDevice, periodicStart = np.zeros(0, int), np.zeros(0)
+		windowEnd = 0.0
+		carried = self._newFrames(np.zeros(0, int), np.zeros(0), np.zeros(0, int))
+		blockStart = 0.0
+		while blockStart < horizon:
+			blockEnd = min(blockStart + blockLength, horizon)
+			if windowEnd < blockEnd:
+				device, start = self._periodicFrames(windowEnd, min(windowEnd + windowLength, horizon))
+				periodicDevice = np.concatenate((periodicDevice, device))
+				periodicStart = np.concatenate((periodicStart, start))
+				windowEnd = min(windowEnd + windowLength, horizon)
+			count = np.searchsorted(periodicStart, blockEnd)
+			parts = [carried, self._newFrames(periodicDevice[:count], periodicStart[:count], np.zeros(count, int))]
+			periodicDevice, periodicStart = periodicDevice[count:], periodicStart[count:]
+			notifications += count
+
+			pending = []
+			while self.queue and self.queue[0][0] < blockEnd:
+				pending.append(heapq.heappop(self.queue))
+			if pending:
+				start, device, attempt = (np.array(column) for column in zip(*pending))
+				parts.append(self._newFrames(device, start, attempt))
+			frames = _concatenate(parts)
+
+			# collisions only add frames, iterate to the fixed point
+			while True:
+				# frames carried over keep the collisions with frames already accounted
+				frames['collided'] |= detectCollisions(frames['start'], frames['end'], frames['key'])
+				if not self.ackmode:
+					break
+				new = self._spawn(frames, blockEnd)
+				if len(new['device']) == 0:
+					break
+				frames = _concatenate([frames, new])
+
+			# no later frame starts before blockEnd, so frames ending by then are final
+			final = frames['end'] <= blockEnd
+			self._account(dict((name, column[final]) for name, column in frames.items()))
+			carried = dict((name, column[~final]) for name, column in frames.items())
+			if self._ledgerSize >= blockFrames:
+				self._flush()
+			blockStart = blockEnd
+		self._account(carried)
+		self._flush()
+
+		p = self.profile
+		sleepCharge = p.I_sleep*(horizon - self.activeTime)
+		aveCurrent = (self.charge + sleepCharge)/horizon
+		totalFrames = self.frames.sum()
+		return {'frames': int(totalFrames),
+				'notifications': notifications,
+				'retransmissions': int(totalFrames - notifications),
+				'collisionProbability': self.collisions.sum()/float(max(totalFrames, 1)),
+				'deliveryRatio': self.successes.sum()/float(max(notifications, 1)),
+				'energy': (self.charge + sleepCharge)*p.voltage/1000.0,
+				'aveCurrent': aveCurrent,
+				'lifetime': p.battery/aveCurrent/24.0/365.0,
+				'deviceFrames': self.frames,
+				'deviceCollisions': self.collisions}
+
+
+class CollisionCurve:
+	"""Simulated collision probability as a function of the number of
+	devices, linearly interpolated; usable as pcModel of the models"""
+
+	def __init__(self, N_devs, p_cs):
+		order = np.argsort(N_devs)
+		self.N_devs = np.asarray(N_devs, float)[order]
+		self.p_cs = np.asarray(p_cs, float)[order]
+
+	def __call__(self, N_dev):
+		return np.interp(N_dev, self.N_devs, self.p_cs)
+
+
+def simulateCollisionCurve(N_devs, horizon, seed=None, **kwargs):
+	"""Runs one FleetSimulator per fleet size for horizon ms
+	Args:
+		N_devs: fleet sizes
+		kwargs: FleetSimulator settings
+	Returns:
+		CollisionCurve of the simulated collision probabilities
+	"""
+	rng = np.random.RandomState(seed)
+	p_cs = [FleetSimulator(N_dev, seed=rng, **kwargs).run(horizon)['collisionProbability'] for N_dev in N_devs]
+	return CollisionCurve(N_devs, p_cs)
@@ -0,0 +1,240 @@
+""" LoRaWAN Batch Energy Model
+Vectorized counterpart of LoRaWANEnergyModel. Every constructor argument
+can be a scalar or an array, the arguments are broadcast against each
+other and all results are returned as numpy arrays of the broadcast
+shape. The arithmetic follows LoRaWANEnergyModel term by term, so each
+element matches the scalar class to floating-point tolerance.
+
+The scalar class draws the ACK timeout from [T_ackTOMin, T_ackTOMax] for
+every retransmission; the batch model uses a fixed T_ackTO instead, by
+default the expected value of that draw.
+
+Examples:
+	lora = LoRaWANBatchModel(dr=[0, 5], ackmode=1, pl=20, t_notif=np.logspace(4, 8, 50)[:, None])
+	results = lora.evaluate()
+	print results['lifetime'].shape
+	print "Total device lifetime is %s year" % lora.calcLifetime()
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import numpy as np
+
+import airtime
+import chipprofile
+from lorawanenergymodel import MAX_PL
+from notification import NotificationSummary
+
+
+def _powers(x, n, ndim):
+	"""x**k for k from 0 to n along a new leading axis in front of ndim
+	axes, by repeated multiplication, which is much cheaper than a power per
+	element"""
+	x = np.asarray(x)
+	x = x.reshape((1,)*(ndim - x.ndim) + x.shape)
+	powers = np.empty((n+1,) + x.shape, np.result_type(x, float))
+	powers[0] = 1
+	np.cumprod(np.broadcast_to(x, (n,) + x.shape), axis=0, out=powers[1:])
+	return powers
+
+
+class LoRaWANBatchModel:
+
+	def __init__(self, dr=3, cr=1, pl=3, t_notif=3600000, N_dev=1, p_c=0, ackmode=1, T_ackTO=None, pcModel=None,
+			profile='default'):
+		"""LoRaWANBatchModel Initialization
+		Args:
+			dr: data rate array, only from 0 to 6 are supported
+			cr: coding Rate array, 4/5, 4/6, 4/7, 4/8
+			pl: frame payload array (bytes), maximum value varies based on DR setting
+			t_notif: notification period array (ms)
+			N_dev: number of devices array, p_c is derived from it where it is not 1
+			p_c: collision probability array
+			ackmode: array, 1 for with acknowledgement, 0 for without acknowledgement mode
+			T_ackTO: ACK timeout (ms), defaults to the expected value of the scalar draw
+			pcModel: vectorized callable mapping N_dev to p_c, used instead of the fitted curve
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.profile = chipprofile.get(profile)
+		dr, cr, pl, t_notif, N_dev, p_c, ackmode = np.broadcast_arrays(dr, cr, pl, t_notif, N_dev, p_c, ackmode)
+
+		assert(np.all((dr <= 6) & (dr >= 0))), "Only DR values from 0 to 6 are supported"
+		self.DR = dr.astype(int)
+		self._SF, self._BW = airtime.calcSFandBW(self.DR)
+		assert(np.all((cr <= 4) & (cr >= 1))), "Valid values are from 1 to 4, for 4/5,4/6,4/7,4/8"
+		self._CR = cr.astype(int)
+		self._PL = pl.astype(float)
+		self._acknowledgement = ackmode.astype(bool)
+		fitted = pcModel(N_dev) if pcModel is not None else 1.0 - 0.913*np.exp(-.00131*N_dev)
+		p_c = np.where(N_dev != 1, fitted, p_c)
+		self.P_c = np.minimum(p_c, self.profile.maxCollisionProbability())
+		self.T_notif = t_notif*1.0
+		if T_ackTO is None:
+			T_ackTO = self.profile.expectedAckTimeout()
+		self.T_ackTO = T_ackTO
+
+		assert(np.all(self._PL <= np.take(MAX_PL, self.DR))), "max PL bytes 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12"
+
+		self.physicalPL = self._PL + 13
+		self.totalData = self.physicalPL + 2*self.profile.CRC + 2.5
+
+		# symbol counts and timings from the precomputed airtime table
+		timings = airtime.lookupArrays(self.DR, self._CR, self._PL, self.profile.CRC, self.profile.numofPreambleSymbols)
+		self.numofMessageSymbols = timings['numofMessageSymbols']
+		self.timeperSymbol = timings['timeperSymbol']
+		self.timeofPreamble = timings['timeofPreamble']
+		self.timeofMessage = timings['timeofMessage']
+
+		self.T_trans = timings['T_trans']
+		self.T_delay1 = self.profile.receive_delay1
+		self.T_recv1 = timings['T_recv1']
+		self.T_delay2 = timings['T_delay2']
+		self.T_recv2 = timings['T_recv2']
+		T_txMin = dict(self.profile.T_txMin)
+		self.T_txMin = np.array([T_txMin[SF] for SF in range(7, 13)])[self._SF-7]
+
+		self._results = None
+
+
+	def calcAveCurrentandActiveTime(self, T_recv1, T_recv2, T_radioOff, I_delay2, T_delay2):
+		# same expression as LoRaWANEnergyModel.calcAveCurrentandActiveTime
+		p = self.profile
+		T_active = p.T_wakeup + p.T_radioPrep + self.T_trans + \
+						self.T_delay1 + T_delay2 + T_recv1 + T_recv2 +\
+						T_radioOff + p.T_postproc + p.T_turnoff
+
+		T_sleep = self.T_notif - T_active
+
+		I_aveNotif = (p.T_wakeup*p.I_wakeup + p.T_radioPrep*p.I_radioPrep +\
+					self.T_trans*p.I_trans + self.T_delay1*p.I_delay1 + \
+					T_delay2*I_delay2 + T_recv1*p.I_recv1 +\
+					T_recv2*p.I_recv2 + T_radioOff*p.I_radioOff +\
+					p.T_postproc*p.I_postproc + p.T_turnoff*p.I_turnoff +\
+					T_sleep*p.I_sleep)/self.T_notif
+		return I_aveNotif, T_active
+
+
+	def calcACandAT(self):
+		"""Returns the (current, active time) pairs of the no ack mode and of
+		the ack received in the first and in the second receive window"""
+		# the scalar model binds T_delay2 to I_delay2 and vice versa by default
+		noAck = self.calcAveCurrentandActiveTime(self.T_recv1, self.T_recv2, self.profile.T_radioOff,\
+										self.T_delay2, self.profile.I_delay2)
+		ack1 = self.calcAveCurrentandActiveTime(self.T_txMin, 0, self.profile.T_radioOffAck,\
+										self.profile.I_radioOff, 0)
+		ack2 = self.calcAveCurrentandActiveTime(self.T_recv1, self.T_txMin, self.profile.T_radioOffAck,\
+										self.T_delay2, self.profile.I_delay2)
+		return noAck, ack1, ack2
+
+
+	def calcRetransDistribution(self):
+		"""Returns the probability P_k, average current I_k and active time T_k
+		of a notification with k retransmissions, k from 0 to numofRetransMax
+		along a new leading axis"""
+		numofRetransMax = self.profile.numofRetransMax
+		BER = self.profile.BER
+		P_c = self.P_c
+
+		totalDataAmt = self.physicalPL + 4.5  # (bytes)
+		totalAckAmt = 14.5 # (bytes)
+
+		P_dataErr = P_c + (1-P_c)*(1-(1-BER)**totalDataAmt)
+		P_1winErr = self.profile.P_recv1*(1-P_dataErr)*(1-(1-BER)**totalAckAmt)
+		P_2winErr = self.profile.P_recv2*(1-P_dataErr)*(1-(1-BER)**totalAckAmt)
+		P_0 = ((1-BER)**totalDataAmt)**((1-BER)**totalAckAmt)*(1-P_c) # probablility without retransmission
+
+		I_ackTO = self.profile.I_delay1
+		(I_aveNotifNoAck, T_activeNoAck), (I_ack1, T_active1), (I_ack2, T_active2) = self.calcACandAT()
+		I_aveNotifAck = self.profile.P_recv1*I_ack1 + self.profile.P_recv2*I_ack2
+		T_activeAck = self.profile.P_recv1*T_active1 + self.profile.P_recv2*T_active2
+
+		T_ok = T_activeAck
+		I_ok = (I_aveNotifAck*self.T_notif-(self.T_notif-T_ok)*self.profile.I_sleep)/T_ok
+		I_dataErr = (I_aveNotifNoAck*self.T_notif-(self.T_notif-T_activeNoAck)*self.profile.I_sleep)/T_activeNoAck
+		I_1winErr = (I_ack1*self.T_notif-(self.T_notif-T_ok)*self.profile.I_sleep)/T_ok
+		I_2winErr = (I_ack2*self.T_notif-(self.T_notif-T_ok)*self.profile.I_sleep)/T_ok
+
+		T_dataErr = T_activeNoAck
+		T_1winErr = T_active1
+		T_2winErr = T_active2
+
+		# per retransmission charge and time, identical for every attempt
+		P_err = P_dataErr+P_1winErr+P_2winErr
+		T_recv2 = self.T_txMin
+		A = I_ackTO*(self.T_ackTO-T_recv2)+(I_dataErr*T_dataErr*P_dataErr + I_1winErr*T_1winErr*P_1winErr \
+									+ I_2winErr*T_2winErr*P_2winErr)/P_err
+		B = (self.T_ackTO-T_recv2)+(T_dataErr*P_dataErr+T_1winErr*P_1winErr+T_2winErr*P_2winErr)/P_err
+
+		# k runs along a new leading axis; the terms can have fewer axes than
+		# the batch if only profile fields are arrays
+		ndim = np.broadcast(P_0, I_ok, T_ok, A, B, self.T_notif, self.totalData).ndim
+		k = np.arange(numofRetransMax+1).reshape((-1,) + (1,)*ndim)
+		P_k = _powers(1-P_0, numofRetransMax, ndim)*P_0
+		T_k = T_ok+k*B
+		I_k = (I_ok*T_ok+(k+1)*A)/T_k
+		return P_k, I_k, T_k
+
+	def calcAveCurrentAck(self):
+		numofRetransMax = self.profile.numofRetransMax
+		BER = self.profile.BER
+		P_c = self.P_c
+
+		# expectation over k retransmissions
+		P_k, I_k, T_k = self.calcRetransDistribution()
+		I_act = (I_k*P_k).sum(axis=0)
+		T_act = (T_k*P_k).sum(axis=0)
+
+		P_frameOk = (1-P_c)*(1-BER)**self.totalData
+		P_dataDelivered = (_powers((1-P_c)*(1-(1-BER)**self.totalData)+P_c, numofRetransMax, P_k.ndim-1)*P_frameOk).sum(axis=0)
+
+		I_aveAck = (I_act*T_act+self.profile.I_sleep*(self.T_notif-T_act))/self.T_notif
+		return I_aveAck, T_act, self._PL*P_dataDelivered
+
+
+	def _evaluate(self):
+		if self._results is None:
+			I_aveAck, T_activeAck, dataAck = self.calcAveCurrentAck()
+			(I_aveNoAck, T_activeNoAck), _, _ = self.calcACandAT()
+			dataNoAck = self._PL*((1-self.profile.BER)**(self.totalData))*(1-self.P_c)
+
+			ack = self._acknowledgement
+			self._results = (np.where(ack, I_aveAck, I_aveNoAck),
+							np.where(ack, T_activeAck, T_activeNoAck),
+							np.where(ack, dataAck, dataNoAck))
+		return self._results
+
+	def calcAveCurrentandTime(self):
+		I_aveNotif, T_active, _ = self._evaluate()
+		return I_aveNotif, T_active
+
+	def getdataDelivered(self):
+		return self._evaluate()[2]
+
+	def calcEnergyperBit(self):
+		I_aveNotif, _, dataDelivered = self._evaluate()
+		return I_aveNotif*self.profile.voltage*self.T_notif/dataDelivered/1000.0/8.0
+
+	def calcLifetime(self):
+		I_aveNotif, _, _ = self._evaluate()
+		return self.profile.battery/I_aveNotif/24.0/365.0
+
+	def calcNotificationSummary(self):
+		"""Returns the NotificationSummary of the batch, its arrays broadcast
+		against the notification periods it is evaluated for"""
+		I_aveNotif, T_active, dataDelivered = self._evaluate()
+		return NotificationSummary.fromResults(I_aveNotif, T_active, dataDelivered, self.T_notif, self.profile)
+
+	def calcAlohaCapcity(self):
+		return self.T_notif/self.T_trans*(.5/np.e)*self.profile.numof125KHzChannels
+
+	def evaluate(self):
+		"""Returns a dict with every result array of the batch"""
+		I_aveNotif, T_active, dataDelivered = self._evaluate()
+		return {'aveCurrent': I_aveNotif,
+				'activeTime': T_active,
+				'dataDelivered': dataDelivered,
+				'energyperBit': self.calcEnergyperBit(),
+				'lifetime': self.calcLifetime(),
+				'capacity': self.calcAlohaCapcity()}
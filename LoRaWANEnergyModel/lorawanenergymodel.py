@@ -24,6 +24,7 @@ Examples:
 	print "Total device lifetime is %.3f year" % lora.calcLifetime()
 	print "Energy per bit is %.3f mJ" % lora.calcEnergyperBit()
 	print "One gateway capacity is %d devices" % lora.calcAlohaCapcity()
+	print "Lifetime for hourly notifications is %.3f year" % lora.calcNotificationSummary().calcLifetime(3600000)
 
 Peter (Jun) Ye
 """
@@ -33,82 +34,109 @@ Peter (Jun) Ye
 import math
 import random
 
-import config
+import chipprofile
 
-class LoRaWANEnergyModel:
+# attributes the results depend on, reassigning one of them invalidates the
+# cached results; the chip and network settings all live in the profile
+_AIRTIME_PARAMETERS = frozenset(['DR', '_CR', '_PL', 'profile'])
+# attributes the charges and times of the retransmission outcomes depend on,
+# they are kept when only P_c or the mode changes
+_CHARGE_PARAMETERS = _AIRTIME_PARAMETERS | frozenset(['T_notif'])
+_PARAMETERS = _CHARGE_PARAMETERS | frozenset(['_acknowledgement', 'expectedAckTO', 'P_c', 'reference'])
 
-	def __init__(self, dr=3, cr=1, pl=3, t_notif=3600000, N_dev=1, p_c=0, ackmode=1):
+# relative size of the neglected tail of the retransmission expectation
+_TAIL = 2.0**-60
+
+# max PL bytes of DR 0 to 6: 51 for SF 10-12, 115 for SF 9, 242 for SF 7-8
+MAX_PL = (51, 51, 51, 115, 242, 242, 242)
+
+
+def _oneMinusPow(t, n):
+	"""1-(1-t)**n without cancellation for small t"""
+	if t >= .5:
+		return 1.0 - (1.0-t)**n
+	return -math.expm1(n*math.log1p(-t))
+
+class LoRaWANEnergyModel(object):
+
+	__slots__ = ('DR', '_CR', '_PL', '_acknowledgement', 'expectedAckTO', 'P_c', 'T_notif', 'reference', 'profile',
+				'_results', '_retransCharges', '_SF', '_BW', 'DE', 'numofRecvSymbols', 'physicalPL', 'totalData',
+				'numofMessageSymbols', 'timeperSymbol', 'timeofPreamble', 'timeofMessage', 'T_trans',
+				'T_delay1', 'T_recv1', 'T_delay2', 'T_recv2', 'T_recv2NoAck', 'T_txMinSF',
+				'I_ack1', 'T_active1', 'I_ack2', 'T_active2')
+
+	def __init__(self, dr=3, cr=1, pl=3, t_notif=3600000, N_dev=1, p_c=0, ackmode=1, expectedAckTO=False,
+				pcModel=None, reference=False, profile='default'):
 		"""LoRaWANEnergyModel Initialization
 		Args:
 			dr: data rate, only from 0 to 6 are supported
 			cr: coding Rate, 4/5, 4/6, 4/7, 4/8
 			pl: frame payload (bytes), maximum value varies based on DR setting, specified below
 			t_notif: notification period (ms)
+			N_dev: number of devices, p_c is derived from it where it is not 1
 			p_c: collision probability, bigger than 0
 			ackmode: 1 for with acknowledgement, 0 for without acknowledgement mode
+			expectedAckTO: use the expected ACK timeout instead of a random draw
+				per retransmission, which makes the results deterministic
+			pcModel: callable mapping N_dev to p_c, e.g. a simulated
+				fleetsimulator.CollisionCurve, used instead of the fitted curve
+			reference: evaluate the retransmission expectation with the original
+				nested loops instead of one running accumulation
+			profile: chipprofile.ChipProfile or name of a registered one
+
+		The chip currents and timings, battery and radio settings are read from
+		the shared profile, e.g. lora.I_sleep is lora.profile.I_sleep; assigning
+		one of them gives this model its own copy of the profile.
+
+		The results are computed on first use and cached. Reassigning a parameter
+		attribute, e.g. lora.T_notif or lora._PL, invalidates them.
 		"""
+		# plain assignments, the model has no results to invalidate yet
+		setattr = object.__setattr__
+		setattr(self, 'DR', dr) 		# data rate
+		setattr(self, '_CR', cr)
+		setattr(self, '_PL', pl)   # (bytes) max 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12
+		setattr(self, '_acknowledgement', ackmode) # 1 for with acknowledgement, 0 for wihtout ack
+		setattr(self, 'expectedAckTO', expectedAckTO)
+		setattr(self, 'profile', chipprofile.get(profile))
+		if(N_dev != 1 and pcModel is not None):
+			p_c = float(pcModel(N_dev))
+		elif(N_dev != 1):
+			p_c = 1.0- 0.913*math.exp(-.00131*N_dev)
+		#assert(p_c > 0), "P_c needs to be bigger than 0"
+		if p_c > self.profile.maxCollisionProbability():
+			p_c = self.profile.maxCollisionProbability()
+		setattr(self, 'P_c', p_c)  # collision probability
+		setattr(self, 'T_notif', t_notif)
+		setattr(self, 'reference', reference)
+
+		self._calcAirtime()
+		setattr(self, '_results', None)
+		setattr(self, '_retransCharges', None)
+
+
+	def __setattr__(self, name, value):
+		object.__setattr__(self, name, value)
+		if name in _PARAMETERS and hasattr(self, '_results'):
+			if name in _AIRTIME_PARAMETERS:
+				self._calcAirtime()
+			if name in _CHARGE_PARAMETERS:
+				self._retransCharges = None
+			self._results = None
 
-		assert(dr <= 6 and dr >= 0), "Only DR values from 0 to 6 are supported"
-		self.DR = dr 		# data rate
+
+	def _calcAirtime(self):
+		assert(self.DR <= 6 and self.DR >= 0), "Only DR values from 0 to 6 are supported"
 		if self.DR <= 5:
 			self._SF = 12 - self.DR   # valid values are 7,8,9,10,11,12
 			self._BW = 125   # (KHz)
 		elif self.DR == 6:
 			self._SF = 7
 			self._BW = 250   # (KHz)
-		assert(cr<=4 and cr>=1), "Valid values are from 1 to 4, for 4/5,4/6,4/7,4/8"
-		self._CR = cr
-		self._PL = pl   # (bytes) max 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12
-		self._acknowledgement = ackmode # 1 for with acknowledgement, 0 for wihtout ack
-		if(N_dev != 1):
-			p_c = 1.0- 0.913*math.exp(-.00131*N_dev)
-		#assert(p_c > 0), "P_c needs to be bigger than 0"
-		if p_c > .1*config.numofRetransMax:
-			p_c = .1*config.numofRetransMax
-		self.P_c = p_c  # collision probability
-		self.T_notif = t_notif
-
-		self.I_sleep  		= config.I_sleep # all current value is in mA
-		self.I_wakeup 		= config.I_wakeup
-		self.I_radioPrep 	= config.I_radioPrep
-		self.I_trans 		= config.I_trans
-		self.I_delay1	 	= config.I_delay1
-		self.I_delay2 		= config.I_delay2
-		self.I_recv1 		= config.I_recv1
-		self.I_recv2 		= config.I_recv2
-		self.I_radioOff 	= config.I_radioOff
-		self.I_postproc 	= config.I_postproc
-		self.I_turnoff 		= config.I_turnoff
-
-		self.T_wakeup 		= config.T_wakeup  # all time value is in ms
-		self.T_radioPrep 	= config.T_radioPrep
-		self.T_radioOff 	= config.T_radioOff
-		self.T_postproc 	= config.T_postproc
-		self.T_turnoff 		= config.T_turnoff
-
-		# battery setting
-		self._battery 		= config._battery # (mAh)
-		self._voltage 		= config._voltage # (V)
-
-		# LoRaWAN setting
-		self.CRC 			= config.CRC    # wheather cyclic redundancy check
-		 								    # exists in physical layer message
-		self.BER 			= config.BER      # bit error rate
-		self.receive_delay1 = config.receive_delay1  # (ms)
-		self.receive_delay2 = config.receive_delay2  # (ms)
-		self.numofPreambleSymbols = config.numofPreambleSymbols
-		self.numof125KHzChannels = config.numof125KHzChannels
-
-		self.T_txMin = {12:991.8, 11:577.5, 10:288.7, 9:144.4, 8:72.2, 7:41.2}
-
+		assert(self._CR<=4 and self._CR>=1), "Valid values are from 1 to 4, for 4/5,4/6,4/7,4/8"
 		assert(self._SF <= 12 and self._SF >= 7), "valid SF values are 7,8,9,10,11,12"
 
-		if self._SF > 9:
-		    assert(self._PL <= 51), "max PL bytes 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12"
-		elif self._SF > 8:
-		    assert(self._PL <= 115), "max PL bytes 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12"
-		elif self._SF > 6:
-		    assert(self._PL <= 242), "max PL bytes 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12"
+		assert(self._PL <= MAX_PL[self.DR]), "max PL bytes 242 for SF 7-8, 115 for SF 9, 51 for SF 10-12"
 
 		if (self._SF>10):
 		    self.DE = 1  # drift correction is used
@@ -118,25 +146,26 @@ class LoRaWANEnergyModel:
 		    self.numofRecvSymbols = 12
 
 
+		profile = self.profile
 		self.physicalPL = self._PL +13
-		self.totalData = self.physicalPL + 2*self.CRC + 2.5
+		self.totalData = self.physicalPL + 2*profile.CRC + 2.5
 
+		# closed form of one configuration, the batch models look the same
+		# expressions up in the airtime table
 		self.numofMessageSymbols = 8 + max(math.ceil((28+8*self.physicalPL+16*\
-								self.CRC-4*self._SF)/float(4*(self._SF-2*\
+								profile.CRC-4*self._SF)/float(4*(self._SF-2*\
 								self.DE)))*(self._CR+4), 0)
 		self.timeperSymbol = float(2**self._SF)/self._BW
-		self.timeofPreamble = (self.numofPreambleSymbols+4.25)*self.timeperSymbol
+		self.timeofPreamble = (profile.numofPreambleSymbols+4.25)*self.timeperSymbol
 		self.timeofMessage = self.numofMessageSymbols*self.timeperSymbol
 
-		self.dataDelivered = self._PL*((1-self.BER)**(self.totalData))*(1-self.P_c)
-
-
 		self.T_trans = self.timeofMessage+self.timeofPreamble
-		self.T_delay1 = self.receive_delay1
+		self.T_delay1 = profile.receive_delay1
 		self.T_recv1 = self.timeperSymbol*self.numofRecvSymbols # measured 24 ms
 		self.T_delay2 = 1000 - self.T_recv1
 		self.T_recv2 = float(2**self._SF+32)/self._BW
 		self.T_recv2NoAck = self.T_recv2
+		self.T_txMinSF = profile.txMin(self._SF)
 
 		self.I_ack1 = 0
 		self.T_active1 = 0
@@ -144,156 +173,265 @@ class LoRaWANEnergyModel:
 		self.T_active2 = 0
 
 
+	def _evaluate(self):
+		"""Returns the cached average current, active time and data delivered
+		per notification, computing them first if a parameter changed"""
+		if self._results is None:
+			if (self._acknowledgement):
+				results = self._calcAveCurrentAck()
+			else:
+				I_aveNotif, T_active = self.calcACandAT(ackmode=0)
+				dataDelivered = self._PL*((1-self.profile.BER)**(self.totalData))*(1-self.P_c)
+				results = I_aveNotif, T_active, dataDelivered
+			self._results = results
+		return self._results
+
+
 	def calcAveCurrentandActiveTime(self, T_recv1=None, T_recv2=None,\
 								T_radioOff = None,I_delay2 = None,T_delay2 = None ):
+		p = self.profile
 		if T_recv1 == None:
 			T_recv1 = self.T_recv1
 		if T_recv2 == None:
 			T_recv2 = self.T_recv2
 		if T_radioOff == None:
-			T_radioOff = self.T_radioOff
+			T_radioOff = p.T_radioOff
 		if T_delay2 == None:
-			T_delay2 = self.I_delay2
+			T_delay2 = p.I_delay2
 		if I_delay2 == None:
 			I_delay2 = self.T_delay2
 
 		# calculate average current per notification without acknowledgement
-		T_active = self.T_wakeup + self.T_radioPrep + self.T_trans + \
+		T_active = p.T_wakeup + p.T_radioPrep + self.T_trans + \
 						self.T_delay1 + T_delay2 + T_recv1 + T_recv2 +\
-		             	T_radioOff + self.T_postproc + self.T_turnoff
+		             	T_radioOff + p.T_postproc + p.T_turnoff
 
 		T_sleep = self.T_notif - T_active
 
-		I_aveNotif = (self.T_wakeup*self.I_wakeup + self.T_radioPrep*self.I_radioPrep +\
-		 			self.T_trans*self.I_trans + self.T_delay1*self.I_delay1 + \
-					T_delay2*I_delay2 + T_recv1*self.I_recv1 +\
-		            T_recv2*self.I_recv2 + T_radioOff*self.I_radioOff +\
-					self.T_postproc*self.I_postproc + self.T_turnoff*self.I_turnoff +\
-					T_sleep*self.I_sleep)/self.T_notif
+		I_aveNotif = (p.T_wakeup*p.I_wakeup + p.T_radioPrep*p.I_radioPrep +\
+		 			self.T_trans*p.I_trans + self.T_delay1*p.I_delay1 + \
+					T_delay2*I_delay2 + T_recv1*p.I_recv1 +\
+		            T_recv2*p.I_recv2 + T_radioOff*p.I_radioOff +\
+					p.T_postproc*p.I_postproc + p.T_turnoff*p.I_turnoff +\
+					T_sleep*p.I_sleep)/self.T_notif
 		return I_aveNotif, T_active
 
 
 	def calcACandAT(self, ackmode):
+		p = self.profile
 		if (ackmode):
-			self.I_ack1, self.T_active1 = self.calcAveCurrentandActiveTime(T_recv1=self.T_txMin[self._SF],\
-										T_recv2=0, T_radioOff = config.T_radioOffAck,\
-										I_delay2 = self.I_radioOff, T_delay2 = 0)
-			self.I_ack2, self.T_active2 = self.calcAveCurrentandActiveTime(T_radioOff=config.T_radioOffAck,\
-										T_recv2 = self.T_txMin[self._SF])
-
-			I_aveNotif = config.P_recv1*self.I_ack1 + config.P_recv2*self.I_ack2
-			T_active = config.P_recv1*self.T_active1 + config.P_recv2*self.T_active2
+			self.I_ack1, self.T_active1 = self.calcAveCurrentandActiveTime(T_recv1=self.T_txMinSF,\
+										T_recv2=0, T_radioOff = p.T_radioOffAck,\
+										I_delay2 = p.I_radioOff, T_delay2 = 0)
+			self.I_ack2, self.T_active2 = self.calcAveCurrentandActiveTime(T_radioOff=p.T_radioOffAck,\
+										T_recv2 = self.T_txMinSF)
+
+			I_aveNotif = p.P_recv1*self.I_ack1 + p.P_recv2*self.I_ack2
+			T_active = p.P_recv1*self.T_active1 + p.P_recv2*self.T_active2
 		else:
 			I_aveNotif, T_active = self.calcAveCurrentandActiveTime()
 
 		return I_aveNotif, T_active
 
 	def calcAveCurrentandTime(self):
-		if (self._acknowledgement):
-			I_aveNotif, T_active = self.calcAveCurrentAck()
-		else:
-			I_aveNotif, T_active = self.calcACandAT(ackmode=0)
+		I_aveNotif, T_active, _ = self._evaluate()
 		return I_aveNotif, T_active
 
 	def calcAveCurrentAck(self):
-		#random.seed()
+		I_aveAck, T_act, _ = self._calcAveCurrentAck()
+		return I_aveAck, T_act
 
-		k = 0  # number of retransmissions
-		numofRetransMax = config.numofRetransMax # default is set as 7
+	def calcRetransCharges(self):
+		"""Returns the terms of the retransmission process that depend neither
+		on the ACK timeout nor on P_c and BER: the current and active time of a
+		successful attempt, the ACK timeout current, the receive window the
+		timeout is counted from, and the current and active time of a data
+		error and of an ACK lost in the first and in the second window. They
+		are kept until an airtime parameter, the profile or T_notif changes."""
+		if self._retransCharges is None:
+			p = self.profile
+			I_aveNotifAck, T_activeAck = self.calcACandAT(ackmode=1)
+			I_aveNotifNoAck, T_activeNoAck = self.calcACandAT(ackmode=0)
+
+			T_ok = T_activeAck
+			I_ok = (I_aveNotifAck*self.T_notif-(self.T_notif-T_ok)*p.I_sleep)/T_ok
+
+			I_dataErr = (I_aveNotifNoAck*self.T_notif-(self.T_notif-T_activeNoAck)*p.I_sleep)/T_activeNoAck
+			I_1winErr = (self.I_ack1*self.T_notif-(self.T_notif-T_ok)*p.I_sleep)/T_ok
+			I_2winErr = (self.I_ack2*self.T_notif-(self.T_notif-T_ok)*p.I_sleep)/T_ok
+
+			self._retransCharges = (I_ok, T_ok, p.I_delay1, self.T_txMinSF,
+								(I_dataErr, T_activeNoAck), (I_1winErr, self.T_active1), (I_2winErr, self.T_active2))
+		return self._retransCharges
+
+	def calcRetransTerms(self, P_c=None, BER=None):
+		"""Returns the terms of the retransmission process that do not depend on
+		the ACK timeout: the probability P_0 of no retransmission, the current
+		and active time of a successful attempt, the ACK timeout current, the
+		receive window the timeout is counted from, and the charge and time of a
+		failed attempt averaged over its error causes
+		Args:
+			P_c, BER: collision probability and bit error rate, those of the model by default
+		"""
+		p = self.profile
+		P_c = self.P_c if P_c is None else P_c
+		BER = p.BER if BER is None else BER
+		I_ok, T_ok, I_ackTO, T_recv2, (I_dataErr, T_dataErr), (I_1winErr, T_1winErr), (I_2winErr, T_2winErr) = \
+			self.calcRetransCharges()
 
 		totalDataAmt = self.physicalPL + 4.5  # (bytes)
 		totalAckAmt = 14.5 # (bytes)
 
-		P_dataErr = self.P_c + (1-self.P_c)*(1-(1-self.BER)**totalDataAmt)
-		P_1winErr = config.P_recv1*(1-P_dataErr)*(1-(1-self.BER)**totalAckAmt)
-		P_2winErr = config.P_recv2*(1-P_dataErr)*(1-(1-self.BER)**totalAckAmt)
-
-		P_0 = ((1-self.BER)**totalDataAmt)**((1-self.BER)**totalAckAmt)*(1-self.P_c) # probablility without retransmission
-		P_k = ((1-P_0)**k)*P_0
-		# print "P_0 %f" % P_0
-		# print "P_dataErr %f" % P_dataErr
-		# print "P_1winErr %f" % P_1winErr
-		# print "P_2winErr %f" % P_2winErr
-
-		I_ackTO = self.I_delay1
-
-
+		P_dataErr = P_c + (1-P_c)*(1-(1-BER)**totalDataAmt)
+		P_1winErr = p.P_recv1*(1-P_dataErr)*(1-(1-BER)**totalAckAmt)
+		P_2winErr = p.P_recv2*(1-P_dataErr)*(1-(1-BER)**totalAckAmt)
+
+		P_0 = ((1-BER)**totalDataAmt)**((1-BER)**totalAckAmt)*(1-P_c) # probablility without retransmission
+
+		Q_err = (I_dataErr*T_dataErr*P_dataErr + I_1winErr*T_1winErr*P_1winErr \
+					+ I_2winErr*T_2winErr*P_2winErr)/(P_dataErr+P_1winErr+P_2winErr)
+		T_err = (T_dataErr*P_dataErr+T_1winErr*P_1winErr+T_2winErr*P_2winErr)/ \
+					(P_dataErr+P_1winErr+P_2winErr)
+
+		return P_0, I_ok, T_ok, I_ackTO, T_recv2, Q_err, T_err
+
+	def drawAckTimeout(self):
+		"""ACK timeout (ms) of one retransmission, drawn from the global random
+		module unless the model runs in expected ACK timeout mode"""
+		if self.expectedAckTO:
+			return self.profile.expectedAckTimeout()
+		return random.randint(self.profile.T_ackTOMin, self.profile.T_ackTOMax)
+
+	def calcRetransExpectation(self, P_c=None, BER=None):
+		"""Returns the average current, the active time and the data delivered
+		per notification in acknowledgement mode, the expectation over k from 0
+		to numofRetransMax retransmissions, for the P_c and BER of the model or
+		the given ones; the terms that depend on neither are computed once.
+
+		A notification with k retransmissions has probability P_k = (1-P_0)**k*P_0
+		and every attempt adds the same wait and failed attempt charge, so one
+		pass over k with a running P_k gives the expectation. With expected ACK
+		timeouts the pass stops once the remaining P_k cannot change the sums,
+		so large retry limits cost about as much as the default; drawn timeouts
+		are drawn for every k, as the reference loops do.
+		"""
+		if self.reference:
+			return self._calcAveCurrentAckLoop(P_c, BER)
+		p = self.profile
+		P_c = self.P_c if P_c is None else P_c
+		BER = p.BER if BER is None else BER
+		numofRetransMax = p.numofRetransMax
+		P_0, I_ok, T_ok, I_ackTO, T_recv2, Q_err, T_err = self.calcRetransTerms(P_c, BER)
+
+		q = 1-P_0
+		Q_ok = I_ok*T_ok
+		T_act = 0
+		I_act = 0
+		P_k = P_0
+		for k in xrange(numofRetransMax+1):
+			T_wait = self.drawAckTimeout() - T_recv2
+			A = I_ackTO*T_wait+Q_err  # charge of an attempt, k+1 of them
+			B = T_wait+T_err  # time of a retransmission
+			T_k = T_ok+k*B
+			I_act += (Q_ok+(k+1)*A)/T_k*P_k
+			T_act += T_k*P_k
+			P_k *= q
+			if self.expectedAckTO and 0 < q < 1:
+				# bounds of the sums over the k not done yet, I_k lies between I_0 and A/B
+				T_tail = P_k*(T_ok + B*(k+1 + q/P_0))/P_0
+				I_tail = P_k*max(Q_ok+A, A*T_ok/B)/T_ok/P_0
+				if T_tail <= _TAIL*T_act and I_tail <= _TAIL*I_act:
+					break
 
-		I_aveNotifAck, T_activeAck = self.calcACandAT(ackmode=1)
-		# print I_aveNotifAck, T_activeAck
-		I_aveNotifNoAck, T_activeNoAck = self.calcACandAT(ackmode=0)
-		# print I_aveNotifNoAck, T_activeNoAck
+		# sum of the geometric series of a frame first delivered at attempt k
+		P_dataDelivered = _oneMinusPow((1-P_c)*(1-BER)**self.totalData, numofRetransMax+1)
 
-		T_ok = T_activeAck
-		I_ok = (I_aveNotifAck*self.T_notif-(self.T_notif-T_ok)*self.I_sleep)/T_ok
-		#print "I_ok %f" % I_ok
-		#I_ok1 = I_aveNotifAck
-		#print "I_ok1 %f" % I_ok1
+		I_aveAck = (I_act*T_act+p.I_sleep*(self.T_notif-T_act))/self.T_notif
 
-		I_dataErr = (I_aveNotifNoAck*self.T_notif-(self.T_notif-T_activeNoAck)*self.I_sleep)/T_activeNoAck
-		I_1winErr = (self.I_ack1*self.T_notif-(self.T_notif-T_ok)*self.I_sleep)/T_ok
-		I_2winErr = (self.I_ack2*self.T_notif-(self.T_notif-T_ok)*self.I_sleep)/T_ok
+		return I_aveAck, T_act, self._PL*P_dataDelivered
 
-		T_dataErr = T_activeNoAck
-		T_1winErr = self.T_active1
-		T_2winErr = self.T_active2
+	def _calcAveCurrentAck(self):
+		return self.calcRetransExpectation()
 
+	def _calcAveCurrentAckLoop(self, P_c=None, BER=None):
+		p = self.profile
+		P_c = self.P_c if P_c is None else P_c
+		BER = p.BER if BER is None else BER
+		#random.seed()
+		numofRetransMax = p.numofRetransMax # default is set as 7
+		P_0, I_ok, T_ok, I_ackTO, T_recv2, Q_err, T_err = self.calcRetransTerms(P_c, BER)
 
 		T_act = 0
 		I_act = 0
 		Topsumk =0
 		Bottomsumk =0
 		P_dataDelivered = 0
-		T_recv2 = self.T_txMin[self._SF]
 		for k in range(numofRetransMax+1):
-			T_ackTO = random.randint(1000,3000)
+			T_ackTO = self.drawAckTimeout()
 			for i in range(k+1):
-			    Topsumk += (I_ackTO*(T_ackTO- T_recv2)+(I_dataErr*T_dataErr*P_dataErr + I_1winErr*T_1winErr*P_1winErr \
-			                                                + I_2winErr*T_2winErr*P_2winErr)/(P_dataErr+P_1winErr+P_2winErr))
+			    Topsumk += (I_ackTO*(T_ackTO- T_recv2)+Q_err)
 			for i in range(1, k+1):
-			    Bottomsumk += (T_ackTO-T_recv2)+(T_dataErr*P_dataErr+T_1winErr*P_1winErr+T_2winErr*P_2winErr)/ \
-			                                                (P_dataErr+P_1winErr+P_2winErr)
+			    Bottomsumk += (T_ackTO-T_recv2)+T_err
 
 			P_k = ((1-P_0)**k)*P_0
 			T_k = T_ok+Bottomsumk
 			I_k = (I_ok*T_ok+Topsumk)/T_k
 			I_act += I_k*P_k
 			T_act += T_k*P_k
-			P_dataDelivered += (((1-self.P_c)*(1-(1-self.BER)**self.totalData)+self.P_c)**k)*\
-									(1-self.P_c)*(1-self.BER)**self.totalData
+			P_dataDelivered += (((1-P_c)*(1-(1-BER)**self.totalData)+P_c)**k)*\
+									(1-P_c)*(1-BER)**self.totalData
 			Topsumk = 0
 			Bottomsumk = 0
-			# print "P_k %f" % P_k
-			# print "I_act: %.4f" % I_act
-			# print "T_ack: %.4f" % T_act
-			# print "I_k: %.4f" % I_k
-			# print "T_k: %.4f" % T_k
 
-		self.dataDelivered = self._PL*P_dataDelivered
+		I_aveAck = (I_act*T_act+p.I_sleep*(self.T_notif-T_act))/self.T_notif
 
-		I_aveAck = (I_act*T_act+self.I_sleep*(self.T_notif-T_act))/self.T_notif
-
-		return I_aveAck, T_act
+		return I_aveAck, T_act, self._PL*P_dataDelivered
 
 	def getdataDelivered(self):
-		if (self._acknowledgement):
-			self.calcAveCurrentAck()
-		return self.dataDelivered
+		return self._evaluate()[2]
+
+	dataDelivered = property(getdataDelivered)
 
 	def calcEnergyperBit(self):
-		I_aveNotif,_ = self.calcAveCurrentandTime()
-		E_perBit = I_aveNotif*self._voltage*self.T_notif/self.dataDelivered/1000.0/8.0
+		I_aveNotif, _, dataDelivered = self._evaluate()
+		E_perBit = I_aveNotif*self.profile.voltage*self.T_notif/dataDelivered/1000.0/8.0
 		return E_perBit
 
 	def calcLifetime(self):
-		I_aveNotif, _ = self.calcAveCurrentandTime()
-		T_lifetime = self._battery/I_aveNotif/24.0/365.0
+		I_aveNotif, _, _ = self._evaluate()
+		T_lifetime = self.profile.battery/I_aveNotif/24.0/365.0
 		return T_lifetime
 
+	def calcNotificationSummary(self):
+		"""Returns the NotificationSummary of the charge, active time and data
+		delivered per notification, which give the results of any other
+		notification period without rebuilding the model"""
+		# notification works on numpy arrays, the model itself does not need numpy
+		from notification import NotificationSummary
+		I_aveNotif, T_active, dataDelivered = self._evaluate()
+		return NotificationSummary.fromResults(I_aveNotif, T_active, dataDelivered, self.T_notif, self.profile)
+
 	def calcAlohaCapcity(self):
 		#activeTime = (self.calcAveCurrentandTime()[1]-self.T_wakeup-self.T_radioPrep-\
 		#		self.T_radioOff-self.T_postproc-self.T_turnoff)
-		return self.T_notif/self.T_trans*(.5/math.e)*self.numof125KHzChannels
+		return self.T_notif/self.T_trans*(.5/math.e)*self.profile.numof125KHzChannels
+
+
+	def getT_txMin(self):
+		return dict(self.profile.T_txMin)
+
+	def setT_txMin(self, T_txMin):
+		self.profile = self.profile.replace(T_txMin=T_txMin)
+
+	T_txMin = property(getT_txMin, setT_txMin)
+
+
+# the chip and network settings read through to the profile
+for _field in chipprofile.FIELDS:
+	if _field != 'T_txMin':
+		setattr(LoRaWANEnergyModel, {'battery': '_battery', 'voltage': '_voltage'}.get(_field, _field),
+				chipprofile.profileProperty(_field))
+del _field
 
 
 """
@@ -0,0 +1,94 @@
+""" LoRaWAN Notification Summary
+The charge and the active time of one notification and the payload it
+delivers do not depend on the notification period T_notif: the period
+only adds the sleep between two notifications. The average current is
+therefore affine in 1/T_notif,
+
+	I_ave = (Q_active + I_sleep*(T_notif - T_active))/T_notif
+
+and a NotificationSummary taken from one model gives the average
+current, lifetime and energy per bit of any vector of notification
+periods in O(1) per period, without rebuilding the model or rerunning
+the retransmission expectation.
+
+A period shorter than the active time leaves a negative sleep time, the
+device cannot finish a notification before the next one is due. Such
+periods are saturated and are handled by the saturated argument:
+	'nan': the results are NaN (default)
+	'busy': the device notifies back to back, the period is T_active
+	'extrapolate': the affine formula as is, which is what
+		LoRaWANEnergyModel returns for such a period
+
+A summary of a model with drawn ACK timeouts holds the draws of that
+model, use expectedAckTO=True for reproducible sweeps.
+
+Examples:
+	lora = LoRaWANEnergyModel(dr=5, pl=20, expectedAckTO=True)
+	summary = lora.calcNotificationSummary()
+	t_notif = np.logspace(4, 8, 1000)
+	print summary.calcLifetime(t_notif)
+	print summary.isSaturated(t_notif).any()
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import numpy as np
+
+SATURATED = ('nan', 'busy', 'extrapolate')
+
+
+class NotificationSummary(object):
+
+	__slots__ = ('Q_active', 'T_active', 'dataDelivered', 'I_sleep', 'battery', 'voltage')
+
+	def __init__(self, Q_active, T_active, dataDelivered, profile):
+		"""NotificationSummary Initialization
+		Args:
+			Q_active: charge of the active phase of one notification (mA ms)
+			T_active: active time of one notification (ms)
+			dataDelivered: expected payload delivered per notification (bytes)
+			profile: chipprofile.ChipProfile of the sleep current and battery
+		"""
+		self.Q_active = Q_active
+		self.T_active = T_active
+		self.dataDelivered = dataDelivered
+		self.I_sleep = profile.I_sleep
+		self.battery = profile.battery
+		self.voltage = profile.voltage
+
+	@classmethod
+	def fromResults(cls, I_aveNotif, T_active, dataDelivered, t_notif, profile):
+		"""Summary of the average current, active time and data delivered a
+		model computed for the notification period t_notif"""
+		Q_active = I_aveNotif*t_notif - profile.I_sleep*(t_notif - T_active)
+		return cls(Q_active, T_active, dataDelivered, profile)
+
+	def isSaturated(self, t_notif):
+		"""True where the notification period is shorter than the active time"""
+		return np.asarray(t_notif) < self.T_active
+
+	def _period(self, t_notif, saturated):
+		assert saturated in SATURATED, "saturated must be one of %s" % ', '.join(SATURATED)
+		t_notif = np.asarray(t_notif, dtype=float)
+		if saturated == 'busy':
+			return np.maximum(t_notif, self.T_active)
+		if saturated == 'nan':
+			return np.where(self.isSaturated(t_notif), np.nan, t_notif)
+		return t_notif
+
+	def calcCharge(self, t_notif, saturated='nan'):
+		"""Charge of one notification period, active phase and sleep (mA ms)"""
+		t_notif = self._period(t_notif, saturated)
+		return self.Q_active + self.I_sleep*(t_notif - self.T_active)
+
+	def calcAveCurrent(self, t_notif, saturated='nan'):
+		t_notif = self._period(t_notif, saturated)
+		return (self.Q_active + self.I_sleep*(t_notif - self.T_active))/t_notif
+
+	def calcLifetime(self, t_notif, saturated='nan'):
+		return self.battery/self.calcAveCurrent(t_notif, saturated)/24.0/365.0
+
+	def calcEnergyperBit(self, t_notif, saturated='nan'):
+		return self.calcCharge(t_notif, saturated)*self.voltage/self.dataDelivered/1000.0/8.0
@@ -0,0 +1,53 @@
+""" NB-IoT chip and network profiles
+A ChipProfile holds the system parameters, the retry limits and number of
+devices, the measured chip powers and timings, the message sizes and the
+battery that NBIoTEnergyModel used to read from the config module. It is
+the profilebase.ChipProfile of the NB-IoT fields. Profiles are immutable and hashable, so
+every model built with the same profile shares one object, and a profile
+can be used as a cache key. Profiles are registered by name; 'default'
+holds the config values, 'alt1' and 'alt2' the two sets of alternative
+chip powers noted next to them in config.py.
+
+Examples:
+	profile = get('alt1')
+	print profile.P_txMax
+	nbiot = NBIoTEnergyModel(t_notif=10000000, profile=profile)
+	register('longDRX', get('default').replace(T_ls=10241))
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import config
+import profilebase
+from profilebase import profileProperty
+
+FIELDS = ('BW_sys', 'T_RAwin', 'numofsymbols_PDCCH', 'format_PDCCH', 'th_frag', 'numofPreambles', 'Wc',
+		'P_detect', 'RAretryMax', 'N_maxRAtry', 'N_devices', 'Ps', 'Pi', 'P_rx', 'P_txMax', 'P_txRB', 'P_txPre',
+		'T_pre', 'T_rxRA', 'T_rxCR', 'T_DRXi', 'T_ond', 'T_ls', 'T_i', 'T_wait', 'B_RBp', 'B_req', 'B_comp',
+		'B_scomp', 'B_reconfig', 'battery', 'voltage')
+
+
+class ChipProfile(profilebase.ChipProfile):
+	"""Immutable system, chip and battery settings, powers in mW, times in
+	ms, sizes in bytes, battery in mAh, voltage in V"""
+	FIELDS = FIELDS
+	__slots__ = FIELDS
+
+
+def fromConfig():
+	"""Returns the profile of the current config module values"""
+	values = dict((field, getattr(config, field)) for field in FIELDS if field not in ('battery', 'voltage'))
+	return ChipProfile(battery=config._battery, voltage=config._voltage, **values)
+
+
+_registry = profilebase.Registry(ChipProfile)
+PROFILES = _registry.profiles
+register = _registry.register
+get = _registry.get
+
+
+register('default', fromConfig())
+register('alt1', get('default').replace(Ps=.015, Pi=3.0, P_rx=90.0, P_txMax=545.0))
+register('alt2', get('default').replace(Ps=.03, Pi=10.0, P_rx=100.0, P_txMax=200.0))
@@ -1,9 +1,28 @@
 """
 model for calculating NB-IoT outage probablity which
 show the coverage of NB-IoT
+
+The total RA load R_t is the fixed point of calcR_tTest: the arrivals
+R_ave plus their retries, whose number depends on R_t through P_c and P_e.
+Above about one arrival per ms there can be several fixed points, the
+solvers return the lowest one, the operating point the load reaches when
+it grows from R_ave. solveR_t finds it with a bracketed Brent solver,
+solveR_tCurve solves a whole array of arrival rates at once. The
+probability functions accept numpy arrays as well as floats.
+
+Examples:
+    solution = solveR_t(2.0)
+    print solution['R_t'], solution['P_out'], solution['evaluations']
+    curve = solveR_tCurve([.1*x for x in range(1, 40)])
+    print curve['P_out']
+    plotOutage([.1*x for x in range(1, 40)], curve['P_out'], 'outage.png')
+
+matplotlib is only imported by plotOutage, so the solvers can be used
+headless without paying for it.
 """
 import math
-import matplotlib.pyplot as plt
+
+import numpy as np
 
 N_frag = 6.0
 B_data = 100.0
@@ -29,14 +48,14 @@ def calcP_c(R_t):
 
 def calcP_e(R_t):
     R_pre = R_t*T_RAO/d
-    R_s = R_pre*math.exp(-R_pre)*d/T_RAO
-    R_a = (1-math.exp(-R_pre))*d/T_RAO
+    R_s = R_pre*np.exp(-R_pre)*d/T_RAO
+    R_a = (1-np.exp(-R_pre))*d/T_RAO
 
-    R_PDCCH = (1-math.exp(-R_t*T_RAO))/T_RAO+R_s*(2+math.ceil(B_data/(N_frag*B_RB)))
+    R_PDCCH = (1-np.exp(-R_t*T_RAO))/T_RAO+R_s*(2+math.ceil(B_data/(N_frag*B_RB)))
     N_PDCCH = 3.0 #  number of PDCCH pointers per subframe
     T_PDCCH = 10.0
 
-    R_PDSCH = math.ceil(R_a*B_RAR/B_RB)+R_s*(math.ceil(B_conn/B_RB))
+    R_PDSCH = np.ceil(R_a*B_RAR/B_RB)+R_s*(math.ceil(B_conn/B_RB))
     N_PDSCH  = 3.0 # number of resource blocks in PDSCH
     T_PDSCH = 40.0
 
@@ -65,31 +84,237 @@ def calcP_out(P_e, P_c):
 def calP_q(R, N, T):
   p = R/N
   T_d = T-(1.0/N)
-  omega = math.exp(-N*(1-p)*T_d)
+  omega = np.exp(-N*(1-p)*T_d)
   return (1-p)*p*omega/(1-p**2*omega)
 
-P_outs = []
+def calcR_tResidual(R_t, R_ave):
+    """Offered RA load minus R_t, zero at the fixed point"""
+    return calcR_tTest(calcP_e(R_t), calcP_c(R_t), R_ave)-R_t
 
-R_aves = [.1*x for x in range(1, 40, 1)]
-for R_ave in R_aves:
-    R_t = R_ave +.001
-    P_e = calcP_e(R_t)
+def calcR_tBracket(R_ave, numofPoints=64, lo=None, hi=None, iterations=64):
+    """Bracket of the lowest fixed point. Below it the offered load exceeds
+    R_t, so the iteration R_t = calcR_tTest(...) from R_ave rises towards
+    the lowest fixed point without passing it, however close the next fixed
+    points are; a few iterations give the lower end of the search. The
+    residual is negative at R_ave*(m+1), where every retry is used, and the
+    first sign change on a grid of numofPoints between them, spaced finely
+    near the lower end, is returned. Below one arrival per RAO calcP_c is
+    negative and the residual can already be negative at R_ave, the bracket
+    is then (R_ave, R_ave), i.e. no retries.
+    Args:
+        lo, hi: arrays of narrower bounds of the lowest fixed point to search, lo not above it
+        iterations: most fixed point iterations from lo
+    Returns:
+        lower and upper bound arrays and the number of evaluations
+    """
+    R_ave = np.atleast_1d(np.asarray(R_ave, dtype=float))
+    lo = R_ave if lo is None else np.asarray(lo, dtype=float)
+    hi = R_ave*(m+1) if hi is None else hi
+    evaluations = 0
+    for _ in range(iterations):
+        residual = calcR_tResidual(lo, R_ave)
+        evaluations += len(R_ave)
+        rising = residual > 1e-12*lo
+        if not np.any(rising):
+            break
+        lo = np.where(rising, np.minimum(lo+residual, hi), lo)
+    grid = lo+(hi-lo)*np.linspace(0, 1, numofPoints)[:, None]**3
+    residual = calcR_tResidual(grid, R_ave)
+    first = np.argmax(residual <= 0, axis=0)
+    columns = np.arange(len(R_ave))
+    return grid[np.maximum(first-1, 0), columns], grid[first, columns], evaluations+grid.size
+
+def _coverageResult(R_t):
     P_c = calcP_c(R_t)
-    while calcR_tTest(P_e, P_c, R_ave)-R_t > .1:
-        R_t += .001
-        P_e = calcP_e(R_t)
-        P_c = calcP_c(R_t)
-
-    print R_ave
-    print P_c
-    print P_e
-    print R_t
-    P_outs.append(calcP_out(P_e, P_c))
-R_aves = [x*1000 for x in R_aves]
-plt.plot(R_aves, P_outs, 'yx-', label='NB-IoT 1.4MHz')
-plt.xlabel('Arrivals/s')
-plt.ylabel('Outage Probability')
-plt.title('NB-IoT Outage Probability vs Arrival Rate')
-plt.ylim(-.01,.5)
-plt.legend()
-plt.show()
+    P_e = calcP_e(R_t)
+    return {'R_t': R_t, 'P_c': P_c, 'P_e': P_e, 'P_out': calcP_out(P_e, P_c)}
+
+def solveR_t(R_ave, bracket=None, xtol=1e-12, rtol=1e-12, maxiter=100):
+    """Brent solver for the RA load fixed point of one arrival rate
+    Returns:
+        dict with R_t, P_c, P_e and P_out at the fixed point, and the
+        convergence diagnostics iterations, evaluations, residual, converged;
+        a residual that is not finite, e.g. beyond the capacity of the
+        channels, is returned as not converged
+    """
+    evaluations = 2
+    if bracket is None:
+        a, b, evaluations = calcR_tBracket(R_ave)
+        a, b = a[0], b[0]
+        evaluations += 2
+    else:
+        a, b = bracket
+    fa = calcR_tResidual(a, R_ave)
+    fb = calcR_tResidual(b, R_ave)
+    if not (np.isfinite(fa) and np.isfinite(fb)):
+        result = _coverageResult(b)
+        result.update({'iterations': 0, 'evaluations': evaluations,
+                       'residual': fb if not np.isfinite(fb) else fa, 'converged': False})
+        return result
+    if fa <= 0:
+        result = _coverageResult(a)
+        result.update({'iterations': 0, 'evaluations': evaluations,
+                       'residual': fa, 'converged': True})
+        return result
+    assert fb <= 0, "the bracket does not contain the fixed point"
+    c, fc = a, fa
+    e = d_step = b-a
+    converged = False
+    iteration = 0
+    for iteration in range(1, maxiter+1):
+        if fb*fc > 0:
+            c, fc = a, fa
+            e = d_step = b-a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2*rtol*abs(b)+xtol/2
+        xm = (c-b)/2
+        if abs(xm) <= tol or fb == 0:
+            converged = True
+            break
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # inverse quadratic interpolation, or secant if only two points
+            s = fb/fa
+            if a == c:
+                p = 2*xm*s
+                q = 1-s
+            else:
+                q = fa/fc
+                r = fb/fc
+                p = s*(2*xm*q*(q-r)-(b-a)*(r-1))
+                q = (q-1)*(r-1)*(s-1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2*p < min(3*xm*q-abs(tol*q), abs(e*q)):
+                e = d_step
+                d_step = p/q
+            else:
+                e = d_step = xm
+        else:
+            e = d_step = xm
+        a, fa = b, fb
+        b += d_step if abs(d_step) > tol else math.copysign(tol, xm)
+        fb = calcR_tResidual(b, R_ave)
+        evaluations += 1
+        if not np.isfinite(fb):
+            break
+
+    result = _coverageResult(b)
+    result.update({'iterations': iteration, 'evaluations': evaluations,
+                   'residual': fb, 'converged': converged})
+    return result
+
+def _solveBracketed(R_aves, lo, hi, xtol, rtol, maxiter):
+    """Illinois false position on every bracket of the arrays at once, a
+    bracket with a residual that is not finite stops as not converged"""
+    a, b = lo.copy(), hi.copy()
+    fa = calcR_tResidual(a, R_aves)
+    fb = calcR_tResidual(b, R_aves)
+    evaluations = 2*len(R_aves)
+    finite = np.isfinite(fa) & np.isfinite(fb)
+    atLower = fa <= 0
+    converged = finite & (atLower | (fb == 0) | (np.abs(b-a) <= xtol+rtol*np.abs(b)))
+    b = np.where(atLower, a, b)
+    fb = np.where(atLower, fa, fb)
+    iterations = np.zeros(len(R_aves), dtype=int)
+    for iteration in range(maxiter):
+        active = np.flatnonzero(~converged & finite)
+        if len(active) == 0:
+            break
+        aa, ba, faa, fba = a[active], b[active], fa[active], fb[active]
+        denominator = fba-faa
+        c = np.where(denominator != 0, ba-fba*(ba-aa)/np.where(denominator != 0, denominator, 1), (aa+ba)/2)
+        # fall back to bisection if the secant leaves the bracket
+        inside = (c-np.minimum(aa, ba))*(np.maximum(aa, ba)-c) > 0
+        c = np.where(inside, c, (aa+ba)/2)
+        fc = calcR_tResidual(c, R_aves[active])
+        evaluations += len(active)
+        iterations[active] += 1
+
+        swap = fc*fba < 0
+        a[active] = np.where(swap, ba, aa)
+        fa[active] = np.where(swap, fba, faa/2)
+        b[active] = c
+        fb[active] = fc
+        finite[active] = np.isfinite(fc)
+        converged[active] = finite[active] & ((fc == 0) | (np.abs(c-a[active]) <= xtol+rtol*np.abs(c)))
+    return b, fb, iterations, evaluations, converged
+
+def solveR_tCurve(R_aves, stride=8, xtol=1e-12, rtol=1e-12, maxiter=200):
+    """Vectorized solver for the RA load fixed point of an array of arrival rates
+    Every stride-th rate of the sorted array is solved first within the
+    bracket of calcR_tBracket. The lowest fixed points of the rates in
+    between lie between those of their solved neighbours, because the
+    offered load grows with R_ave. That range can hold several fixed points
+    where the curve jumps to its upper branch, so it is searched for its
+    first sign change like the full range, on a grid at least as fine.
+    Returns:
+        dict of arrays R_t, P_c, P_e, P_out, residual, iterations and
+        converged in the order of R_aves, and the total evaluations
+    """
+    R_aves = np.asarray(R_aves, dtype=float)
+    order = np.argsort(R_aves)
+    sortedR = R_aves[order]
+    n = len(sortedR)
+    R_t = np.empty(n)
+    residual = np.empty(n)
+    iterations = np.zeros(n, dtype=int)
+    converged = np.zeros(n, dtype=bool)
+
+    coarse = np.unique(np.append(np.arange(0, n, stride), n-1)) if n else np.arange(0)
+    lo, hi, evaluations = calcR_tBracket(sortedR[coarse])
+    R_t[coarse], residual[coarse], iterations[coarse], coarseEvaluations, converged[coarse] = \
+        _solveBracketed(sortedR[coarse], lo, hi, xtol, rtol, maxiter)
+    evaluations += coarseEvaluations
+
+    fine = np.setdiff1d(np.arange(n), coarse)
+    if len(fine):
+        right = np.searchsorted(coarse, fine)
+        lo = np.maximum(R_t[coarse[right-1]], sortedR[fine])
+        hi = np.minimum(R_t[coarse[right]], sortedR[fine]*(m+1))
+        lo, hi, gridEvaluations = calcR_tBracket(sortedR[fine], lo=lo, hi=np.maximum(lo, hi))
+        R_t[fine], residual[fine], iterations[fine], fineEvaluations, converged[fine] = \
+            _solveBracketed(sortedR[fine], lo, hi, xtol, rtol, maxiter)
+        evaluations += gridEvaluations+fineEvaluations
+
+    result = {}
+    unsorted = np.empty(n, dtype=int)
+    unsorted[order] = np.arange(n)
+    for key, value in _coverageResult(R_t).items() + [('residual', residual),
+            ('iterations', iterations), ('converged', converged)]:
+        result[key] = value[unsorted]
+    result['evaluations'] = evaluations
+    return result
+
+
+def plotOutage(R_aves, P_outs, path=None):
+    """Plots the outage probability against the arrival rate (arrivals/ms),
+    shown on screen or saved to path"""
+    import matplotlib
+    if path is not None:
+        matplotlib.use('Agg', warn=False) # headless when only saving
+    import matplotlib.pyplot as plt
+    plt.plot([x*1000 for x in R_aves], P_outs, 'yx-', label='NB-IoT 1.4MHz')
+    plt.xlabel('Arrivals/s')
+    plt.ylabel('Outage Probability')
+    plt.title('NB-IoT Outage Probability vs Arrival Rate')
+    plt.ylim(-.01,.5)
+    plt.legend()
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path)
+
+
+if __name__ == '__main__':
+    R_aves = [.1*x for x in range(1, 40, 1)]
+    curve = solveR_tCurve(R_aves)
+    for R_ave, P_c, P_e, R_t in zip(R_aves, curve['P_c'], curve['P_e'], curve['R_t']):
+        print R_ave
+        print P_c
+        print P_e
+        print R_t
+    print '%d model evaluations' % curve['evaluations']
+    plotOutage(R_aves, curve['P_out'])
@@ -0,0 +1,192 @@
+""" NB-IoT Batch Energy Model
+Vectorized counterpart of NBIoTEnergyModel. Every constructor argument
+can be a scalar or an array, the arguments are broadcast against each
+other and all results are returned as numpy arrays of the broadcast
+shape. The arithmetic follows the closed form of NBIoTEnergyModel term
+by term, so each element matches the scalar class to floating-point
+tolerance.
+
+Branches are taken on the real part and counts (ceil, floor) are taken of
+the real part, so the model also evaluates complex inputs, which
+sensitivity.py uses for its derivatives.
+
+Examples:
+	nbiot = NBIoTBatchModel(pl=[20, 200], t_notif=np.logspace(4, 8, 50)[:, None])
+	results = nbiot.evaluate()
+	print results['lifetime'].shape
+	print 'Energy per Bit is %s mJ' % nbiot.calcEnergyperBit()
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import numpy as np
+
+import chipprofile
+
+
+def _expm1MinusX(y):
+	"""exp(y)-1-y without cancellation for small y"""
+	# Taylor series up to y**16/16! for |y| < .5, nested from the last term,
+	# the terms left out are below 1e-17 of the sum as in the scalar model
+	series = 0.0
+	for k in range(16, 2, -1):
+		series = y/k*(1 + series)
+	series = y*y/2.0*(1 + series)
+	return np.where(np.abs(np.real(y)) < .5, series, np.expm1(y) - y)
+
+def _oneMinusPow(t, n):
+	"""1-(1-t)**n without cancellation for small t"""
+	small = np.real(t) < .5
+	return np.where(small, -np.expm1(n*np.log1p(-np.where(small, t, 0))), 1.0 - (1.0-t)**n)
+
+def _geometricSum(t, n):
+	"""sum of (1-t)**i for i in range(n)"""
+	zero = np.real(t) == 0
+	return np.where(zero, n, _oneMinusPow(t, n)/np.where(zero, 1, t))
+
+def _expGeometricSum(x, n):
+	"""sum of exp(-x*i) for i in range(n)"""
+	zero = np.real(x) == 0
+	return np.where(zero, n, np.expm1(-n*x)/np.expm1(-np.where(zero, 1, x)))
+
+def _expWeightedSteps(x, n):
+	"""sum of i*exp(-x*(i-1))*(1-exp(-x)) for i in range(1, n+1), the expected
+	number of steps of a Poisson arrival truncated at n steps"""
+	E_1 = np.expm1(-np.where(np.real(x) == 0, 1, x))
+	E_n = np.expm1(-n*x)
+	large = np.real(n*x) >= 1
+	steps = np.where(large, E_n/E_1 - n*np.exp(-n*x),
+			(n*_expm1MinusX(-x) - _expm1MinusX(-n*x) + n*E_n*E_1)/(-E_1))
+	return np.where((np.real(n) <= 0) | (np.real(x) == 0), 0.0, steps)
+
+def _divide(a, b, trueDivision):
+	"""a/b, to the floor of the real part unless trueDivision"""
+	if trueDivision:
+		return a/(b*1.0)
+	return np.floor(np.real(a/(b*1.0)))
+
+def _backoffSum(Wc, trueDivision):
+	"""sum of (Wc-k)/Wc for k in range(Wc-1); divided to the floor only k=0 adds 1"""
+	if trueDivision:
+		return (Wc*(Wc+1)/2.0-1)/Wc
+	return np.where(np.real(Wc) >= 2, 1.0, 0.0)
+
+
+class NBIoTBatchModel:
+
+	def __init__(self, pl=100, t_notif=1000000, p_c=0, p_e=0, trueDivision=False, profile='default'):
+		"""NBIoTBatchModel Initialization
+		Args:
+			pl: payload array (bytes)
+			t_notif: mean inter arrival time array (ms)
+			p_c: collision probability array of the RA procedure
+			p_e: error probability array of the CR procedure
+			trueDivision: divide the message sizes and the backoff counter as real numbers,
+				see NBIoTEnergyModel
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.profile = chipprofile.get(profile)
+		pl, t_notif, p_c, p_e = np.broadcast_arrays(pl, t_notif, p_c, p_e)
+		self.B_data = pl # (bytes) payload
+		self.B_dataCP = self.B_data+44 # (bytes) RRC UL transfer + NAS control plane SR + Bdata message size for CP
+		self.B_compCP = self.B_dataCP # (bytes) RRC Setup Complete + NAS control plane SR + Bdata message size for CP
+		self.P_c = p_c*1.0
+		self.P_e = p_e*1.0
+		self.IAT = t_notif*1.0
+		self.R_ave = self.profile.N_devices/self.IAT # average data rate follow Poisson model
+		self.trueDivision = trueDivision
+
+		self._results = None
+
+
+	def calcStatesProb(self):
+		# same expressions as NBIoTEnergyModel.calcStatesProb
+		p = self.profile
+		m = p.N_maxRAtry
+		R = self.R_ave
+		L = p.T_ls + p.T_ond
+
+		P_1_tx = np.exp(-R*p.T_i)
+		P_tx = -np.expm1(-R*p.T_i)
+		txRatio = np.expm1(R*p.T_i) # P_tx/P_1_tx
+		self.P_a = -np.expm1(-R*p.T_DRXi)
+		self.P_lc = -np.expm1(-R*L)
+		P_on = -np.expm1(-R)
+
+		self.Nc = np.floor(np.real((p.T_i-p.T_DRXi)/(L))) # number of long DRX cycles
+
+		s = self.P_e*(1-self.P_c) +self.P_c
+		t = (1-self.P_e)*(1-self.P_c)
+		aux = 2.0-P_tx + txRatio*(3.0-P_tx+(1.0-self.P_a)*_expGeometricSum(R*L, self.Nc))
+
+		self.b_off = (1 + P_on*(1+s**(m+1)+(1.0-self.P_c)*_geometricSum(t, m+1)\
+		                + s*(1+p.Wc)/2.0*_geometricSum(t, m)+_oneMinusPow(t, m+1)*aux))**(-1)
+		self.b_00 = P_on*self.b_off
+		self.b_drop = s**(m+1)*self.b_00
+		self.b_connect = _oneMinusPow(t, m)*self.b_00
+
+		self.b_active = txRatio*self.b_connect
+		self.b_tx = self.b_active
+		self.b_inactive = P_1_tx*(self.b_active+self.b_connect)
+
+		self.N_p = self.b_connect*(1+txRatio)
+
+
+	def calcStatesEnergy(self):
+		self.calcStatesProb()
+		p = self.profile
+		self.E_off = p.Ps
+		self.E_00 = p.T_pre*p.Pi + p.T_rxRA*p.P_rx + p.P_txPre
+		self.E_i0 = self.E_00
+		self.E_ik = p.Pi
+		self.E_CRi = p.T_rxCR*p.P_rx + p.P_txRB*(np.ceil(np.real(_divide(p.B_req, p.B_RBp, self.trueDivision)))+\
+						np.ceil(np.real(_divide(self.B_compCP, p.B_RBp, self.trueDivision))))
+		self.E_connect = 0
+
+		R = self.R_ave
+		L = p.T_ls + p.T_ond
+		self.E_active = (_expWeightedSteps(R, p.T_DRXi-1) + np.exp(-R*(p.T_DRXi-2))*p.T_DRXi)*p.P_rx
+		self.E_LC = _expWeightedSteps(R, L-1)*p.Pi + np.exp(-R*(L-1))*(p.T_ls*p.Pi+p.T_ond*p.P_rx)
+
+		self.E_tx = p.P_txRB*np.ceil(np.real(_divide(self.B_dataCP, p.B_RBp, self.trueDivision)))
+		self.E_inactive = p.T_wait*p.P_rx
+		self.E_drop = 0
+
+
+	def calcEnergyperPacket(self):
+		if self._results is None:
+			self.calcStatesEnergy()
+			p = self.profile
+			E_ave = (self.b_off*self.E_off+self.b_connect*self.E_connect+self.b_drop*self.E_drop+\
+					self.b_active*self.E_active+self.b_00*self.E_00+self.b_inactive*self.E_inactive+\
+					self.b_tx*self.E_tx)
+
+			# sum of CR states average energy, retransmission i has weight s**i
+			t = (1-self.P_e)*(1-self.P_c)
+			m = p.N_maxRAtry
+			s = self.P_e*(1-self.P_c) +self.P_c
+			sumb_i0 = s*_geometricSum(t, m)*self.b_00
+			sumBackoff = _backoffSum(p.Wc, self.trueDivision)
+			E_CRsum = (1-self.P_c)*self.b_00*self.E_CRi + sumb_i0*(self.E_i0 + (1-self.P_c)*self.E_CRi +\
+						sumBackoff*self.E_ik)
+
+			# sum of LC states average energy, long DRX cycle n has weight (1-P_lc)**n
+			E_LCsum = _expGeometricSum(self.R_ave*(p.T_ls+p.T_ond), self.Nc)*(1-self.P_a)*self.b_active*self.E_LC
+
+			self._results = (E_ave+E_CRsum+E_LCsum)/self.N_p/1000
+		return self._results
+
+	def calcEnergyperBit(self):
+		return self.calcEnergyperPacket()/(self.B_data)/8
+
+	def calcLifetime(self):
+		E_total = self.profile.battery*self.profile.voltage
+		return E_total*3600/self.calcEnergyperPacket()*self.IAT/3600000/24/365
+
+	def evaluate(self):
+		"""Returns a dict with every result array of the batch"""
+		return {'energyperPacket': self.calcEnergyperPacket(),
+				'energyperBit': self.calcEnergyperBit(),
+				'lifetime': self.calcLifetime()}
@@ -27,72 +27,153 @@ Peter (Jun) Ye
 # import libraries
 import math
 
-import config
-
-class NBIoTEnergyModel:
-
-	def __init__(self, pl=100, t_notif=1000000, p_c=0, p_e=0):
-
+import chipprofile
+
+
+def _expm1MinusX(y):
+	"""exp(y)-1-y without cancellation for small y"""
+	if abs(y) < .5:
+		term = y*y/2.0
+		total = term
+		k = 2
+		while abs(term) > 1e-17*abs(total):
+			k += 1
+			term *= y/k
+			total += term
+		return total
+	return math.expm1(y) - y
+
+def _oneMinusPow(t, n):
+	"""1-(1-t)**n without cancellation for small t"""
+	if t >= .5:
+		return 1.0 - (1.0-t)**n
+	return -math.expm1(n*math.log1p(-t))
+
+def _geometricSum(t, n):
+	"""sum of (1-t)**i for i in range(n)"""
+	if t == 0:
+		return float(n)
+	return _oneMinusPow(t, n)/t
+
+def _expGeometricSum(x, n):
+	"""sum of exp(-x*i) for i in range(n)"""
+	if x == 0:
+		return float(n)
+	return math.expm1(-n*x)/math.expm1(-x)
+
+def _expWeightedSteps(x, n):
+	"""sum of i*exp(-x*(i-1))*(1-exp(-x)) for i in range(1, n+1), the expected
+	number of steps of a Poisson arrival truncated at n steps"""
+	if n <= 0 or x == 0:
+		return 0.0
+	E_1 = math.expm1(-x)
+	if n*x >= 1:
+		return math.expm1(-n*x)/E_1 - n*math.exp(-n*x)
+	E_n = math.expm1(-n*x)
+	return (n*_expm1MinusX(-x) - _expm1MinusX(-n*x) + n*E_n*E_1)/(-E_1)
+
+def _divide(a, b, trueDivision):
+	"""a/b, to the floor unless trueDivision, as the original model divided
+	its integral message sizes and backoff window"""
+	if trueDivision:
+		return a/float(b)
+	return a//b
+
+def _backoffSum(Wc, trueDivision):
+	"""sum of (Wc-k)/Wc for k in range(Wc-1); divided to the floor only k=0 adds 1"""
+	if trueDivision:
+		return (Wc*(Wc+1)/2.0-1)/Wc
+	return 1 if Wc >= 2 else 0
+
+class NBIoTEnergyModel(object):
+
+	__slots__ = ('B_data', 'B_dataCP', 'B_compCP', 'P_c', 'P_e', 'IAT', 'R_ave', 'reference', 'trueDivision', 'profile',
+				'P_a', 'P_lc', 'Nc', 'N_p', 'b_off', 'b_00', 'b_drop', 'b_connect', 'b_active', 'b_tx',
+				'b_LCn', 'b_inactive', 'E_off', 'E_00', 'E_i0', 'E_ik', 'E_CRi', 'E_connect', 'E_active',
+				'E_LC', 'E_tx', 'E_inactive', 'E_drop')
+
+	def __init__(self, pl=100, t_notif=1000000, p_c=0, p_e=0, reference=False, trueDivision=False,
+				profile='default'):
+		"""NBIoTEnergyModel Initialization
+		Args:
+			pl: payload (bytes)
+			t_notif: mean inter arrival time (ms)
+			p_c: collision probability of the RA procedure
+			p_e: error probability of the CR procedure
+			reference: evaluate the state sums term by term instead of in closed form
+			trueDivision: divide the message sizes by B_RBp and the backoff counter by Wc
+				as real numbers; by default they are divided to the floor as in the
+				original model, whatever the type of pl
+			profile: chipprofile.ChipProfile or name of a registered one
+
+		The system parameters, chip powers and timings, message sizes and
+		battery are read from the shared profile, e.g. nbiot.Pi is
+		nbiot.profile.Pi; assigning one of them gives this model its own copy
+		of the profile.
+		"""
 		self.B_data = pl # (bytes) payload
 		self.B_dataCP = self.B_data+44#20 # (bytes) RRC UL transfer + NAS control plane SR + Bdata message size for CP
 		self.B_compCP = self.B_dataCP#+9 # (bytes) RRC Setup Complete + NAS control plane SR + Bdata message size for CP
-		# system parameters
-		self.BW_sys = config.BW_sys
-		self.T_RAwin = config.T_RAwin
-		self.numofsymbols_PDCCH = config.numofsymbols_PDCCH
-		self.format_PDCCH = config.format_PDCCH
-		self.th_frag = config.th_frag
-		self.numofPreambles = config.numofPreambles
-		self.Wc = config.Wc
-		self.P_detect = config.P_detect
-		self.RAretryMax = config.RAretryMax
-
-		# measured parameters, value varies for different NB-IoT chip
-		self.Ps = config.Ps
-		self.Pi = config.Pi
-		self.P_rx = config.P_rx
-		self.P_txMax = config.P_txMax
-		self.P_txRB = config.P_txRB
-		self.P_txPre = config.P_txPre
-		self.T_pre = config.T_pre
-		self.T_rxRA = config.T_rxRA
-		self.T_rxCR = config.T_rxCR
-
-		self.T_DRXi = config.T_DRXi
-		self.T_ond = config.T_ond
-		self.T_ls = config.T_ls
-		self.T_i = config.T_i
-		self.T_wait = config.T_wait
-
-		self.B_RBp = config.B_RBp
-		self.B_req = config.B_req
-		self.B_comp = config.B_comp
-		self.B_scomp = config.B_scomp
-		self.B_reconfig = config.B_reconfig
-
-		# battery setting
-		self._battery = config._battery
-		self._voltage = config._voltage
+		self.profile = chipprofile.get(profile)
 
 		self.P_c = p_c
 		self.P_e = p_e
 		self.IAT = t_notif
-		self.R_ave = float(config.N_devices)/self.IAT # average data rate follow Poisson model
+		self.R_ave = float(self.profile.N_devices)/self.IAT # average data rate follow Poisson model
+		self.reference = reference # evaluate the state sums term by term instead of in closed form
+		self.trueDivision = trueDivision
 
 
 	def calcStatesProb(self):
-		m = config.N_maxRAtry
+		if self.reference:
+			return self._calcStatesProbLoop()
+		p = self.profile
+		m = p.N_maxRAtry
+		R = self.R_ave
+		L = p.T_ls + p.T_ond
+
+		P_1_tx = math.exp(-R*p.T_i)
+		P_tx = -math.expm1(-R*p.T_i) # data transmission probability before Ti expires
+		txRatio = math.expm1(R*p.T_i) # P_tx/P_1_tx
+		self.P_a = -math.expm1(-R*p.T_DRXi) # transmission probability before TDRXi expires
+		self.P_lc = -math.expm1(-R*L) # probability of transmission before Tls + Tond expires
+		P_on = -math.expm1(-R) # probability of having uplink traffic in a subframe
+
+		self.Nc = math.floor((p.T_i-p.T_DRXi)/(L)) # number of long DRX cycles
+
+		# steady state probability
+		s = self.P_e*(1-self.P_c) +self.P_c
+		t = (1-self.P_e)*(1-self.P_c) # 1-s, kept separately so that small values do not cancel
+		aux = 2.0-P_tx + txRatio*(3.0-P_tx+(1.0-self.P_a)*_expGeometricSum(R*L, self.Nc))
+
+		self.b_off = (1 + P_on*(1+s**(m+1)+(1.0-self.P_c)*_geometricSum(t, m+1)\
+		                + s*(1+p.Wc)/2.0*_geometricSum(t, m)+_oneMinusPow(t, m+1)*aux))**(-1)
+		self.b_00 = P_on*self.b_off
+		self.b_drop = s**(m+1)*self.b_00
+		self.b_connect = _oneMinusPow(t, m)*self.b_00
+
+		self.b_active = txRatio*self.b_connect
+		self.b_tx = self.b_active
+		self.b_LCn = (1-self.P_a)*self.b_active
+		self.b_inactive = P_1_tx*(self.b_active+self.b_connect)
+
+		self.N_p = self.b_connect*(1+txRatio) # number of packets sent while the device is in RRC Connected
+
+
+	def _calcStatesProbLoop(self):
+		p = self.profile
+		m = p.N_maxRAtry
 		P_fail = 1.0-(1-self.P_e)*(1-self.P_c)
 
 		P_out = P_fail**(m+1) # outage probability
 
-		P_1_tx = math.exp(-self.R_ave*self.T_i)
+		P_1_tx = math.exp(-self.R_ave*p.T_i)
 		P_tx = 1.0-P_1_tx # data transmission probability before Ti expires
-		self.P_a = 1.0- math.exp(-self.R_ave*(self.T_DRXi)) # transmission probability before TDRXi expires
-		self.P_lc = 1.0- math.exp(-self.R_ave*(self.T_ls + self.T_ond)) # probability of transmission before Tls + Tond expires
+		self.P_a = 1.0- math.exp(-self.R_ave*(p.T_DRXi)) # transmission probability before TDRXi expires
+		self.P_lc = 1.0- math.exp(-self.R_ave*(p.T_ls + p.T_ond)) # probability of transmission before Tls + Tond expires
 		P_on = 1- math.exp(-self.R_ave) # probability of having uplink traffic in a subframe
 
-		self.Nc = math.floor((self.T_i-self.T_DRXi)/(self.T_ls+self.T_ond)) # number of long DRX cycles
+		self.Nc = math.floor((p.T_i-p.T_DRXi)/(p.T_ls+p.T_ond)) # number of long DRX cycles
 
 		# steady state probability
 		k = 0 # kth backoff counter
@@ -102,10 +183,10 @@ class NBIoTEnergyModel:
 		aux = 2.0-P_tx + P_tx/(P_1_tx)*(3.0-P_tx+(1.0-self.P_a)*(1.0-(1.0-self.P_lc)**self.Nc)/self.P_lc)
 
 		self.b_off = (1 + P_on*(1+s**(m+1)+(1-s**(m+1))*(1.0-self.P_c)/(1-s)\
-		                + s*(1-s**m)*(1+self.Wc)/2/(1-s)+(1-s**(m+1))*aux))**(-1)
+		                + s*(1-s**m)*(1+p.Wc)/2.0/(1-s)+(1-s**(m+1))*aux))**(-1)
 		self.b_00 = P_on*self.b_off
 		b_i0 = (self.P_e*(1-self.P_c)+self.P_c)**i*self.b_00
-		b_ik = (self.Wc-k)/self.Wc*b_i0
+		b_ik = _divide(p.Wc-k, p.Wc, self.trueDivision)*b_i0
 		b_CRi = (1-self.P_c)*b_i0
 		self.b_drop = (self.P_e*(1-self.P_c)+self.P_c)**(m+1)*self.b_00
 
@@ -124,48 +205,84 @@ class NBIoTEnergyModel:
 
 	def calcStatesEnergy(self):
 		self.calcStatesProb()
+		p = self.profile
 		# energy of states
-		self.E_off = self.Ps
-		self.E_00 = self.T_pre*self.Pi + self.T_rxRA*self.P_rx + self.P_txPre
+		self.E_off = p.Ps
+		self.E_00 = p.T_pre*p.Pi + p.T_rxRA*p.P_rx + p.P_txPre
 		self.E_i0 = self.E_00
-		self.E_ik = self.Pi
-		self.E_CRi = self.T_rxCR*self.P_rx + self.P_txRB*(math.ceil(self.B_req/self.B_RBp)+math.ceil(self.B_compCP/self.B_RBp))
+		self.E_ik = p.Pi
+		self.E_CRi = p.T_rxCR*p.P_rx + p.P_txRB*(math.ceil(_divide(p.B_req, p.B_RBp, self.trueDivision))+\
+						math.ceil(_divide(self.B_compCP, p.B_RBp, self.trueDivision)))
 		self.E_connect = 0
 
+		if self.reference:
+			self._calcActiveLCEnergyLoop()
+		else:
+			R = self.R_ave
+			L = p.T_ls + p.T_ond
+			self.E_active = (_expWeightedSteps(R, p.T_DRXi-1) + math.exp(-R*(p.T_DRXi-2))*p.T_DRXi)*p.P_rx
+			self.E_LC = _expWeightedSteps(R, L-1)*p.Pi + math.exp(-R*(L-1))*(p.T_ls*p.Pi+p.T_ond*p.P_rx)
+
+		self.E_tx = p.P_txRB *(math.ceil(_divide(self.B_dataCP, p.B_RBp, self.trueDivision)))
+		self.E_inactive = p.T_wait*p.P_rx
+		self.E_drop = 0
+
+
+	def _calcActiveLCEnergyLoop(self):
+		p = self.profile
 		tempSum = 0
-		for i in xrange(1, self.T_DRXi):
+		for i in xrange(1, p.T_DRXi):
 		    tempSum += math.exp(-self.R_ave*(i-1))*(1-math.exp(-self.R_ave))*i
 
-		self.E_active = (tempSum + math.exp(-self.R_ave*(i-1))*self.T_DRXi)*self.P_rx
+		self.E_active = (tempSum + math.exp(-self.R_ave*(i-1))*p.T_DRXi)*p.P_rx
 
 		tempSum = 0
-		for i in xrange(1, self.T_ls+self.T_ond):
-		    tempSum += math.exp(-self.R_ave*(i-1))*(1-math.exp(-self.R_ave))*i*self.Pi
+		for i in xrange(1, p.T_ls+p.T_ond):
+		    tempSum += math.exp(-self.R_ave*(i-1))*(1-math.exp(-self.R_ave))*i*p.Pi
 
-		self.E_LC = tempSum+math.exp(-self.R_ave*(self.T_ls+self.T_ond-1))*(self.T_ls*self.Pi+self.T_ond*self.P_rx)
-
-		self.E_tx = self.P_txRB *(math.ceil(self.B_dataCP/self.B_RBp))
-		self.E_inactive = self.T_wait*self.P_rx
-		self.E_drop = 0
+		self.E_LC = tempSum+math.exp(-self.R_ave*(p.T_ls+p.T_ond-1))*(p.T_ls*p.Pi+p.T_ond*p.P_rx)
 
 
 	def calcEnergyperPacket(self):
 		self.calcStatesEnergy()
+		p = self.profile
 		# calculate average energy per packet
 		E_ave = (self.b_off*self.E_off+self.b_connect*self.E_connect+self.b_drop*self.E_drop+self.b_active*self.E_active+\
 		              self.b_00*self.E_00+self.b_inactive*self.E_inactive+self.b_tx*self.E_tx)
 
+		if self.reference:
+			E_CRsum, E_LCsum = self._calcCRandLCEnergyLoop()
+		else:
+			# sum of CR states average energy, retransmission i has weight s**i
+			t = (1-self.P_e)*(1-self.P_c)
+			m = p.N_maxRAtry
+			s = self.P_e*(1-self.P_c) +self.P_c
+			sumb_i0 = s*_geometricSum(t, m)*self.b_00 # i from 1 to m
+			sumBackoff = _backoffSum(p.Wc, self.trueDivision) # sum of (Wc-k)/Wc for k in range(Wc-1)
+			E_CRsum = (1-self.P_c)*self.b_00*self.E_CRi + sumb_i0*(self.E_i0 + (1-self.P_c)*self.E_CRi + sumBackoff*self.E_ik)
+
+			#sum of LC states average energy, long DRX cycle n has weight (1-P_lc)**n
+			E_LCsum = _expGeometricSum(self.R_ave*(p.T_ls+p.T_ond), int(self.Nc))*(1-self.P_a)*self.b_active*self.E_LC
+
+		E_ave += E_CRsum
+		E_ave += E_LCsum
+		E_avePacket = E_ave/self.N_p/1000
+		return E_avePacket
+
+
+	def _calcCRandLCEnergyLoop(self):
+		p = self.profile
 		# sum of CR states average energy
 		i = 0
 		E_CRsum = (1-self.P_c)*self.b_00*self.E_CRi
 
-		for i in range(1, config.N_maxRAtry+1):
+		for i in range(1, p.N_maxRAtry+1):
 		    b_i0 = (self.P_e*(1-self.P_c)+self.P_c)**i*self.b_00
 		    b_CRi = (1-self.P_c)*b_i0
 		    E_CRsum += b_i0*self.E_i0
 		    E_CRsum += b_CRi*self.E_CRi
-		    for k in xrange(self.Wc-1):
-		        b_ik = (self.Wc-k)/self.Wc*b_i0
+		    for k in xrange(p.Wc-1):
+		        b_ik = _divide(p.Wc-k, p.Wc, self.trueDivision)*b_i0
 		        E_CRsum += b_ik*self.E_ik
 
 		#sum of LC states average energy
@@ -175,10 +292,7 @@ class NBIoTEnergyModel:
 		    self.b_LCn = (1-self.P_lc)**n*(1-self.P_a)*self.b_active
 		    E_LCsum += self.b_LCn*self.E_LC
 
-		E_ave += E_CRsum
-		E_ave += E_LCsum
-		E_avePacket = E_ave/self.N_p/1000
-		return E_avePacket
+		return E_CRsum, E_LCsum
 
 
 	def calcEnergyperBit(self):
@@ -187,7 +301,15 @@ class NBIoTEnergyModel:
 		return E_aveBit
 
 	def calcLifetime(self):
+		p = self.profile
 		E_avePacket = self.calcEnergyperPacket()
-		E_total = self._battery*self._voltage
+		E_total = p.battery*p.voltage
 		T_total = E_total*3600/E_avePacket*self.IAT/3600000/24/365
 		return T_total
+
+
+# the system, chip and battery settings read through to the profile
+for _field in chipprofile.FIELDS:
+	setattr(NBIoTEnergyModel, {'battery': '_battery', 'voltage': '_voltage'}.get(_field, _field),
+			chipprofile.profileProperty(_field))
+del _field
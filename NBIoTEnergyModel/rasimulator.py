@@ -0,0 +1,170 @@
+""" NB-IoT random access simulator
+Event-driven simulation of the RA and contention resolution (CR)
+procedure. Arrivals are Poisson, every attempt waits for the next random
+access opportunity (RAO) and picks one of numofPreambles preambles. A
+preamble chosen by more than one device collides. The devices alone on
+their preamble contend for the grantsperRAO CR grants of the RAO, and a
+granted CR still fails with probability p_err. A failed attempt is
+retried after the RAR window T_RAwin and a backoff drawn from [0, Wc) ms,
+up to N_maxRAtry retries, after which the arrival is in outage.
+
+Instead of one object per device, the attempts of a block of RAOs are
+arrays. A block is never longer than T_RAwin, so a retry always lands in
+a later block, and the contention of all RAOs of the block is resolved at
+once with a bincount over (RAO, preamble).
+
+Energy follows NBIoTEnergyModel: every attempt costs E_i0, an attempt
+that is not collided also E_CRi, and every ms of backoff E_ik. The
+measured P_c and P_e can be passed to NBIoTEnergyModel in place of hand
+set values.
+
+Examples:
+	sim = RASimulator(numofDevices=2000000, t_notif=1000000, seed=1)
+	results = sim.run(1000000)
+	print 'P_c %.4f P_e %.4f P_out %.2e' % (results['P_c'], results['P_e'], results['P_out'])
+	print 'RA energy per arrival is %.4f mJ' % results['energyperArrival']
+	nbiot = NBIoTEnergyModel(t_notif=1000000, p_c=results['P_c'], p_e=results['P_e'])
+
+Peter (Jun) Ye
+"""
+
+
+# import libraries
+import math
+
+import numpy as np
+
+from nbiotenergymodel import NBIoTEnergyModel
+
+
+class RASimulator:
+
+	def __init__(self, numofDevices=1, t_notif=1000000, pl=100, T_RAO=5.0, grantsperRAO=10, p_err=0,
+			seed=None, profile='default'):
+		"""RASimulator Initialization
+		Args:
+			numofDevices: number of devices, each with Poisson arrivals
+			t_notif: mean inter arrival time of one device (ms)
+			pl: payload (bytes), sets the size of the CR messages
+			T_RAO: period of the random access opportunities (ms), as in nbiotCoverage
+			grantsperRAO: CR grants per RAO, 3 PDCCH pointers per ms over the
+				10 ms PDCCH budget of nbiotCoverage and 3 pointers per CR
+			p_err: error probability of a granted CR
+			seed: int seed or numpy RandomState
+			profile: chipprofile.ChipProfile or name of a registered one
+		"""
+		self.numofDevices = numofDevices
+		self.R_ave = float(numofDevices)/t_notif # arrivals per ms
+		self.T_RAO = T_RAO
+		self.grantsperRAO = grantsperRAO
+		self.p_err = p_err
+		if isinstance(seed, np.random.RandomState):
+			self.rng = seed
+		else:
+			self.rng = np.random.RandomState(seed)
+
+		nbiot = NBIoTEnergyModel(pl=pl, t_notif=t_notif, profile=profile)
+		self.profile = nbiot.profile
+		nbiot.calcStatesEnergy()
+		self.E_i0 = nbiot.E_i0
+		self.E_CRi = nbiot.E_CRi
+		self.E_ik = nbiot.E_ik
+
+		# a retry waits for the RAR window at least
+		self.blockRAOs = max(int(self.profile.T_RAwin//T_RAO), 1)
+
+
+	def _arrivals(self, windowStart, windowEnd):
+		"""Devices and first RAOs of the arrivals in [windowStart, windowEnd), by RAO"""
+		count = self.rng.poisson(self.R_ave*(windowEnd - windowStart))
+		time = np.sort(windowStart + self.rng.random_sample(count)*(windowEnd - windowStart))
+		return self.rng.randint(self.numofDevices, size=count), np.ceil(time/self.T_RAO).astype(np.int64)
+
+	def _contend(self, rao, raoStart):
+		"""Resolves the attempts of one block
+		Returns:
+			collided and error bool arrays
+		"""
+		n = len(rao)
+		d = self.profile.numofPreambles
+		slot = (rao - raoStart)*d + self.rng.randint(d, size=n)
+		collided = np.bincount(slot, minlength=self.blockRAOs*d)[slot] > 1
+
+		# the lone preambles of a RAO are granted in random order
+		alone = np.flatnonzero(~collided)
+		order = alone[np.lexsort((self.rng.random_sample(len(alone)), rao[alone]))]
+		sortedRAO = rao[order]
+		rank = np.arange(len(order)) - np.searchsorted(sortedRAO, sortedRAO)
+		error = np.zeros(n, bool)
+		error[order] = (rank >= self.grantsperRAO) | (self.rng.random_sample(len(order)) < self.p_err)
+		return collided, error
+
+	def run(self, horizon, windowArrivals=1000000):
+		"""Simulates the arrivals of horizon ms until every one of them is
+		connected or in outage
+		Args:
+			horizon: simulated arrival time (ms)
+			windowArrivals: expected number of arrivals generated at once
+		Returns:
+			dict with the measured P_c, P_e and P_out, the RA load R_t (attempts
+			per ms), the energy per arrival (mJ) and the per device RA energy (mJ)
+		"""
+		n = self.numofDevices
+		windowLength = max(windowArrivals/self.R_ave, self.blockRAOs*self.T_RAO)
+		lastRAO = int(math.ceil(horizon/self.T_RAO))
+
+		arrivalDevice, arrivalRAO = np.zeros(0, int), np.zeros(0, np.int64)
+		windowEnd = 0.0
+		# attempts waiting for a later block: device, RAO, retries so far, energy so far
+		pending = (np.zeros(0, int), np.zeros(0, np.int64), np.zeros(0, int), np.zeros(0))
+		ledger = []
+		attempts = collisions = errors = arrivals = outages = 0
+
+		raoStart = 0
+		while raoStart <= lastRAO or len(pending[0]):
+			raoEnd = raoStart + self.blockRAOs
+			while windowEnd < horizon and windowEnd < raoEnd*self.T_RAO:
+				device, rao = self._arrivals(windowEnd, min(windowEnd + windowLength, horizon))
+				arrivalDevice = np.concatenate((arrivalDevice, device))
+				arrivalRAO = np.concatenate((arrivalRAO, rao))
+				windowEnd = min(windowEnd + windowLength, horizon)
+			count = np.searchsorted(arrivalRAO, raoEnd)
+			arrivals += count
+
+			due = pending[1] < raoEnd
+			device = np.concatenate((arrivalDevice[:count], pending[0][due]))
+			rao = np.concatenate((arrivalRAO[:count], pending[1][due]))
+			retries = np.concatenate((np.zeros(count, int), pending[2][due]))
+			energy = np.concatenate((np.zeros(count), pending[3][due]))
+			pending = tuple(column[~due] for column in pending)
+			arrivalDevice, arrivalRAO = arrivalDevice[count:], arrivalRAO[count:]
+
+			collided, error = self._contend(rao, raoStart)
+			energy += self.E_i0 + np.where(collided, 0, self.E_CRi)
+			failed = collided | error
+			attempts += len(rao)
+			collisions += collided.sum()
+			errors += error.sum()
+
+			retry = failed & (retries < self.profile.N_maxRAtry)
+			done = ~retry
+			outages += (failed & done).sum()
+			ledger.append((device[done], energy[done]))
+
+			backoff = self.rng.randint(self.profile.Wc, size=retry.sum())
+			nextRAO = np.ceil((rao[retry]*self.T_RAO + self.profile.T_RAwin + backoff)/self.T_RAO).astype(np.int64)
+			pending = (np.concatenate((pending[0], device[retry])),
+					np.concatenate((pending[1], nextRAO)),
+					np.concatenate((pending[2], retries[retry] + 1)),
+					np.concatenate((pending[3], energy[retry] + backoff*self.E_ik)))
+			raoStart = raoEnd
+
+		device, energy = (np.concatenate(column) for column in zip(*ledger))
+		return {'arrivals': arrivals,
+				'attempts': attempts,
+				'R_t': attempts/float(horizon),
+				'P_c': collisions/float(max(attempts, 1)),
+				'P_e': errors/float(max(attempts - collisions, 1)),
+				'P_out': outages/float(max(arrivals, 1)),
+				'energyperArrival': energy.mean()/1000 if len(energy) else 0.0,
+				'deviceEnergy': np.bincount(device, energy, n)/1000}
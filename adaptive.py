@@ -0,0 +1,259 @@
+# adaptive sampling of the model curves and LoRaWAN vs NB-IoT crossovers
+#
+#     curves = ModelCurves([('lorawan', {'dr': 5, 'pl': 20}), ('nbiot', {'pl': 20})], 't_notif')
+#     t_notif, lifetime = refine(curves, 1e4, 1e8, scale='log', yscale='log')
+#     plt.plot(t_notif/1000, lifetime[:, 0], 'go-', t_notif/1000, lifetime[:, 1], 'yx-')
+#     crossovers = findCrossovers('t_notif', 1e4, 1e8, lorawan={'dr': 5, 'pl': 20}, nbiot={'pl': 20})
+#     print crossovers['x'], crossovers['lorawanAbove'], crossovers['evaluations']
+#     python cli.py crossover t_notif 1e4 1e8 --dr 5 --pl 20
+#
+# refine starts from a few points spaced evenly on the scale of the axis
+# and splits the intervals whose linear interpolation error is above tol,
+# relative to the range of each curve. The error of an interval is
+# estimated from the curvature, the second divided difference of the
+# points around it, times a quarter of its squared width, so flat and
+# straight stretches keep a few points while bends get many, all on the
+# scales the curves are plotted on. On an integral axis the curves are
+# staircases, the payload changes the airtime in whole symbols, and a step
+# keeps its error however narrow the interval, so there intervals
+# narrower than a 32nd of the range are not split for their error.
+# Intervals where two curves swap order are split until narrower than
+# xtol, so a plot shows the crossing where it is; every round evaluates
+# its new points as one batch.
+#
+# findCrossovers samples the difference of a LoRaWAN and an NB-IoT metric
+# this way and solves every sign change it brackets with Illinois false
+# position, all brackets at once, as nbiotCoverage.solveR_tCurve does. On
+# an integral axis such as the payload or the number of devices the
+# crossover is the first integer past the sign change. Two crossovers
+# closer than the sampling resolves are missed, as in any bracketing
+# method. The models are the batch models, LoRaWAN with expected ACK
+# timeouts.
+
+# import libraries
+import numpy as np
+
+import parameters
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+
+
+MODELS = {'lorawan': LoRaWANBatchModel, 'nbiot': NBIoTBatchModel}
+METHODS = {'lifetime': 'calcLifetime', 'energyperBit': 'calcEnergyperBit'}
+PARAMETERS = dict((technology, parameters.getKeywords(technology)) for technology in MODELS)
+# parameters that only take integral values, the payload is in bytes
+INTEGRAL = set(keyword for table in parameters.MODEL_PARAMETERS.values()
+               for _, keyword, cast in table if cast is int)
+
+_SCALES = {'linear': (lambda x: np.asarray(x, float), lambda u: u),
+           'log': (lambda x: np.log10(x), lambda u: 10.0**u)}
+# intervals narrower than this share of the range are never split, a jump
+# of a curve keeps its estimated error however narrow the interval
+_MIN_WIDTH = 1e-9
+# the same on an integral axis, where every step of a staircase is a jump
+_MIN_INTEGRAL_WIDTH = 1/32.0
+
+
+class ModelCurves:
+    """The metric of several model configurations along one parameter, a
+    vectorized function of the parameter values for refine"""
+
+    def __init__(self, curves, axis, metric='lifetime', profile='default'):
+        """ModelCurves Initialization
+        Args:
+            curves: list of (technology, parameters), the parameters other than axis, model defaults for the rest
+            axis: parameter varied, a curve whose model does not have it is constant
+            metric: 'lifetime' or 'energyperBit'
+            profile: name of a registered chip profile of both models
+        """
+        assert metric in METHODS, "metric must be one of %s" % ', '.join(sorted(METHODS))
+        assert any(axis in PARAMETERS[technology] for technology, _ in curves), \
+            "%s is not a parameter of any curve" % axis
+        for technology, settings in curves:
+            assert technology in MODELS, "technology must be one of %s" % ', '.join(sorted(MODELS))
+            for name in settings:
+                assert name in PARAMETERS[technology], "%s is not a parameter of the %s model" % (name, technology)
+        self.curves = [(technology, dict(settings)) for technology, settings in curves]
+        self.axis = axis
+        self.metric = metric
+        self.profile = profile
+        self.evaluations = 0
+
+    def __call__(self, x):
+        # the models take an integral parameter as integers, the payload in whole bytes
+        x = np.round(x).astype(int) if self.axis in INTEGRAL else np.asarray(x, float)
+        columns = []
+        for technology, settings in self.curves:
+            settings = dict(settings)
+            if self.axis in PARAMETERS[technology]:
+                settings[self.axis] = x
+            model = MODELS[technology](profile=self.profile, **settings)
+            columns.append(np.broadcast_to(getattr(model, METHODS[self.metric])(), x.shape))
+        self.evaluations += len(x)
+        return np.column_stack(columns)
+
+
+def _intervalError(u, v):
+    """Estimated linear interpolation error of every interval of the points
+    u (n,) of the curves v (n, m), the larger of the curvatures at its ends"""
+    slope = np.diff(v, axis=0)/np.diff(u)[:, None]
+    curvature = np.zeros(v.shape)
+    curvature[1:-1] = np.abs(np.diff(slope, axis=0))/(u[2:]-u[:-2])[:, None]
+    curvature[0], curvature[-1] = curvature[1], curvature[-2]
+    width = np.diff(u)
+    return np.maximum(curvature[:-1], curvature[1:])*(width**2/4)[:, None]
+
+def _crossing(v):
+    """Mask of the intervals where some pair of curves swaps order"""
+    crossing = np.zeros(len(v)-1, bool)
+    for i in range(v.shape[1]):
+        for j in range(i+1, v.shape[1]):
+            sign = np.sign(v[:, i]-v[:, j])
+            crossing |= sign[:-1]*sign[1:] < 0
+    return crossing
+
+def refine(f, lo, hi, scale='log', yscale='linear', tol=1e-3, xtol=None, initial=17, maxPoints=2000,
+           integral=False):
+    """Samples f on [lo, hi], densely only where its curves bend or cross
+    Args:
+        f: vectorized function returning the values (n,) or (n, m) of m curves at n points
+        lo, hi: range of the axis
+        scale, yscale: 'linear' or 'log', the scales the axis and the curves are plotted on
+        tol: largest interpolation error of an interval, relative to the range of each curve
+        xtol: width on the axis scale crossing intervals are split to, a thousandth of the range by default
+        initial: points of the first round
+        maxPoints: most points evaluated, the intervals of the largest error are split first
+        integral: sample integers only, an interval of width 1 is not split, nor for its error one
+            narrower than a 32nd of the range
+    Returns:
+        sorted points (n,) and their values (n, m)
+    """
+    forward, inverse = _SCALES[scale]
+    ulo, uhi = forward(lo), forward(hi)
+    xtol = (uhi-ulo)*1e-3 if xtol is None else xtol
+    minWidth = (uhi-ulo)*(_MIN_INTEGRAL_WIDTH if integral else _MIN_WIDTH)
+    x = inverse(np.linspace(ulo, uhi, min(initial, maxPoints)))
+    x[0], x[-1] = lo, hi
+    if integral:
+        x = np.unique(np.round(x))
+    y = np.asarray(f(x), float).reshape(len(x), -1)
+
+    while len(x) < maxPoints:
+        u = forward(x)
+        v = _SCALES[yscale][0](y)
+        span = np.nanmax(v, axis=0)-np.nanmin(v, axis=0)
+        error = np.nanmax(_intervalError(u, v)/np.where(span > 0, span, 1), axis=1)
+        crossing = _crossing(v)
+        width = np.diff(u)
+        split = (((error > tol) & (width > minWidth)) | (crossing & (width > xtol)))
+        if integral:
+            split &= np.diff(x) > 1
+        candidates = np.flatnonzero(split)
+        if len(candidates) == 0:
+            break
+        if len(candidates) > maxPoints-len(x):
+            priority = np.where(crossing, np.inf, error)[candidates]
+            candidates = candidates[np.argsort(-priority, kind='mergesort')[:maxPoints-len(x)]]
+        middle = inverse((u[candidates]+u[candidates+1])/2)
+        if integral:
+            middle = np.clip(np.round(middle), x[candidates]+1, x[candidates+1]-1)
+        order = np.argsort(np.concatenate([x, middle]), kind='mergesort')
+        x = np.concatenate([x, middle])[order]
+        y = np.concatenate([y, np.asarray(f(middle), float).reshape(len(middle), -1)])[order]
+    return x, y
+
+
+def _solveBracketed(g, lo, hi, glo, ghi, xtol, rtol, maxiter):
+    """Illinois false position on every bracket of the arrays at once"""
+    a, b, fa, fb = lo.copy(), hi.copy(), glo.copy(), ghi.copy()
+    converged = (fb == 0) | (np.abs(b-a) <= xtol+rtol*np.abs(b))
+    iterations = np.zeros(len(a), dtype=int)
+    for iteration in range(maxiter):
+        active = np.flatnonzero(~converged)
+        if len(active) == 0:
+            break
+        aa, ba, faa, fba = a[active], b[active], fa[active], fb[active]
+        denominator = fba-faa
+        c = np.where(denominator != 0, ba-fba*(ba-aa)/np.where(denominator != 0, denominator, 1), (aa+ba)/2)
+        # fall back to bisection if the secant leaves the bracket
+        inside = (c-np.minimum(aa, ba))*(np.maximum(aa, ba)-c) > 0
+        c = np.where(inside, c, (aa+ba)/2)
+        fc = g(c)
+        iterations[active] += 1
+
+        swap = fc*fba < 0
+        a[active] = np.where(swap, ba, aa)
+        fa[active] = np.where(swap, fba, faa/2)
+        b[active] = c
+        fb[active] = fc
+        converged[active] = (fc == 0) | (np.abs(c-a[active]) <= xtol+rtol*np.abs(c))
+    return b, fb, iterations, converged
+
+def _bisectIntegral(g, lo, hi, glo, ghi):
+    """Narrows every integer bracket to neighbouring integers, returns the upper ones"""
+    lo, hi, glo, ghi = lo.copy(), hi.copy(), glo.copy(), ghi.copy()
+    iterations = np.zeros(len(lo), dtype=int)
+    while True:
+        active = np.flatnonzero(hi-lo > 1)
+        if len(active) == 0:
+            break
+        middle = np.floor((lo[active]+hi[active])/2)
+        gm = g(middle)
+        iterations[active] += 1
+        low = gm*glo[active] > 0
+        lo[active] = np.where(low, middle, lo[active])
+        glo[active] = np.where(low, gm, glo[active])
+        hi[active] = np.where(low, hi[active], middle)
+        ghi[active] = np.where(low, ghi[active], gm)
+    return hi, ghi, iterations, np.ones(len(hi), bool)
+
+def findCrossovers(axis, lo, hi, lorawan=None, nbiot=None, metric='lifetime', scale=None, tol=1e-3,
+                   xtol=1e-12, rtol=1e-12, maxiter=100, maxPoints=2000, profile='default'):
+    """Returns the values of one parameter where a LoRaWAN and an NB-IoT
+    configuration have the same metric
+    Args:
+        axis: parameter varied, e.g. t_notif, pl, p_c or N_dev; only the model that has it varies
+        lo, hi: range of the axis
+        lorawan, nbiot: the other parameters of each model, model defaults for those not given
+        metric: 'lifetime' or 'energyperBit'
+        scale: 'log' or 'linear' sampling, log if lo is positive by default
+        tol, maxPoints: of the sampling that brackets the crossovers, see refine
+        xtol, rtol, maxiter: of the root solver
+        profile: name of a registered chip profile of both models
+    Returns:
+        dict of arrays with one element per crossover in increasing order: x, the metric of each model at x,
+        lorawanAbove (the LoRaWAN metric is the larger one above x), residual, iterations, converged; and the
+        total evaluations of either model
+    """
+    curves = ModelCurves([('lorawan', lorawan or {}), ('nbiot', nbiot or {})], axis, metric, profile)
+    integral = axis in INTEGRAL
+    scale = scale or ('log' if lo > 0 else 'linear')
+    x, y = refine(curves, lo, hi, scale, tol=tol, maxPoints=maxPoints, integral=integral)
+    difference = y[:, 0]-y[:, 1]
+
+    def g(points):
+        values = curves(points)
+        return values[:, 0]-values[:, 1]
+
+    sign = np.sign(difference)
+    brackets = np.flatnonzero(sign[:-1]*sign[1:] < 0)
+    bracket = (g, x[brackets], x[brackets+1], difference[brackets], difference[brackets+1])
+    if integral:
+        roots, residual, iterations, converged = _bisectIntegral(*bracket)
+    else:
+        roots, residual, iterations, converged = _solveBracketed(*(bracket+(xtol, rtol, maxiter)))
+    # samples that are crossovers already
+    exact = np.flatnonzero(sign == 0)
+    roots = np.concatenate([roots, x[exact]])
+    order = np.argsort(roots, kind='mergesort')
+    after = np.concatenate([sign[brackets+1], sign[np.minimum(exact+1, len(x)-1)]])
+    roots = roots[order].astype(int) if integral else roots[order]
+    values = curves(roots) if len(roots) else np.empty((0, 2))
+    return {'x': roots,
+            'lorawan': values[:, 0],
+            'nbiot': values[:, 1],
+            'lorawanAbove': (after > 0)[order],
+            'residual': np.concatenate([residual, np.zeros(len(exact))])[order],
+            'iterations': np.concatenate([iterations, np.zeros(len(exact), dtype=int)])[order],
+            'converged': np.concatenate([converged, np.ones(len(exact), bool)])[order],
+            'evaluations': curves.evaluations}
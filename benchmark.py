@@ -0,0 +1,172 @@
+# throughput benchmarks of the LoRaWAN and NB-IoT energy models
+#
+#     python benchmark.py --output bench.json
+#     python benchmark.py --compare bench.json --threshold 0.1
+#
+# Every benchmark reports evaluations per second, the best of --repeat runs
+# that each last at least --min-time seconds. With --compare the results are
+# checked against a stored JSON baseline and every benchmark slower than the
+# baseline by more than the threshold is flagged; the exit status is 1 if
+# there is any regression.
+#
+# A benchmark is a setup function that builds its fixtures and returns the
+# timed function, which returns the number of evaluations it did. The
+# setup runs before every run and is not timed, so no run sees the models
+# or the caches left by an earlier one.
+
+# import libraries
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+from NBIoTEnergyModel import nbiotCoverage
+
+
+# comparison.py notification periods (s)
+T_NOTIF = [i*10**exp for exp in range(1, 5) for i in range(1, 10)]
+
+
+def benchLoRaWANConstruction():
+    def run():
+        LoRaWANEnergyModel(dr=5, ackmode=1, pl=20, p_c=0.01, t_notif=600000)
+        return 1
+    return run
+
+def benchLoRaWANAveCurrentAck():
+    lora = LoRaWANEnergyModel(dr=5, ackmode=1, pl=20, p_c=0.01, t_notif=600000)
+    def run():
+        lora.calcAveCurrentAck()
+        return 1
+    return run
+
+def benchLoRaWANLifetime():
+    lora = LoRaWANEnergyModel(dr=5, ackmode=1, pl=20, p_c=0.01, t_notif=600000)
+    def run():
+        # reassigning T_notif drops the cached results, as in a sweep that mutates one model
+        lora.T_notif = 600000
+        lora.calcLifetime()
+        return 1
+    return run
+
+def benchLoRaWANBatch():
+    t_notif = np.logspace(4, 8, 10000)
+    def run():
+        lora = LoRaWANBatchModel(dr=np.arange(6)[:, None], pl=20, ackmode=1, p_c=0.01, t_notif=t_notif)
+        lora.evaluate()
+        return lora.T_notif.size
+    return run
+
+def benchNBIoTEnergyperPacket():
+    nbiot = NBIoTEnergyModel(pl=100, t_notif=1000000)
+    def run():
+        nbiot.calcEnergyperPacket()
+        return 1
+    return run
+
+def benchCoverageSolve():
+    def run():
+        nbiotCoverage.solveR_t(2.0)
+        return 1
+    return run
+
+def benchCoverageCurve():
+    R_aves = [.1*x for x in range(1, 40)]
+    def run():
+        nbiotCoverage.solveR_tCurve(R_aves)
+        return len(R_aves)
+    return run
+
+def benchComparisonSweep():
+    def run():
+        # the lifetime sweep of comparison.py, one point per model and period
+        for notifPeriod in T_NOTIF:
+            for payload in (20, 200):
+                LoRaWANEnergyModel(dr=5, ackmode=1, pl=payload, N_dev=1, p_c=0, t_notif=notifPeriod*1000).calcLifetime()
+                NBIoTEnergyModel(pl=payload, t_notif=notifPeriod*1000, p_e=0, p_c=0).calcLifetime()
+        return 4*len(T_NOTIF)
+    return run
+
+BENCHMARKS = [
+    ('lorawan.construction', benchLoRaWANConstruction),
+    ('lorawan.calcAveCurrentAck', benchLoRaWANAveCurrentAck),
+    ('lorawan.calcLifetime', benchLoRaWANLifetime),
+    ('lorawan.batch', benchLoRaWANBatch),
+    ('nbiot.calcEnergyperPacket', benchNBIoTEnergyperPacket),
+    ('nbiot.coverageSolve', benchCoverageSolve),
+    ('nbiot.coverageCurve', benchCoverageCurve),
+    ('comparison.lifetimeSweep', benchComparisonSweep),
+]
+
+
+def timeBenchmark(setup, minTime, repeat):
+    """Returns the best evaluations per second of repeat runs of at least minTime
+    seconds, each with fresh fixtures from setup"""
+    best = 0.0
+    for _ in range(repeat):
+        bench = setup()
+        evaluations = 0
+        start = time.time()
+        while True:
+            evaluations += bench()
+            elapsed = time.time()-start
+            if elapsed >= minTime:
+                break
+        best = max(best, evaluations/elapsed)
+    return best
+
+def runBenchmarks(names=None, minTime=.5, repeat=3):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        results[name] = {'evalsPerSec': timeBenchmark(setup, minTime, repeat)}
+        print '%-28s %14.1f evals/s' % (name, results[name]['evalsPerSec'])
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+def compareResults(current, baseline, threshold):
+    """Returns the names of the benchmarks slower than the baseline by more than threshold"""
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        if name not in baseline['results']:
+            continue
+        ratio = result['evalsPerSec']/baseline['results'][name]['evalsPerSec']
+        flag = ratio < 1-threshold
+        if flag:
+            regressions.append(name)
+        print '%-28s %8.2fx baseline%s' % (name, ratio, '  REGRESSION' if flag else '')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the LoRaWAN and NB-IoT energy models')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=.1, help='tolerated slowdown fraction (default 0.1)')
+    parser.add_argument('--only', action='append', help='run only this benchmark, can be repeated')
+    parser.add_argument('--min-time', type=float, default=.5, help='minimum seconds per run')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best is kept')
+    args = parser.parse_args(argv)
+
+    current = runBenchmarks(args.only, args.min_time, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compareResults(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
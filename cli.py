@@ -0,0 +1,346 @@
+# command line interface of the LoRaWAN and NB-IoT energy models
+#
+#     python cli.py lifetime lorawan --dr 5 --pl 20 --t-notif 600000 --expected-ack-to
+#     python cli.py energy-per-bit nbiot --pl 100 --t-notif 1000000 --format jsonl
+#     python cli.py capacity --dr 0 5 --t-notif 60000
+#     python cli.py coverage --r-ave 0.1:3.9:39 --plot outage.png
+#     python cli.py sweep lorawan --dr 0 5 --pl 20 --t-notif 1e4:1e8:50:log --metrics lifetime energyperBit
+#     python cli.py sweep nbiot --pl 20 200 --t-notif 1e4:1e8:1000:log --cache results/cache.sqlite
+#     python cli.py inventory devices.csv --errors errors.csv > lifetimes.csv
+#     python cli.py crossover t_notif 1e4 1e8 --dr 5 --pl 20
+#     python cli.py frontier --pl 10 51 242 --t-notif 1e4:1e8:200:log --objectives lifetime energyperBit
+#     python cli.py serve --port 8350
+#
+# Every command writes one row per evaluated point to stdout, as CSV with a
+# header line (--no-header drops it) or as JSON lines. lifetime,
+# energy-per-bit and capacity evaluate the scalar models point by point,
+# sweep evaluates chunks of the grid at once with the evaluators of
+# sweep.py and streams the rows chunk by chunk, inventory streams the
+# devices of an inventory file through inventory.py, frontier writes the
+# Pareto optimal configurations of frontier.py and crossover the parameter
+# values where the LoRaWAN and NB-IoT metrics are equal, found by
+# adaptive.py. Parameters take one or
+# more values, a value a:b:n stands for n points from a to b and a:b:n:log
+# for n points spaced logarithmically; several parameters are combined as
+# a cartesian product. serve answers JSON queries over HTTP, see service.py.
+#
+# A single evaluation has to start fast enough to be called from shell
+# pipelines, so only the modules a command needs are imported, inside the
+# command, and matplotlib only when --plot is given. The scalar models of
+# lifetime, energy-per-bit and capacity do not import numpy, such a call
+# starts in about 40 ms.
+
+# import libraries
+import argparse
+import errno
+import itertools
+import sys
+
+from parameters import LORAWAN_PARAMETERS, MODEL_PARAMETERS, NBIOT_PARAMETERS, RowWriter
+
+
+# scalar model method and sweep metric of each point command
+METRICS = {'lifetime': ('calcLifetime', 'lifetime'),
+           'energy-per-bit': ('calcEnergyperBit', 'energyperBit'),
+           'capacity': ('calcAlohaCapcity', 'capacity')}
+
+
+def parseValues(tokens, cast=float):
+    """Expands numbers and a:b:n or a:b:n:log ranges into a list of values;
+    integral parameters take integers and their ranges are rounded"""
+    values = []
+    for token in tokens:
+        parts = token.split(':')
+        if len(parts) == 1:
+            assert cast is not int or float(token).is_integer(), "an integer is needed, got %s" % token
+            values.append(cast(float(token)))
+            continue
+        if cast is int:
+            cast = lambda value: int(round(value))
+        assert len(parts) in (3, 4) and parts[3:] in ([], ['log']), "a range is a:b:n or a:b:n:log, got %s" % token
+        start, stop, n = float(parts[0]), float(parts[1]), int(parts[2])
+        assert n >= 1, "a range needs at least one point, got %s" % token
+        steps = [i/float(n-1) if n > 1 else 0.0 for i in range(n)]
+        if parts[3:]:
+            assert start > 0 and stop > 0, "a log range needs positive bounds, got %s" % token
+            values.extend(cast(start*(stop/start)**step) for step in steps)
+        else:
+            values.extend(cast(start+(stop-start)*step) for step in steps)
+    return values
+
+
+def _givenParameters(args, model, parser):
+    """Returns (keyword, values) of the model parameters given on the command line"""
+    known = set(option for option, _, _ in MODEL_PARAMETERS[model])
+    given = []
+    for option, keyword, cast in LORAWAN_PARAMETERS + NBIOT_PARAMETERS:
+        tokens = getattr(args, option.replace('-', '_'), None)
+        if tokens is None or keyword in dict(given):
+            continue
+        if option not in known:
+            parser.error('--%s is not a parameter of the %s model' % (option, model))
+        given.append((keyword, parseValues(tokens, cast)))
+    return given
+
+def _openWriter(args, columns):
+    return RowWriter(sys.stdout, columns, args.format, not args.no_header)
+
+
+def runPoint(args, parser):
+    """lifetime, energy-per-bit and capacity, evaluated point by point"""
+    model = getattr(args, 'model', 'lorawan')
+    given = _givenParameters(args, model, parser)
+    options = {'profile': args.profile}
+    if model == 'lorawan':
+        from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel as Model
+        options['expectedAckTO'] = args.expected_ack_to
+    else:
+        from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel as Model
+    method, metric = METRICS[args.command]
+    names = [keyword for keyword, _ in given]
+    writer = _openWriter(args, names+[metric])
+    for values in itertools.product(*[values for _, values in given]):
+        row = dict(zip(names, values))
+        kwargs = dict(options)
+        kwargs.update(row)
+        row[metric] = getattr(Model(**kwargs), method)()
+        writer.write(row)
+
+def runSweep(args, parser):
+    """Grid evaluation in chunks with the batch evaluators of sweep.py"""
+    import sweep
+    given = _givenParameters(args, args.model, parser)
+    if not given:
+        parser.error('sweep needs at least one model parameter')
+    modelName = {'lorawan': 'LoRaWANEnergyModel', 'nbiot': 'NBIoTEnergyModel'}[args.model]
+    metrics = args.metrics or sweep.MODELS[modelName][1]
+    for metric in metrics:
+        if metric not in sweep.MODELS[modelName][1]:
+            parser.error('unknown %s metric %s, one of %s' % (args.model, metric, ', '.join(sweep.MODELS[modelName][1])))
+    spec = {'model': modelName, 'axes': given, 'fixed': {'profile': args.profile}, 'metrics': metrics}
+    grid = sweep.Sweep(spec, None, chunkSize=args.chunk_size)
+    names = [keyword for keyword, _ in given]
+    writer = _openWriter(args, names+list(metrics))
+    evaluate = sweep.MODELS[modelName][0]
+    if args.cache:
+        import resultcache
+        cache = resultcache.ResultCache(args.cache)
+        evaluate = lambda params, metrics: cache.evaluate(modelName, params, metrics)
+    for chunk in range(grid.numofChunks):
+        _, params = grid.chunkParams(chunk)
+        columns = evaluate(params, metrics)
+        columns.update((name, params[name]) for name in names)
+        for i in range(len(columns[names[0]])):
+            writer.write(dict((name, column[i]) for name, column in columns.items()))
+        sys.stdout.flush()
+
+def runCoverage(args, parser):
+    """NB-IoT RA load fixed point and outage probability per arrival rate"""
+    from NBIoTEnergyModel import nbiotCoverage
+    R_aves = parseValues(args.r_ave)
+    curve = nbiotCoverage.solveR_tCurve(R_aves)
+    columns = ['R_ave', 'R_t', 'P_c', 'P_e', 'P_out', 'converged']
+    writer = _openWriter(args, columns)
+    for i, R_ave in enumerate(R_aves):
+        row = dict((column, curve[column][i]) for column in columns[1:])
+        row['R_ave'] = R_ave
+        writer.write(row)
+    if args.plot is not None:
+        sys.stdout.flush()
+        nbiotCoverage.plotOutage(R_aves, curve['P_out'], args.plot or None)
+
+
+def runInventory(args, parser):
+    """Per device results of an inventory file, chunk by chunk"""
+    import inventory
+    format = args.input_format or ('jsonl' if args.inventory.endswith(('.jsonl', '.json')) else 'csv')
+    errors = open(args.errors, 'w') if args.errors else None
+    try:
+        with open(args.inventory) as stream:
+            counts = inventory.evaluateInventory(stream, sys.stdout, format, args.format, errors,
+                                                 args.chunk_size, not args.no_header)
+    finally:
+        if errors is not None:
+            errors.close()
+    sys.stderr.write('%(rows)d rows, %(evaluated)d evaluated, %(errors)d errors\n' % counts)
+
+
+def runFrontier(args, parser):
+    """Pareto frontier of the LoRaWAN and NB-IoT grids, see frontier.py"""
+    import frontier
+    given = []
+    for option, keyword, cast in LORAWAN_PARAMETERS + NBIOT_PARAMETERS:
+        tokens = getattr(args, option.replace('-', '_'), None)
+        if tokens is not None and keyword not in dict(given):
+            given.append((keyword, parseValues(tokens, cast)))
+    # the given parameters replace the default axes of the models they are parameters of
+    space = []
+    for model, axes in frontier.DEFAULT_SPACE:
+        if model not in args.models:
+            continue
+        axes = dict(axes)
+        axes.update((keyword, values) for keyword, values in given if keyword in frontier.PARAMETERS[model])
+        space.append((model, axes))
+    for keyword, _ in given:
+        if not any(keyword in frontier.PARAMETERS[model] for model in args.models):
+            parser.error('%s is not a parameter of the %s model' % (keyword, ' or '.join(args.models)))
+
+    grid = frontier.ParetoFrontier(space, args.objectives, args.chunk_size, args.processes, args.profile)
+    columns = grid.run()
+    names = ['technology']+grid.parameters+grid.objectives
+    writer = _openWriter(args, names)
+    for row in frontier.iterRows(columns):
+        writer.write(dict((name, row.get(name)) for name in names))
+    sys.stderr.write('%d points, %d evaluated, %d on the frontier\n' % (grid.size, grid.evaluated,
+                                                                        len(columns['technology'])))
+
+
+def runCrossover(args, parser):
+    """LoRaWAN vs NB-IoT crossovers along one parameter, see adaptive.py"""
+    import adaptive
+    models = {'lorawan': {}, 'nbiot': {}}
+    for option, keyword, cast in LORAWAN_PARAMETERS + NBIOT_PARAMETERS:
+        tokens = getattr(args, option.replace('-', '_'), None)
+        if tokens is None:
+            continue
+        values = parseValues(tokens, cast)
+        if len(values) != 1 or keyword == args.axis:
+            parser.error('--%s takes one value and cannot be the axis' % option)
+        for model, parameters in models.items():
+            if keyword in adaptive.PARAMETERS[model]:
+                parameters[keyword] = values[0]
+    crossovers = adaptive.findCrossovers(args.axis, args.lo, args.hi, models['lorawan'], models['nbiot'],
+                                         args.metric, args.scale, profile=args.profile)
+    columns = ['x', 'lorawan', 'nbiot', 'lorawanAbove', 'residual', 'converged']
+    writer = _openWriter(args, [args.axis]+columns[1:])
+    for i in range(len(crossovers['x'])):
+        row = dict((column, crossovers[column][i]) for column in columns)
+        row[args.axis] = row.pop('x')
+        writer.write(row)
+    sys.stderr.write('%d crossovers, %d evaluations\n' % (len(crossovers['x']), crossovers['evaluations']))
+
+
+def runServe(args, parser):
+    """HTTP/JSON evaluation service, until interrupted"""
+    import service
+    server = service.EvaluationServer((args.host, args.port), service.EvaluationService(
+        args.window, args.max_batch, args.cache_size, args.profile))
+    sys.stderr.write('serving on http://%s:%d\n' % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _addParameters(parser, models):
+    group = parser.add_argument_group('model parameters', 'one or more values, a:b:n or a:b:n:log for a range')
+    seen = set()
+    for model in models:
+        for option, keyword, _ in MODEL_PARAMETERS[model]:
+            if option not in seen:
+                seen.add(option)
+                group.add_argument('--'+option, nargs='+', metavar='V', help=keyword)
+    parser.add_argument('--profile', default='default', help='registered chip profile (default: default)')
+    if 'lorawan' in models:
+        parser.add_argument('--expected-ack-to', action='store_true',
+                            help='LoRaWAN: expected instead of drawn ACK timeouts, deterministic results')
+
+def _addOutput(parser):
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv', help='output format (default csv)')
+    parser.add_argument('--no-header', action='store_true', help='omit the CSV header line')
+
+def buildParser():
+    parser = argparse.ArgumentParser(description='Evaluate the LoRaWAN and NB-IoT energy models')
+    commands = parser.add_subparsers(dest='command')
+
+    for command, description in [('lifetime', 'device lifetime (years)'),
+                                 ('energy-per-bit', 'energy per delivered bit (mJ)')]:
+        sub = commands.add_parser(command, help=description)
+        sub.add_argument('model', choices=('lorawan', 'nbiot'))
+        _addParameters(sub, ['lorawan', 'nbiot'])
+        _addOutput(sub)
+        sub.set_defaults(run=runPoint)
+
+    sub = commands.add_parser('capacity', help='LoRaWAN pure ALOHA capacity (devices per gateway)')
+    _addParameters(sub, ['lorawan'])
+    _addOutput(sub)
+    sub.set_defaults(run=runPoint)
+
+    sub = commands.add_parser('coverage', help='NB-IoT RA load and outage probability')
+    sub.add_argument('--r-ave', nargs='+', required=True, metavar='V',
+                     help='arrival rates (arrivals/ms), a:b:n or a:b:n:log for a range')
+    sub.add_argument('--plot', nargs='?', const='', metavar='PATH',
+                     help='plot the outage curve, on screen or to PATH')
+    _addOutput(sub)
+    sub.set_defaults(run=runCoverage)
+
+    sub = commands.add_parser('sweep', help='evaluate several metrics over a parameter grid')
+    sub.add_argument('model', choices=('lorawan', 'nbiot'))
+    _addParameters(sub, ['lorawan', 'nbiot'])
+    sub.add_argument('--metrics', nargs='+', metavar='METRIC', help='metrics to write, all by default')
+    sub.add_argument('--chunk-size', type=int, default=100000, help='grid points evaluated at once')
+    sub.add_argument('--cache', metavar='PATH', help='SQLite result cache to read and extend, see resultcache.py')
+    _addOutput(sub)
+    sub.set_defaults(run=runSweep)
+
+    sub = commands.add_parser('frontier', help='Pareto frontier of the LoRaWAN and NB-IoT configurations')
+    sub.add_argument('--models', nargs='+', choices=('lorawan', 'nbiot'), default=['lorawan', 'nbiot'],
+                     help='technologies on the frontier (default both)')
+    _addParameters(sub, ['lorawan', 'nbiot'])
+    sub.add_argument('--objectives', nargs='+', metavar='OBJECTIVE',
+                     help='lifetime, energyperBit, capacity, outage, all by default')
+    sub.add_argument('--chunk-size', type=int, default=100000, help='grid points evaluated at once')
+    sub.add_argument('--processes', type=int, default=1, help='worker processes (default 1)')
+    _addOutput(sub)
+    sub.set_defaults(run=runFrontier)
+
+    sub = commands.add_parser('crossover', help='parameter values where LoRaWAN and NB-IoT are equal')
+    sub.add_argument('axis', choices=sorted(set(keyword for _, keyword, _ in LORAWAN_PARAMETERS+NBIOT_PARAMETERS)),
+                     help='parameter varied')
+    sub.add_argument('lo', type=float, help='lower end of the axis')
+    sub.add_argument('hi', type=float, help='upper end of the axis')
+    sub.add_argument('--metric', choices=('lifetime', 'energyperBit'), default='lifetime',
+                     help='metric compared (default lifetime)')
+    sub.add_argument('--scale', choices=('linear', 'log'), help='axis sampling, log for a positive range by default')
+    _addParameters(sub, ['lorawan', 'nbiot'])
+    _addOutput(sub)
+    sub.set_defaults(run=runCrossover)
+
+    sub = commands.add_parser('inventory', help='lifetime and energy per bit of every device of an inventory')
+    sub.add_argument('inventory', help='CSV or JSON lines file, one device per row')
+    sub.add_argument('--input-format', choices=('csv', 'jsonl'), help='inventory format, by file extension by default')
+    sub.add_argument('--errors', metavar='PATH', help='write the rows that cannot be evaluated to PATH')
+    sub.add_argument('--chunk-size', type=int, default=100000, help='rows evaluated at once')
+    _addOutput(sub)
+    sub.set_defaults(run=runInventory)
+
+    sub = commands.add_parser('serve', help='HTTP/JSON evaluation service with micro-batching')
+    sub.add_argument('--host', default='localhost', help='address to listen on (default localhost)')
+    sub.add_argument('--port', type=int, default=8350, help='port (default 8350)')
+    sub.add_argument('--window', type=float, default=.002, help='seconds queries are collected into a batch')
+    sub.add_argument('--max-batch', type=int, default=4096, help='queries evaluated at once')
+    sub.add_argument('--cache-size', type=int, default=100000, help='results kept in the LRU cache')
+    sub.add_argument('--profile', default='default', help='registered chip profile (default: default)')
+    sub.set_defaults(run=runServe)
+    return parser
+
+
+def main(argv=None):
+    parser = buildParser()
+    args = parser.parse_args(argv)
+    try:
+        args.run(args, parser)
+        sys.stdout.flush()
+    except AssertionError as e:
+        parser.error(str(e))
+    except IOError as e:
+        # a closed pipe, e.g. | head, ends the output quietly
+        if e.errno != errno.EPIPE:
+            raise
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# Pareto frontier of the LoRaWAN and NB-IoT configurations
+#
+#     space = [('lorawan', [('dr', range(7)), ('cr', [1, 2, 3, 4]), ('pl', [10, 51, 242]),
+#                           ('t_notif', np.logspace(4, 8, 200)), ('ackmode', [0, 1])]),
+#              ('nbiot', [('pl', [10, 51, 242]), ('t_notif', np.logspace(4, 8, 200)),
+#                         ('p_c', [0, .01, .1]), ('p_e', [0, .01, .1])])]
+#     frontier = ParetoFrontier(space, objectives=['lifetime', 'energyperBit', 'outage']).run()
+#     for row in iterRows(frontier):
+#         print row
+#     python cli.py frontier --pl 10 51 242 --t-notif 1e4:1e8:200:log > frontier.csv
+#
+# The objectives are the lifetime (years) and the gateway capacity
+# (devices), which are maximized, and the energy per delivered bit (mJ) and
+# the outage probability, which are minimized. The outage of a LoRaWAN
+# notification is the probability that its frame is not delivered, after
+# the retransmissions in acknowledgement mode; that of an NB-IoT
+# notification is the probability that every RA attempt fails. NB-IoT has
+# no gateway capacity in these models, its configurations take capacity 0,
+# so with 'capacity' among the objectives they are only on the frontier
+# where no LoRaWAN configuration is as good in the other objectives.
+#
+# Every technology has its own cartesian grid, split into chunks with
+# sweep.Sweep and evaluated with the batch models; payloads above the
+# maximum of their LoRaWAN data rate are skipped. The frontier of every
+# chunk is merged into the running frontier of the chunks before, so only
+# one chunk and the frontier are in memory however large the grids are.
+#
+# The frontier of n points is the divide-and-conquer skyline of Kung, Luccio
+# and Preparata, O(n log**(d-2) n) comparisons for d objectives instead of
+# the n**2 of a pairwise scan. Points equal in every objective do not
+# dominate each other and are all kept.
+
+# import libraries
+import multiprocessing
+
+import numpy as np
+
+import inventory
+import parameters
+import sweep
+from LoRaWANEnergyModel import lorawanenergymodel
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+
+
+# 1 for the objectives that are maximized, -1 for those that are minimized
+OBJECTIVES = {'lifetime': 1, 'energyperBit': -1, 'capacity': 1, 'outage': -1}
+DEFAULT_OBJECTIVES = ['lifetime', 'energyperBit', 'capacity', 'outage']
+
+TECHNOLOGIES = ['lorawan', 'nbiot']
+PARAMETERS = dict((technology, parameters.getKeywords(technology)) for technology in TECHNOLOGIES)
+
+_T_NOTIF = np.logspace(4, 8, 50).tolist()
+DEFAULT_SPACE = [('lorawan', [('dr', range(7)), ('cr', [1, 2, 3, 4]), ('pl', [1, 10, 20, 51, 115, 242]),
+                              ('t_notif', _T_NOTIF), ('ackmode', [0, 1])]),
+                 ('nbiot', [('pl', [1, 10, 20, 51, 115, 242]), ('t_notif', _T_NOTIF),
+                            ('p_c', [0, .01, .1]), ('p_e', [0, .01, .1])])]
+
+# max PL bytes of DR 0 to 6
+MAX_PL = np.array(lorawanenergymodel.MAX_PL)
+
+# points compared pairwise at once at the leaves of the skyline recursion
+_LEAF = 64
+_BLOCK = 1 << 16
+# rows the others are first compared with
+_PIVOTS = 256
+
+
+def evaluateLoRaWAN(params, profile='default'):
+    lora = LoRaWANBatchModel(profile=profile, **params)
+    results = lora.evaluate()
+    return {'lifetime': results['lifetime'],
+            'energyperBit': results['energyperBit'],
+            'capacity': results['capacity'],
+            'outage': 1 - results['dataDelivered']/lora._PL}
+
+def evaluateNBIoT(params, profile='default'):
+    nbiot = NBIoTBatchModel(profile=profile, **params)
+    results = nbiot.evaluate()
+    # every one of the N_maxRAtry+1 RA attempts fails by a collision or a CR error
+    P_fail = nbiot.P_e*(1-nbiot.P_c)+nbiot.P_c
+    return {'lifetime': results['lifetime'],
+            'energyperBit': results['energyperBit'],
+            'capacity': np.zeros(results['lifetime'].shape),
+            'outage': P_fail**(nbiot.profile.N_maxRAtry+1)}
+
+MODELS = {'lorawan': ('LoRaWANEnergyModel', evaluateLoRaWAN, LoRaWANBatchModel),
+          'nbiot': ('NBIoTEnergyModel', evaluateNBIoT, NBIoTBatchModel)}
+
+
+def skyline(values, senses=None):
+    """Returns the indices of the rows of values (n, d) no other row dominates
+    Args:
+        values: objective values, one row per point
+        senses: 1 for the columns that are maximized, -1 for those that are minimized, all maximized by default
+    """
+    values = np.asarray(values, float)
+    if senses is not None:
+        values = values*np.asarray(senses, float)
+    if len(values) == 0:
+        return np.arange(0)
+    # np.unique sorts the rows lexicographically, which _dominated needs in descending order
+    unique, inverse = np.unique(values, axis=0, return_inverse=True)
+    points = unique[::-1]
+    dominated = np.zeros(len(points), bool)
+    if len(points) > _PIVOTS:
+        # the rows best in the sum of their ranks dominate most others, those
+        # they dominate are dropped before the recursion
+        ranks = np.sum([np.argsort(np.argsort(column, kind='mergesort')) for column in points.T], axis=0)
+        pivots = np.sort(np.argpartition(-ranks, _PIVOTS)[:_PIVOTS])
+        pivots = pivots[~_dominated(points[pivots])]
+        dominated = _covered(points[pivots], points)
+        dominated[pivots] = False
+    rest = np.flatnonzero(~dominated)
+    dominated[rest] = _dominated(points[rest])
+    return np.flatnonzero(~dominated[::-1][inverse.ravel()])
+
+def _dominated(points):
+    """Mask of the rows another row is at least as good as in every column,
+    for distinct rows sorted lexicographically in descending order, in which
+    a row is only dominated by rows before it"""
+    n = len(points)
+    if n <= _LEAF:
+        atLeast = np.all(points[:, None, :] >= points[None, :, :], axis=2)
+        return np.any(np.triu(atLeast, 1), axis=0)
+    mid = n//2
+    dominated = np.concatenate([_dominated(points[:mid]), _dominated(points[mid:])])
+    # the first half is ahead in the first column, the rest is compared
+    # against the rows of the first half nothing dominates
+    left = points[:mid][~dominated[:mid]]
+    right = np.flatnonzero(~dominated[mid:])+mid
+    dominated[right] = _covered(left[:, 1:], points[right, 1:])
+    return dominated
+
+def _covered(red, blue):
+    """Mask of the rows of blue some row of red is at least as good as in every column"""
+    k = red.shape[1]
+    if len(red) == 0 or len(blue) == 0 or k == 0:
+        return np.repeat(len(red) > 0, len(blue))
+    if k == 1:
+        return red[:, 0].max() >= blue[:, 0]
+    if k == 2:
+        # best second value of the red rows at least as good in the first
+        order = np.argsort(-red[:, 0], kind='mergesort')
+        best = np.maximum.accumulate(red[order, 1])
+        count = np.searchsorted(-red[order, 0], -blue[:, 0], side='right')
+        return (count > 0) & (best[np.maximum(count-1, 0)] >= blue[:, 1])
+    if len(red)*len(blue) <= _BLOCK:
+        return np.any(np.all(red[:, None, :] >= blue[None, :, :], axis=2), axis=0)
+
+    # split at the median of the first column, a red row above it covers a
+    # blue row below it if it does in the other columns
+    first = np.concatenate([red[:, 0], blue[:, 0]])
+    low, median = first.min(), np.median(first)
+    if low == first.max():
+        return _covered(red[:, 1:], blue[:, 1:])
+    if median == low:
+        redHigh, blueHigh = red[:, 0] > low, blue[:, 0] > low
+    else:
+        redHigh, blueHigh = red[:, 0] >= median, blue[:, 0] >= median
+    covered = np.empty(len(blue), bool)
+    covered[blueHigh] = _covered(red[redHigh], blue[blueHigh])
+    blueLow = np.flatnonzero(~blueHigh)
+    covered[blueLow] = _covered(red[redHigh][:, 1:], blue[blueLow, 1:])
+    rest = blueLow[~covered[blueLow]]
+    covered[rest] = _covered(red[~redHigh], blue[rest])
+    return covered
+
+
+class ParetoFrontier:
+
+    def __init__(self, space=None, objectives=None, chunkSize=100000, processes=1, profile='default'):
+        """ParetoFrontier Initialization
+        Args:
+            space: list of (technology, axes), the axes a list of (parameter, values) combined as a
+                cartesian product, DEFAULT_SPACE by default; parameters without an axis take the model defaults
+            objectives: names of OBJECTIVES, DEFAULT_OBJECTIVES by default
+            chunkSize: grid points evaluated at once
+            processes: size of the process pool, None for all cores, 1 runs in process
+            profile: name of a registered chip profile of both models
+        """
+        self.objectives = list(objectives or DEFAULT_OBJECTIVES)
+        for objective in self.objectives:
+            assert objective in OBJECTIVES, "unknown objective %s, one of %s" % (objective, ', '.join(sorted(OBJECTIVES)))
+        self.senses = np.array([OBJECTIVES[objective] for objective in self.objectives], float)
+        self.processes = processes
+        self.profile = profile
+
+        self.grids = []
+        for technology, axes in (space or DEFAULT_SPACE):
+            assert technology in MODELS, "technology must be one of %s" % ', '.join(TECHNOLOGIES)
+            if isinstance(axes, dict):
+                axes = sorted(axes.items())
+            axes = [(name, np.asarray(values).tolist()) for name, values in axes]
+            for name, _ in axes:
+                assert name in PARAMETERS[technology], "%s is not a parameter of the %s model" % (name, technology)
+            spec = {'model': MODELS[technology][0], 'axes': axes, 'metrics': []}
+            self.grids.append((technology, sweep.Sweep(spec, None, chunkSize)))
+        # one column per parameter of the technologies, NaN for the rows of a technology without it
+        self.parameters = []
+        for technology, _ in self.grids:
+            self.parameters.extend(name for name in PARAMETERS[technology] if name not in self.parameters)
+
+        self.size = sum(grid.size for _, grid in self.grids)
+        self.evaluated = 0
+        self.skipped = 0
+
+
+    def chunkFrontier(self, grid, chunk):
+        """Returns the objective values, the parameters and the number of
+        evaluated and skipped points of the frontier of a chunk of grid"""
+        technology, sweepGrid = self.grids[grid]
+        index, params = sweepGrid.chunkParams(chunk)
+        size = len(index)
+        defaults = inventory.constructorDefaults(MODELS[technology][2])
+        for name in PARAMETERS[technology]:
+            params[name] = np.broadcast_to(params.get(name, defaults[name]), (size,))
+        fits = np.ones(size, bool)
+        if technology == 'lorawan':
+            dr = params['dr'].astype(int)
+            pl = params['pl']
+            fits = (dr >= 0) & (dr < len(MAX_PL)) & (pl <= MAX_PL[np.clip(dr, 0, len(MAX_PL)-1)])
+        params = dict((name, np.asarray(values)[fits]) for name, values in params.items())
+
+        results = MODELS[technology][1](params, self.profile)
+        values = np.column_stack([results[objective] for objective in self.objectives])
+        # a point the models cannot evaluate, e.g. NaN from a zero payload, is skipped
+        evaluable = ~np.isnan(values).any(axis=1)
+        values = values[evaluable]
+        settings = np.column_stack([params[name][evaluable] if name in params else np.repeat(np.nan, len(values))
+                                    for name in self.parameters])
+        front = skyline(values, self.senses)
+        return grid, values[front], settings[front], len(values), size-len(values)
+
+    def _tasks(self):
+        return [(self, grid, chunk) for grid in range(len(self.grids))
+                for chunk in range(self.grids[grid][1].numofChunks)]
+
+    def run(self):
+        """Evaluates every grid chunk by chunk and returns the frontier
+        Returns:
+            dict of columns, technology, the parameters and the objectives, one row per frontier point,
+            the best in the first objective first
+        """
+        technology = np.empty(0, int)
+        values = np.empty((0, len(self.objectives)))
+        settings = np.empty((0, len(self.parameters)))
+        self.evaluated = self.skipped = 0
+        if self.processes == 1:
+            results = (_chunkFrontier(task) for task in self._tasks())
+            pool = None
+        else:
+            pool = multiprocessing.Pool(self.processes)
+            results = pool.imap_unordered(_chunkFrontier, self._tasks())
+        try:
+            for grid, chunkValues, chunkSettings, evaluated, skipped in results:
+                technology = np.concatenate([technology, np.repeat(grid, len(chunkValues))])
+                values = np.concatenate([values, chunkValues])
+                settings = np.concatenate([settings, chunkSettings])
+                front = skyline(values, self.senses)
+                technology, values, settings = technology[front], values[front], settings[front]
+                self.evaluated += evaluated
+                self.skipped += skipped
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        order = np.lexsort((values*self.senses)[:, ::-1].T)[::-1]
+        columns = {'technology': np.array([self.grids[grid][0] for grid in technology[order]], dtype=object)}
+        columns.update((name, settings[order, i]) for i, name in enumerate(self.parameters))
+        columns.update((objective, values[order, i]) for i, objective in enumerate(self.objectives))
+        return columns
+
+
+def _chunkFrontier(task):
+    frontier, grid, chunk = task
+    return frontier.chunkFrontier(grid, chunk)
+
+
+def iterRows(columns):
+    """Yields the rows of a frontier as dicts, without the parameters the
+    technology of a row does not have"""
+    names = [name for name in columns if name != 'technology']
+    casts = dict((technology, dict((keyword, cast) for _, keyword, cast in table))
+                 for technology, table in parameters.MODEL_PARAMETERS.items())
+    for i, technology in enumerate(columns['technology']):
+        row = {'technology': technology}
+        for name in names:
+            value = columns[name][i]
+            if name in OBJECTIVES:
+                row[name] = value.item()
+            elif name in casts[technology]:
+                row[name] = casts[technology][name](value)
+        yield row
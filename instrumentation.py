@@ -0,0 +1,139 @@
+# opt-in call counters and wall time per phase of the energy models
+#
+#     with instrumentation.profiled() as stats:
+#         comparison sweep ...
+#     print stats.report()
+#
+# The model phases are registered here, not in the models: enable() swaps
+# the registered methods for timing wrappers and disable() puts the
+# originals back, so while instrumentation is off the models run their own
+# methods with no extra cost at all. Stats are plain dicts underneath, a
+# worker process can return stats.toDict() and the parent merge them with
+# Stats.fromDict.
+
+# import libraries
+import functools
+import timeit
+
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+class Stats:
+    """Calls, inclusive and exclusive wall time (s) per phase"""
+
+    def __init__(self, phases=None):
+        self.phases = phases if phases is not None else {}
+
+    def add(self, phase, calls, total, own):
+        counters = self.phases.setdefault(phase, [0, 0.0, 0.0])
+        counters[0] += calls
+        counters[1] += total
+        counters[2] += own
+
+    def merge(self, other):
+        for phase, (calls, total, own) in other.phases.items():
+            self.add(phase, calls, total, own)
+        return self
+
+    def __sub__(self, other):
+        delta = Stats()
+        for phase, (calls, total, own) in self.phases.items():
+            before = other.phases.get(phase, [0, 0.0, 0.0])
+            if calls != before[0]:
+                delta.add(phase, calls-before[0], total-before[1], own-before[2])
+        return delta
+
+    def copy(self):
+        return Stats(dict((phase, list(counters)) for phase, counters in self.phases.items()))
+
+    def toDict(self):
+        return dict((phase, {'calls': calls, 'total': total, 'self': own})
+                    for phase, (calls, total, own) in self.phases.items())
+
+    @classmethod
+    def fromDict(cls, phases):
+        return cls(dict((phase, [counters['calls'], counters['total'], counters['self']])
+                        for phase, counters in phases.items()))
+
+    def report(self):
+        lines = ['%-45s %10s %12s %12s' % ('phase', 'calls', 'total (s)', 'self (s)')]
+        for phase, (calls, total, own) in sorted(self.phases.items(), key=lambda item: -item[1][2]):
+            lines.append('%-45s %10d %12.4f %12.4f' % (phase, calls, total, own))
+        return '\n'.join(lines)
+
+
+_registry = [] # (class, method name, phase)
+_originals = {}
+_stats = Stats()
+_childTime = [] # time spent in instrumented callees, one entry per active call
+
+
+def register(cls, names):
+    """Registers methods of cls as phases named 'Class.method'. A leading
+    underscore is dropped from the phase name, so the cached implementation
+    of a public method is reported under the public name."""
+    for name in names:
+        phase = '%s.%s' % (cls.__name__, name if name.startswith('__') else name.lstrip('_'))
+        _registry.append((cls, name, phase))
+    if isEnabled():
+        disable()
+        enable()
+
+def _timed(method, phase):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        _childTime.append(0.0)
+        start = timeit.default_timer()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = timeit.default_timer()-start
+            children = _childTime.pop()
+            if _childTime:
+                _childTime[-1] += elapsed
+            _stats.add(phase, 1, elapsed, elapsed-children)
+    return wrapper
+
+def enable():
+    for cls, name, phase in _registry:
+        if (cls, name) not in _originals:
+            _originals[(cls, name)] = cls.__dict__[name]
+            setattr(cls, name, _timed(cls.__dict__[name], phase))
+
+def disable():
+    for (cls, name), method in _originals.items():
+        setattr(cls, name, method)
+    _originals.clear()
+
+def isEnabled():
+    return bool(_originals)
+
+def reset():
+    _stats.phases.clear()
+
+def getStats():
+    """Returns a snapshot of the counters collected in this process"""
+    return _stats.copy()
+
+
+class profiled:
+    """Context manager that enables instrumentation for its block and fills
+    the Stats it returns with the calls made inside the block"""
+
+    def __enter__(self):
+        self.wasEnabled = isEnabled()
+        self.before = getStats()
+        self.stats = Stats()
+        enable()
+        return self.stats
+
+    def __exit__(self, *exc):
+        if not self.wasEnabled:
+            disable()
+        self.stats.merge(getStats()-self.before)
+        return False
+
+
+register(LoRaWANEnergyModel, ['__init__', 'calcAveCurrentandActiveTime', 'calcACandAT', '_calcAveCurrentAck'])
+register(NBIoTEnergyModel, ['__init__', 'calcStatesProb', 'calcStatesEnergy', 'calcEnergyperPacket'])
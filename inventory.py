@@ -0,0 +1,176 @@
+# streaming evaluation of device inventories
+#
+#     with open('devices.csv') as f, open('lifetimes.csv', 'w') as out, open('errors.csv', 'w') as errors:
+#         print evaluateInventory(f, out, errors=errors)
+#     python cli.py inventory devices.jsonl --format jsonl --errors errors.csv > lifetimes.jsonl
+#
+# An inventory has one device per row, as CSV with a header line or as
+# JSON lines, with a technology column ('lorawan' or 'nbiot'), an optional
+# id column and the model parameters under the keywords of parameters.py
+# (dr, cr, pl, t_notif, N_dev, p_c, ackmode for LoRaWAN; pl, t_notif, p_c,
+# p_e for NB-IoT); a missing or empty parameter takes the model default.
+# Integral parameters, the payload among them, must be integers.
+#
+# The rows are read chunkSize at a time, every chunk is evaluated with
+# LoRaWANBatchModel (expected ACK timeouts) and NBIoTBatchModel and its
+# results are written before the next chunk is read, in input order, so
+# memory does not grow with the inventory. A row the models cannot
+# evaluate, e.g. a payload above the maximum of its data rate, is written
+# to the errors stream with its row number and the reason instead of
+# stopping the run.
+
+# import libraries
+import csv
+import inspect
+import itertools
+import json
+import math
+
+import numpy as np
+
+import parameters
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from LoRaWANEnergyModel.lorawanenergymodel import MAX_PL
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+
+
+TECHNOLOGIES = {'lorawan': LoRaWANBatchModel, 'nbiot': NBIoTBatchModel}
+COLUMNS = ['row', 'id', 'technology', 'lifetime', 'energyperBit']
+ERROR_COLUMNS = ['row', 'id', 'error']
+
+
+def iterRecords(stream, format='csv'):
+    """Yields (row number, dict) of the devices of an inventory, a record
+    that is not valid JSON is yielded as (row number, None)"""
+    if format == 'csv':
+        for row, record in enumerate(csv.DictReader(stream), 1):
+            yield row, record
+        return
+    for row, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield row, record if isinstance(record, dict) else None
+
+def parseRecord(record):
+    """Returns the technology and the model arguments of a record
+    Raises:
+        ValueError: the record cannot be evaluated, with the reason
+    """
+    if record is None:
+        raise ValueError('not a JSON object')
+    technology = str(record.get('technology') or '').strip().lower()
+    if technology not in TECHNOLOGIES:
+        raise ValueError('unknown technology %r' % record.get('technology'))
+    arguments = {}
+    for _, keyword, cast in parameters.MODEL_PARAMETERS[technology]:
+        value = record.get(keyword)
+        if value is None or value == '':
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError('%s is not a number: %r' % (keyword, value))
+        if cast is int and not number.is_integer():
+            raise ValueError('%s must be an integer, got %r' % (keyword, value))
+        arguments[keyword] = cast(number)
+
+    for keyword in ('pl', 't_notif'):
+        value = arguments.get(keyword, 1)
+        if not value > 0 or math.isinf(value):
+            raise ValueError('%s must be positive and finite' % keyword)
+    for keyword in ('p_c', 'p_e'):
+        if not 0 <= arguments.get(keyword, 0) <= 1:
+            raise ValueError('%s must be a probability' % keyword)
+    if technology == 'lorawan':
+        dr = arguments.get('dr', 3)
+        if not 0 <= dr <= 6:
+            raise ValueError('Only DR values from 0 to 6 are supported')
+        if not 1 <= arguments.get('cr', 1) <= 4:
+            raise ValueError('Valid cr values are from 1 to 4, for 4/5,4/6,4/7,4/8')
+        if arguments.get('pl', 3) > MAX_PL[dr]:
+            raise ValueError('max PL bytes %d at DR %d' % (MAX_PL[dr], dr))
+        if arguments.get('ackmode', 1) not in (0, 1):
+            raise ValueError('ackmode must be 0 or 1')
+        if not arguments.get('N_dev', 1) >= 1:
+            raise ValueError('N_dev must be at least 1')
+    else:
+        # an RA attempt that always fails leaves nothing to average over
+        for keyword in ('p_c', 'p_e'):
+            if not arguments.get(keyword, 0) < 1:
+                raise ValueError('%s must be below 1 for NB-IoT' % keyword)
+    return technology, arguments
+
+
+def evaluateChunk(records):
+    """Evaluates a list of (row number, record) and returns the result rows
+    in input order and the error rows"""
+    results = []
+    errors = []
+    groups = dict((technology, []) for technology in TECHNOLOGIES)
+    for row, record in records:
+        identifier = record.get('id', '') if record is not None else ''
+        try:
+            technology, arguments = parseRecord(record)
+        except ValueError as e:
+            errors.append({'row': row, 'id': identifier, 'error': str(e)})
+            continue
+        result = {'row': row, 'id': identifier, 'technology': technology}
+        groups[technology].append((result, arguments))
+        results.append(result)
+
+    for technology, group in groups.items():
+        if not group:
+            continue
+        # one batch of the rows of a technology, missing arguments take the model defaults
+        defaults = constructorDefaults(TECHNOLOGIES[technology])
+        names = parameters.getKeywords(technology)
+        columns = dict((name, np.array([arguments.get(name, defaults[name]) for _, arguments in group]))
+                       for name in names)
+        batch = TECHNOLOGIES[technology](**columns)
+        for metric, values in [('lifetime', batch.calcLifetime()), ('energyperBit', batch.calcEnergyperBit())]:
+            for (result, _), value in zip(group, values.tolist()):
+                result[metric] = value
+    return results, errors
+
+def constructorDefaults(cls):
+    """Returns the default constructor arguments of a model class"""
+    spec = inspect.getargspec(cls.__init__)
+    return dict(zip(spec.args[-len(spec.defaults):], spec.defaults))
+
+
+def evaluateInventory(stream, output, format='csv', outputFormat='csv', errors=None, chunkSize=100000,
+                      header=True):
+    """Evaluates every device of an inventory stream chunk by chunk
+    Args:
+        stream: inventory, CSV with a header line or JSON lines
+        output: stream the result rows are written to
+        format: 'csv' or 'jsonl', of the inventory
+        outputFormat: 'csv' or 'jsonl', of the results and errors
+        errors: stream the malformed rows are written to, they are only counted if None
+        chunkSize: rows evaluated at once
+        header: write the CSV header lines
+    Returns:
+        dict with the number of rows, evaluated rows and errors
+    """
+    writer = parameters.RowWriter(output, COLUMNS, outputFormat, header)
+    errorWriter = parameters.RowWriter(errors, ERROR_COLUMNS, outputFormat, header) if errors is not None else None
+    counts = {'rows': 0, 'evaluated': 0, 'errors': 0}
+    records = iterRecords(stream, format)
+    while True:
+        chunk = list(itertools.islice(records, chunkSize))
+        if not chunk:
+            break
+        results, failed = evaluateChunk(chunk)
+        for result in results:
+            writer.write(result)
+        if errorWriter is not None:
+            for error in failed:
+                errorWriter.write(error)
+        counts['rows'] += len(chunk)
+        counts['evaluated'] += len(results)
+        counts['errors'] += len(failed)
+    return counts
@@ -0,0 +1,54 @@
+# model parameters and result rows shared by cli.py, inventory.py, frontier.py and service.py
+#
+#     for option, keyword, cast in MODEL_PARAMETERS['nbiot']:
+#         print '--%s sets %s, a %s' % (option, keyword, cast.__name__)
+#     writer = RowWriter(sys.stdout, ['pl', 'lifetime'], 'jsonl')
+#     writer.write({'pl': 20, 'lifetime': 1.38})
+#
+# The command line options, the inventory columns and the service query
+# fields of a model are the keywords of this table, and every value is
+# cast to its type before it reaches a model. dr, cr, pl, N_dev and
+# ackmode are integers, the payload in particular is a number of bytes.
+# The module does not import numpy, the scalar commands of cli.py start
+# without it.
+
+# import libraries
+import csv
+import json
+
+
+# command line option, model keyword and value type of the model parameters
+LORAWAN_PARAMETERS = [('dr', 'dr', int), ('cr', 'cr', int), ('pl', 'pl', int), ('t-notif', 't_notif', float),
+                      ('n-dev', 'N_dev', int), ('p-c', 'p_c', float), ('ackmode', 'ackmode', int)]
+NBIOT_PARAMETERS = [('pl', 'pl', int), ('t-notif', 't_notif', float), ('p-c', 'p_c', float),
+                    ('p-e', 'p_e', float)]
+MODEL_PARAMETERS = {'lorawan': LORAWAN_PARAMETERS, 'nbiot': NBIOT_PARAMETERS}
+
+
+def getKeywords(technology):
+    """Returns the model keywords of a technology, in table order"""
+    return [keyword for _, keyword, _ in MODEL_PARAMETERS[technology]]
+
+def plainNumber(value):
+    """numpy scalars as plain python numbers, other values as they are"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class RowWriter:
+    """Writes rows of named values to a stream as CSV or JSON lines"""
+
+    def __init__(self, stream, columns, format='csv', header=True):
+        self.stream = stream
+        self.columns = columns
+        self.format = format
+        if format == 'csv':
+            self.writer = csv.writer(stream, lineterminator='\n')
+            if header:
+                self.writer.writerow(columns)
+
+    def write(self, row):
+        values = [plainNumber(row[column]) for column in self.columns]
+        if self.format == 'csv':
+            self.writer.writerow([repr(value) if isinstance(value, float) else value for value in values])
+        else:
+            self.stream.write(json.dumps(dict(zip(self.columns, values)), sort_keys=True)+'\n')
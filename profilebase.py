@@ -0,0 +1,97 @@
+# chip profiles shared by the LoRaWAN and NB-IoT models
+#
+#     class ChipProfile(profilebase.ChipProfile):
+#         FIELDS = ('I_sleep', 'battery', 'voltage')
+#         __slots__ = FIELDS
+#     registry = profilebase.Registry(ChipProfile)
+#     registry.register('default', ChipProfile(I_sleep=.0001, battery=2400, voltage=3.3))
+#     print registry.get('default').replace(battery=1515)
+#
+# A ChipProfile holds the chip, network and battery settings a model used
+# to copy from its config module. Profiles are immutable and hashable, so
+# every model built with the same profile shares one object, and a profile
+# can be used as a cache key. Each model package subclasses ChipProfile
+# with the names of its fields, keeps its profiles in a Registry and reads
+# the fields through to the profile with profileProperty.
+
+
+class ChipProfile(object):
+    """Immutable settings, the fields named by FIELDS of the subclass"""
+    FIELDS = ()
+    __slots__ = ('_hash',)
+
+    def __init__(self, **values):
+        assert sorted(values) == sorted(self.FIELDS), "a profile needs exactly the fields %s" % ', '.join(self.FIELDS)
+        for field in self.FIELDS:
+            object.__setattr__(self, field, values[field])
+        object.__setattr__(self, '_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChipProfile is immutable, use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError("ChipProfile is immutable")
+
+    def values(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def toDict(self):
+        return dict(zip(self.FIELDS, self.values()))
+
+    def replace(self, **kwargs):
+        """Returns a copy with the given fields replaced"""
+        values = self.toDict()
+        values.update(kwargs)
+        return type(self)(**values)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.values() == other.values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # computed on first use, a profile holding arrays is valid but not hashable
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(self.values()))
+        return self._hash
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % item for item in zip(self.FIELDS, self.values())))
+
+    def __reduce__(self):
+        return (_restore, (type(self), self.values()))
+
+
+def _restore(cls, values):
+    return cls(**dict(zip(cls.FIELDS, values)))
+
+
+class Registry(object):
+    """Profiles of one ChipProfile class by name"""
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.profiles = {}
+
+    def register(self, name, profile):
+        assert isinstance(profile, self.cls), "a %s is needed" % self.cls.__name__
+        self.profiles[name] = profile
+        return profile
+
+    def get(self, profile='default'):
+        """Returns the registered profile of a name, or profile itself if it is a ChipProfile"""
+        if isinstance(profile, self.cls):
+            return profile
+        assert profile in self.profiles, "unknown chip profile %s, registered: %s" % (profile, ', '.join(sorted(self.profiles)))
+        return self.profiles[profile]
+
+
+def profileProperty(field):
+    """Model attribute that reads a profile field; assigning it replaces the
+    model's profile with a copy holding the new value"""
+    def getField(self):
+        return getattr(self.profile, field)
+    def setField(self, value):
+        self.profile = self.profile.replace(**{field: value})
+    return property(getField, setField, doc="%s of the chip profile" % field)
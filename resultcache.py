@@ -0,0 +1,215 @@
+# persistent result cache of the LoRaWAN and NB-IoT model evaluations
+#
+#     cache = ResultCache('results/cache.sqlite', maxEntries=500)
+#     columns = cache.evaluate('LoRaWANEnergyModel', {'dr': [0, 5], 'pl': 20, 't_notif': 600000},
+#                              ['lifetime', 'energyperBit'])
+#     Sweep(spec, 'results/lifetime', cache=cache).run()
+#     print cache.hits, cache.misses, cache.stats()
+#
+# Every evaluated chunk is stored under a content address, the SHA-1 of
+# the model name, the chunk's constructor argument arrays, every value of
+# the model's config module and the values of the chip profile. A changed
+# config or profile value changes every key, so stale results are never
+# returned, they are just no longer used and age out. The chunks are
+# evaluated with the batch evaluators of sweep.py, and all metrics of a
+# model are stored, so later runs asking for other metrics hit as well.
+#
+# Both models are evaluated as arrays, at about 1 us per point, so a
+# lookup per point would cost more than it saves. A chunk is one key and
+# one row instead, and a hit is about as fast as reading the chunk file
+# of a sweep. Reruns of a sweep, in another directory or after its chunk
+# files were deleted, and repeated cli.py sweep commands hit, an
+# overlapping grid only where its chunks are the same.
+#
+# The store is one SQLite database in WAL mode, readers do not block the
+# writer and the writers of a process pool take turns. Every process
+# opens its own connection, so a ResultCache can be passed to pool
+# workers. The cache is bounded to maxEntries chunks, of 8 bytes per
+# point and metric; when a store exceeds it the least recently used
+# chunks are evicted, the use time being exact to TOUCH_INTERVAL.
+
+# import libraries
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+import sweep
+
+
+VERSION = 2
+
+# a hit marks a point as used again only if its last use is older than
+# this (s), so warm reruns read without rewriting every point
+TOUCH_INTERVAL = 600.0
+
+# keys per SQL statement, below the SQLite limit of host parameters
+_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resultsUsed ON results (used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+def contextDigest(model, profile='default'):
+    """Hash of everything a model's results depend on besides its arguments"""
+    context = (VERSION, model, sweep.MODELS[model][1]) + sweep.contextValues(model, profile)
+    return hashlib.sha1(repr(context)).digest()
+
+def chunkKey(model, params):
+    """Content address of the evaluation of a chunk of constructor arguments"""
+    params = dict(params)
+    digest = hashlib.sha1(contextDigest(model, params.pop('profile', 'default')))
+    for name in sorted(params):
+        # integral and float values of a parameter give the same results
+        value = np.ascontiguousarray(params[name], dtype=float)
+        digest.update('%s%r' % (name, value.shape))
+        digest.update(value.tobytes())
+    return digest.digest()
+
+def _encode(values):
+    stream = io.BytesIO()
+    np.save(stream, np.asarray(values, float), allow_pickle=False)
+    return buffer(stream.getvalue())
+
+def _decode(value):
+    return np.load(io.BytesIO(value), allow_pickle=False)
+
+
+class ResultCache:
+
+    def __init__(self, path, maxEntries=1000, timeout=60.0):
+        """ResultCache Initialization
+        Args:
+            path: SQLite database file, created if missing
+            maxEntries: chunks kept, the least recently used are evicted beyond it
+            timeout: seconds a writer waits for another process's write
+        """
+        self.path = path
+        self.maxEntries = maxEntries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self):
+        # connections are per process, a pool worker opens its own
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+    def get(self, keys):
+        """Returns a dict of the stored values of keys, binary digests, and
+        marks them as used"""
+        connection = self.connect()
+        found = {}
+        stale = []
+        now = time.time()
+        for start in range(0, len(keys), _BATCH):
+            batch = [buffer(key) for key in keys[start:start+_BATCH]]
+            query = 'SELECT key, value, used FROM results WHERE key IN (%s)' % ','.join('?'*len(batch))
+            for key, value, used in connection.execute(query, batch):
+                found[str(key)] = _decode(str(value))
+                if used < now - TOUCH_INTERVAL:
+                    stale.append((now, key))
+        hits = len(found)
+        misses = len(keys) - hits
+        self.hits += hits
+        self.misses += misses
+        with _transaction(connection):
+            connection.executemany('UPDATE results SET used = ? WHERE key = ?', stale)
+            connection.executemany('UPDATE counters SET value = value + ? WHERE name = ?',
+                                   [(hits, 'hits'), (misses, 'misses')])
+        return found
+
+    def put(self, items):
+        """Stores (key, float array) pairs and evicts beyond maxEntries"""
+        connection = self.connect()
+        with _transaction(connection):
+            now = time.time()
+            connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                                   [(buffer(key), _encode(value), now) for key, value in items])
+            excess = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.maxEntries
+            if excess > 0:
+                connection.execute('DELETE FROM results WHERE key IN '
+                                   '(SELECT key FROM results ORDER BY used LIMIT ?)', (excess,))
+                connection.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (excess,))
+
+    def stats(self):
+        """Returns the entries and the hit, miss and eviction counts of every
+        process that used the database"""
+        connection = self.connect()
+        counts = dict(connection.execute('SELECT name, value FROM counters'))
+        counts['entries'] = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return counts
+
+    def clear(self):
+        connection = self.connect()
+        with _transaction(connection):
+            connection.execute('DELETE FROM results')
+            connection.execute('UPDATE counters SET value = 0')
+
+
+    def evaluate(self, model, params, metrics=None):
+        """Evaluates a chunk like the evaluators of sweep.py, from the cache
+        if the same chunk was evaluated before
+        Args:
+            model: 'LoRaWANEnergyModel' or 'NBIoTEnergyModel'
+            params: dict of constructor arguments, scalars or arrays
+            metrics: metrics to return, all of sweep.MODELS by default
+        Returns:
+            dict of metric arrays of the broadcast shape of params
+        """
+        assert model in sweep.CONTEXTS, "model must be one of %s" % ', '.join(sorted(sweep.CONTEXTS))
+        evaluate, allMetrics = sweep.MODELS[model]
+        metrics = list(metrics or allMetrics)
+        key = chunkKey(model, params)
+        found = self.get([key])
+        if key in found:
+            values = found[key]
+        else:
+            results = evaluate(dict(params), allMetrics)
+            shape = np.broadcast(*[np.asarray(value) for name, value in params.items() if name != 'profile']+[0]).shape
+            values = np.array([np.broadcast_to(results[metric], shape) for metric in allMetrics])
+            self.put([(key, values)])
+        return dict((metric, values[allMetrics.index(metric)]) for metric in metrics)
+
+
+class _transaction:
+    """Runs the statements of a with block as one write transaction"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, excType, excValue, traceback):
+        self.connection.execute('COMMIT' if excType is None else 'ROLLBACK')
@@ -0,0 +1,153 @@
+# derivatives of the lifetime and energy per bit of the LoRaWAN and NB-IoT models
+#
+#     values, gradients = calcSensitivity('lorawan', dr=5, pl=20, t_notif=600000, p_c=0.01)
+#     print gradients['lifetime']['I_sleep']     # years per mA
+#     values, elasticities = calcSensitivity('nbiot', elasticity=True, t_notif=np.logspace(4, 8, 100000))
+#     print rankParameters(elasticities['lifetime'])[:5]
+#
+# The derivatives are taken with the complex step method: every parameter
+# gets its own copy of the grid along a new leading axis, the copy k has
+# parameter k shifted by an imaginary STEP, and the batch models evaluate
+# all copies at once, chunk by chunk of the grid. The imaginary part of a
+# result divided by STEP is its derivative, exact to rounding like
+# forward-mode automatic differentiation, and the real part is the result
+# itself. Like any forward mode the cost grows with the number of
+# parameters, about two batch evaluations each with the complex
+# arithmetic, so pass parameters to differentiate by fewer.
+#
+# Every continuous constructor and chip profile parameter of the batch
+# models can be differentiated; the profile parameters are shifted on a
+# copy of the profile, no module setting is modified. Discrete parameters (dr, cr, pl,
+# ackmode, N_dev, message sizes, retry limits) and T_txMin have no
+# derivative; the integral timers of the NB-IoT model are treated as
+# continuous, as in its closed form. The LoRaWAN derivatives are those of
+# LoRaWANBatchModel, i.e. of the scalar model in expected ACK timeout mode.
+
+# import libraries
+import inspect
+
+import numpy as np
+
+from LoRaWANEnergyModel import chipprofile as lorawanProfile
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel import chipprofile as nbiotProfile
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+STEP = 1e-20
+
+# differentiable parameters: constructor arguments and chip profile fields
+MODELS = {
+    'lorawan': {'model': LoRaWANBatchModel,
+                'constructor': ['t_notif', 'p_c', 'T_ackTO'],
+                'profile': ['I_sleep', 'I_wakeup', 'I_radioPrep', 'I_trans', 'I_delay1', 'I_delay2', 'I_recv1',
+                            'I_recv2', 'I_radioOff', 'I_postproc', 'I_turnoff', 'T_wakeup', 'T_radioPrep',
+                            'T_radioOff', 'T_postproc', 'T_turnoff', 'battery', 'voltage', 'BER', 'receive_delay1',
+                            'P_recv1', 'P_recv2', 'T_radioOffAck'],
+                'chipprofile': lorawanProfile},
+    'nbiot': {'model': NBIoTBatchModel,
+              'constructor': ['t_notif', 'p_c', 'p_e'],
+              'profile': ['Wc', 'Ps', 'Pi', 'P_rx', 'P_txRB', 'P_txPre', 'T_pre', 'T_rxRA', 'T_rxCR', 'T_DRXi',
+                          'T_ond', 'T_ls', 'T_i', 'T_wait', 'battery', 'voltage', 'N_devices'],
+              'chipprofile': nbiotProfile},
+}
+
+METRICS = ['lifetime', 'energyperBit']
+
+
+def getParameters(model):
+    """Returns the names of the differentiable parameters of a model"""
+    spec = MODELS[model]
+    return spec['constructor'] + spec['profile']
+
+def _constructorDefaults(cls):
+    spec = inspect.getargspec(cls.__init__)
+    return dict(zip(spec.args[-len(spec.defaults):], spec.defaults))
+
+
+def calcSensitivity(model, parameters=None, elasticity=False, chunkSize=2000, **kwargs):
+    """Lifetime and energy per bit and their derivatives in one pass
+    Args:
+        model: 'lorawan' or 'nbiot'
+        parameters: names to differentiate by, getParameters(model) by default
+        elasticity: return d ln(metric)/d ln(parameter) instead of the derivative,
+            which makes parameters of different units comparable
+        chunkSize: grid points evaluated at once, the copies of a chunk take
+            about len(parameters) times its memory
+        kwargs: batch model arguments, scalars or arrays
+    Returns:
+        dict of the metric arrays and dict of metric -> parameter -> derivative
+        array, all of the broadcast shape of kwargs
+    """
+    assert model in MODELS, "model must be one of %s" % ', '.join(sorted(MODELS))
+    spec = MODELS[model]
+    parameters = list(parameters or getParameters(model))
+    for name in parameters:
+        assert name in getParameters(model), "%s is not a differentiable %s parameter" % (name, model)
+    K = len(parameters)
+
+    profile = spec['chipprofile'].get(kwargs.pop('profile', 'default'))
+    if 'T_ackTO' in parameters and kwargs.get('T_ackTO') is None:
+        kwargs['T_ackTO'] = profile.expectedAckTimeout()
+    defaults = _constructorDefaults(spec['model'])
+    for name in spec['constructor']:
+        if name in parameters:
+            kwargs.setdefault(name, defaults[name])
+    # the grid is flattened and evaluated chunk by chunk
+    shape = np.broadcast(*[np.asarray(value) for value in kwargs.values() + [0]]).shape
+    size = int(np.prod(shape))
+    flat = dict((name, np.broadcast_to(value, shape).ravel()) for name, value in kwargs.items())
+
+    # copy k of the grid has parameter k shifted by an imaginary step
+    base = {}
+    perturbed = {'constructor': [], 'profile': {}}
+    for k, name in enumerate(parameters):
+        direction = np.zeros((K, 1))
+        direction[k] = STEP
+        if name in spec['profile']:
+            base[name] = getattr(profile, name)
+            perturbed['profile'][name] = base[name] + 1j*direction
+        else:
+            base[name] = flat[name].reshape(shape)
+            perturbed['constructor'].append((name, 1j*direction))
+    profile = profile.replace(**perturbed['profile'])
+
+    results = dict((metric, np.empty((K, size), complex)) for metric in METRICS)
+    for start in range(0, size, chunkSize):
+        chunk = dict((name, value[start:start+chunkSize]) for name, value in flat.items())
+        for name, step in perturbed['constructor']:
+            chunk[name] = chunk[name] + step
+        batch = spec['model'](profile=profile, **chunk)
+        for metric, result in [('lifetime', batch.calcLifetime()), ('energyperBit', batch.calcEnergyperBit())]:
+            results[metric][:, start:start+chunkSize] = result
+
+    values = {}
+    gradients = {}
+    for metric in METRICS:
+        values[metric] = results[metric][0].real.reshape(shape)
+        gradients[metric] = {}
+        for k, name in enumerate(parameters):
+            gradient = (results[metric][k].imag/STEP).reshape(shape)
+            if elasticity:
+                gradient = gradient*base[name]/values[metric]
+            gradients[metric][name] = gradient
+    return values, gradients
+
+def calcModelSensitivity(model, parameters=None, elasticity=False):
+    """calcSensitivity at the operating point of a LoRaWANEnergyModel or
+    NBIoTEnergyModel instance"""
+    if isinstance(model, LoRaWANEnergyModel):
+        return calcSensitivity('lorawan', parameters, elasticity, dr=model.DR, cr=model._CR, pl=model._PL,
+                               t_notif=model.T_notif, p_c=model.P_c, ackmode=int(model._acknowledgement),
+                               profile=model.profile)
+    assert isinstance(model, NBIoTEnergyModel), "model must be a LoRaWANEnergyModel or NBIoTEnergyModel"
+    return calcSensitivity('nbiot', parameters, elasticity, pl=model.B_data, t_notif=model.IAT,
+                           p_c=model.P_c, p_e=model.P_e, profile=model.profile)
+
+def rankParameters(gradients):
+    """Returns (parameter, largest absolute value) pairs of a metric's
+    derivatives or elasticities, the most influential parameter first"""
+    return sorted(((name, float(np.max(np.abs(gradient)))) for name, gradient in gradients.items()),
+                  key=lambda item: -item[1])
@@ -0,0 +1,407 @@
+# local HTTP/JSON evaluation service of the LoRaWAN and NB-IoT models
+#
+#     python cli.py serve --port 8350 --window 0.002
+#
+#     client = ServiceClient('localhost', 8350)
+#     print client.evaluate({'technology': 'lorawan', 'dr': 5, 'pl': 20, 't_notif': 600000})
+#     print client.evaluate([{'technology': 'nbiot', 'pl': 100}, {'technology': 'coverage', 'r_ave': 2.0}])
+#     print client.metrics()
+#
+#     service = EvaluationService()
+#     print service.evaluate([{'technology': 'lorawan', 'dr': 0}])
+#
+# POST /evaluate takes one query, a JSON object, or a list of them and
+# answers with one result or a list of results in the same order. A query
+# has a technology and the model keywords of parameters.py, validated like the
+# rows of inventory.py, and an optional id that is echoed back:
+#     lorawan   lifetime, energyperBit and capacity of LoRaWANBatchModel
+#               (expected ACK timeouts)
+#     nbiot     lifetime and energyperBit of NBIoTBatchModel
+#     coverage  R_t, P_c, P_e, P_out and converged of the NB-IoT RA load
+#               fixed point of r_ave arrivals/ms
+# A metric that is not finite, e.g. the P_out of an r_ave beyond the
+# channel capacity, is null, so the answers stay strict JSON. A query
+# that cannot be evaluated gets {'error': reason}. GET /metrics
+# returns the request, query and cache counters, the p50/p99 latency of
+# the recent requests and their batch sizes, GET /health returns 'ok'.
+#
+# Python 2 has no asyncio, the server runs on an asyncore event loop in
+# one thread, with HTTP/1.1 keep-alive and pipelining. Queries found in
+# the LRU result cache are answered at once. The others wait until window
+# seconds after the first of them or until maxBatch are waiting, and all
+# waiting queries of all connections are then evaluated with one batch
+# model call per technology, so concurrent clients share a vectorized
+# evaluation instead of building a model each. Equal queries, after the
+# model defaults are filled in, share one cache entry and one evaluation.
+
+# import libraries
+import asyncore
+import collections
+import httplib
+import json
+import socket
+import time
+
+import numpy as np
+
+import inventory
+import parameters
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel import nbiotCoverage
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+
+
+METRICS = {'lorawan': ('lifetime', 'energyperBit', 'capacity'),
+           'nbiot': ('lifetime', 'energyperBit'),
+           'coverage': ('R_t', 'P_c', 'P_e', 'P_out', 'converged')}
+
+# latencies and batch sizes the percentiles are taken from
+RECENT = 10000
+
+
+def _jsonValue(value):
+    # JSON has no NaN or Infinity, non-finite metrics are sent as null
+    value = parameters.plainNumber(value)
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        return None
+    return value
+
+def parseQuery(query):
+    """Returns the technology and the model arguments of a query, with the
+    model defaults filled in
+    Raises:
+        ValueError: the query cannot be evaluated, with the reason
+    """
+    if not isinstance(query, dict):
+        raise ValueError('not a JSON object')
+    if str(query.get('technology') or '').strip().lower() == 'coverage':
+        try:
+            R_ave = float(query.get('r_ave'))
+        except (TypeError, ValueError):
+            raise ValueError('r_ave is not a number: %r' % query.get('r_ave'))
+        if not R_ave > 0:
+            raise ValueError('r_ave must be positive')
+        return 'coverage', {'r_ave': R_ave}
+    technology, arguments = inventory.parseRecord(query)
+    defaults = inventory.constructorDefaults(inventory.TECHNOLOGIES[technology])
+    for keyword in parameters.getKeywords(technology):
+        arguments.setdefault(keyword, defaults[keyword])
+    return technology, arguments
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, maxEntries):
+        self.maxEntries = maxEntries
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _Request:
+    """Queries of one request, answered once every result is known"""
+
+    __slots__ = ('queries', 'results', 'waiting', 'callback', 'started')
+
+    def __init__(self, queries, callback):
+        self.queries = queries
+        self.results = [None]*len(queries)
+        self.waiting = 0
+        self.callback = callback
+        self.started = time.time()
+
+
+class EvaluationService:
+
+    def __init__(self, window=.002, maxBatch=4096, cacheSize=100000, profile='default'):
+        """EvaluationService Initialization
+        Args:
+            window: seconds a query waits for more queries to be evaluated with
+            maxBatch: queries evaluated at once
+            cacheSize: results kept in the LRU cache
+            profile: chip profile of the LoRaWAN and NB-IoT models
+        """
+        self.window = window
+        self.maxBatch = maxBatch
+        self.profile = profile
+        self.cache = LRUCache(cacheSize)
+        # waiting queries by key, with the requests and positions they answer
+        self.pending = collections.OrderedDict()
+        self.deadline = None
+        self.counts = dict.fromkeys(('requests', 'queries', 'errors', 'hits', 'evaluated', 'batches'), 0)
+        self.latencies = collections.deque(maxlen=RECENT)
+        self.batchSizes = collections.deque(maxlen=RECENT)
+        self.started = time.time()
+
+    def submit(self, queries, callback):
+        """Answers a list of queries, callback(results) is called at once if
+        every result is cached and otherwise by the flush that evaluates them"""
+        request = _Request(queries, callback)
+        self.counts['requests'] += 1
+        self.counts['queries'] += len(queries)
+        for i, query in enumerate(queries):
+            try:
+                technology, arguments = parseQuery(query)
+            except ValueError as e:
+                self._answer(request, i, {'error': str(e)})
+                self.counts['errors'] += 1
+                continue
+            key = (technology,) + tuple(sorted(arguments.items()))
+            result = self.cache.get(key)
+            if result is not None:
+                self.counts['hits'] += 1
+                self._answer(request, i, result)
+                continue
+            if key not in self.pending:
+                self.pending[key] = (technology, arguments, [])
+            self.pending[key][2].append((request, i))
+            request.waiting += 1
+        if request.waiting == 0:
+            self._done(request)
+        elif self.deadline is None:
+            self.deadline = time.time() + self.window
+
+    def isDue(self, now=None):
+        """True when the waiting queries are to be evaluated"""
+        return bool(self.pending) and (len(self.pending) >= self.maxBatch or (now or time.time()) >= self.deadline)
+
+    def flush(self):
+        """Evaluates every waiting query, maxBatch at a time, one batch model
+        call per technology, and answers their requests"""
+        while self.pending:
+            batch = [self.pending.popitem(last=False) for _ in range(min(self.maxBatch, len(self.pending)))]
+            groups = collections.defaultdict(list)
+            for key, (technology, arguments, waiting) in batch:
+                groups[technology].append((key, arguments, waiting))
+            for technology, group in groups.items():
+                try:
+                    columns = self.evaluateColumns(technology, [arguments for _, arguments, _ in group])
+                except (AssertionError, ValueError, FloatingPointError) as e:
+                    columns = None
+                    error = {'error': str(e) or 'evaluation failed'}
+                for i, (key, _, waiting) in enumerate(group):
+                    if columns is None:
+                        result = error
+                    else:
+                        result = dict((metric, _jsonValue(columns[metric][i])) for metric in METRICS[technology])
+                        result['technology'] = technology
+                        self.cache.put(key, result)
+                    for request, position in waiting:
+                        self._answer(request, position, result)
+                        request.waiting -= 1
+                        if request.waiting == 0:
+                            self._done(request)
+            self.counts['evaluated'] += len(batch)
+            self.counts['batches'] += 1
+            self.batchSizes.append(len(batch))
+        self.deadline = None
+
+    def evaluate(self, queries):
+        """Returns the results of a list of queries, evaluated at once"""
+        answers = []
+        self.submit(queries, answers.append)
+        if not answers:
+            self.flush()
+        return answers[0]
+
+    def _answer(self, request, i, result):
+        identifier = request.queries[i].get('id') if isinstance(request.queries[i], dict) else None
+        request.results[i] = result if identifier is None else dict(result, id=identifier)
+
+    def _done(self, request):
+        self.latencies.append(time.time() - request.started)
+        request.callback(request.results)
+
+    def evaluateColumns(self, technology, arguments):
+        """Evaluates a list of parsed queries of one technology at once
+        Returns:
+            dict of metric arrays in the order of arguments
+        """
+        if technology == 'coverage':
+            return nbiotCoverage.solveR_tCurve([query['r_ave'] for query in arguments])
+        columns = dict((keyword, np.array([query[keyword] for query in arguments]))
+                       for keyword in parameters.getKeywords(technology))
+        if technology == 'lorawan':
+            lora = LoRaWANBatchModel(profile=self.profile, **columns)
+            return {'lifetime': lora.calcLifetime(), 'energyperBit': lora.calcEnergyperBit(),
+                    'capacity': lora.calcAlohaCapcity()}
+        nbiot = NBIoTBatchModel(profile=self.profile, **columns)
+        return {'lifetime': nbiot.calcLifetime(), 'energyperBit': nbiot.calcEnergyperBit()}
+
+
+    def metrics(self):
+        """Returns the counters, the uptime (s), the p50/p99 latency (ms) of
+        the recent requests and the mean, p50 and max of the recent batch sizes"""
+        counts = dict(self.counts)
+        latencies = np.array(self.latencies)*1000.0
+        batchSizes = np.array(self.batchSizes)
+        counts['uptime'] = time.time() - self.started
+        counts['cacheEntries'] = len(self.cache)
+        counts['latencyP50'], counts['latencyP99'] = np.percentile(latencies, [50, 99]).tolist() \
+            if len(latencies) else (None, None)
+        counts['batchSizeMean'], counts['batchSizeP50'], counts['batchSizeMax'] = \
+            (batchSizes.mean(), np.percentile(batchSizes, 50), batchSizes.max()) if len(batchSizes) else (None,)*3
+        return dict((name, parameters.plainNumber(value)) for name, value in counts.items())
+
+
+class _Connection(asyncore.dispatcher):
+    """HTTP/1.1 connection, the responses of pipelined requests are sent in
+    request order"""
+
+    def __init__(self, sock, server):
+        asyncore.dispatcher.__init__(self, sock, map=server.map)
+        self.service = server.service
+        self.received = ''
+        self.outgoing = ''
+        self.responses = collections.deque()  # [data or None, close after it]
+
+    def handle_read(self):
+        data = self.recv(65536)
+        if not data:
+            return
+        self.received += data
+        while True:
+            end = self.received.find('\r\n\r\n')
+            if end < 0:
+                return
+            lines = self.received[:end].split('\r\n')
+            headers = dict((name.strip().lower(), value.strip())
+                           for name, _, value in (line.partition(':') for line in lines[1:]))
+            try:
+                method, path, version = lines[0].split(' ', 2)
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                self.received = ''
+                self._respond(self._slot(True), 400, {'error': 'malformed request'})
+                return
+            if len(self.received) < end + 4 + length:
+                return
+            body = self.received[end+4:end+4+length]
+            self.received = self.received[end+4+length:]
+            connection = headers.get('connection', '').lower()
+            close = connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive')
+            self._handle(method, path, body, self._slot(close))
+
+    def _slot(self, close):
+        slot = [None, close]
+        self.responses.append(slot)
+        return slot
+
+    def _handle(self, method, path, body, slot):
+        if method == 'GET' and path == '/metrics':
+            self._respond(slot, 200, self.service.metrics())
+        elif method == 'GET' and path == '/health':
+            self._respond(slot, 200, 'ok')
+        elif method == 'POST' and path == '/evaluate':
+            try:
+                queries = json.loads(body)
+            except ValueError:
+                self._respond(slot, 400, {'error': 'the body is not JSON'})
+                return
+            single = not isinstance(queries, list)
+            self.service.submit([queries] if single else queries,
+                                lambda results: self._respond(slot, 200, results[0] if single else results))
+        else:
+            self._respond(slot, 404, {'error': 'unknown path %s' % path})
+
+    def _respond(self, slot, code, body):
+        data = json.dumps(body, sort_keys=True, allow_nan=False)
+        slot[0] = 'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n%s\r\n%s' % (
+            code, httplib.responses[code], len(data), 'Connection: close\r\n' if slot[1] else '', data)
+        while self.responses and self.responses[0][0] is not None:
+            data, close = self.responses.popleft()
+            self.outgoing += data
+            if close:
+                self.responses.clear()
+                self.received = ''
+                self.closing = True
+        if self.outgoing and self.connected:
+            self.handle_write()
+
+    def writable(self):
+        return bool(self.outgoing)
+
+    def handle_write(self):
+        sent = self.send(self.outgoing)
+        self.outgoing = self.outgoing[sent:]
+        if not self.outgoing and self.closing:
+            self.close()
+
+    def handle_close(self):
+        self.close()
+
+
+class EvaluationServer(asyncore.dispatcher):
+    """HTTP server of an EvaluationService on its own asyncore map"""
+
+    def __init__(self, address, service, backlog=128):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.service = service
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(address)
+        self.listen(backlog)
+        self.server_address = self.socket.getsockname()
+        self.running = False
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            sock, _ = pair
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _Connection(sock, self)
+
+    def serve_forever(self, poll_interval=0.5):
+        """Serves until shutdown(), the waiting queries are evaluated when
+        they are due"""
+        self.running = True
+        service = self.service
+        while self.running:
+            timeout = poll_interval if service.deadline is None else max(service.deadline - time.time(), 0)
+            asyncore.loop(timeout, True, self.map, 1)
+            if service.isDue():
+                service.flush()
+
+    def shutdown(self):
+        self.running = False
+
+    def server_close(self):
+        asyncore.close_all(self.map)
+
+
+class ServiceClient:
+    """Client of an evaluation service over one keep-alive connection"""
+
+    def __init__(self, host='localhost', port=8350, timeout=60.0):
+        self.connection = httplib.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        return json.loads(response.read())
+
+    def evaluate(self, queries):
+        """Results of a query or a list of queries"""
+        return self._request('POST', '/evaluate', json.dumps(queries))
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+    def close(self):
+        self.connection.close()
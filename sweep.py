@@ -0,0 +1,212 @@
+# declarative parameter sweeps of the LoRaWAN and NB-IoT energy models
+#
+# A sweep spec names the model, the parameter axes, how the axes are
+# combined and the metrics to keep:
+#
+#     spec = {'model': 'LoRaWANEnergyModel',
+#             'axes': [('dr', [0, 5]), ('t_notif', [i*10**exp*1000 for exp in range(1, 5) for i in range(1, 10)])],
+#             'product': 'cartesian',    # or 'zip'
+#             'fixed': {'ackmode': 1, 'pl': 20},
+#             'metrics': ['lifetime', 'energyperBit']}
+#     Sweep(spec, 'results/lifetime').run()
+#     columns = loadSweep('results/lifetime')
+#
+# The grid is never materialised: it is split into chunks of flat indices,
+# the chunks are evaluated by a process pool and every worker writes its
+# chunk to the output directory as a columnar .npz file. Chunks already on
+# disk are skipped, so rerunning an interrupted sweep resumes it. The
+# manifest key covers the spec, the chunk size and every value of the
+# model's config module and chip profile, so a directory written under
+# other settings is refused instead of resumed. With a
+# resultcache.ResultCache the chunks an earlier sweep of the same grid
+# evaluated are read from the cache instead of evaluated again.
+
+# import libraries
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import types
+
+import numpy as np
+
+from LoRaWANEnergyModel import chipprofile as lorawanProfile
+from LoRaWANEnergyModel import config as lorawanConfig
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel import chipprofile as nbiotProfile
+from NBIoTEnergyModel import config as nbiotConfig
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+import profilebase
+
+
+def evaluateLoRaWAN(params, metrics):
+    results = LoRaWANBatchModel(**params).evaluate()
+    return dict((metric, results[metric]) for metric in metrics)
+
+def evaluateNBIoT(params, metrics):
+    results = NBIoTBatchModel(**params).evaluate()
+    return dict((metric, results[metric]) for metric in metrics)
+
+LORAWAN_METRICS = ['aveCurrent', 'activeTime', 'dataDelivered', 'energyperBit', 'lifetime', 'capacity']
+NBIOT_METRICS = ['energyperBit', 'energyperPacket', 'lifetime']
+
+MODELS = {'LoRaWANEnergyModel': (evaluateLoRaWAN, LORAWAN_METRICS),
+          'NBIoTEnergyModel': (evaluateNBIoT, NBIOT_METRICS)}
+
+# config module and chip profiles of each model
+CONTEXTS = {'LoRaWANEnergyModel': (lorawanConfig, lorawanProfile),
+            'NBIoTEnergyModel': (nbiotConfig, nbiotProfile)}
+
+
+def configValues(module):
+    """Returns the sorted (name, value) pairs of the settings of a config module"""
+    return sorted((name, value) for name, value in vars(module).items()
+                  if not name.startswith('__') and not isinstance(value, types.ModuleType) and not callable(value))
+
+def contextValues(model, profile='default'):
+    """Returns the config and chip profile values a model's results depend on
+    besides its arguments"""
+    module, profiles = CONTEXTS[model]
+    return configValues(module), profiles.get(profile).values()
+
+
+def _jsonValue(value):
+    # a chip profile passed as an object is written by its field values
+    if isinstance(value, profilebase.ChipProfile):
+        return dict(value.toDict(), chipProfile=type(value).__module__)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("%r is not JSON serializable" % (value,))
+
+
+def _normalizeSpec(spec):
+    assert spec['model'] in MODELS, "model must be one of %s" % ', '.join(sorted(MODELS))
+    axes = spec['axes']
+    if isinstance(axes, dict):
+        axes = sorted(axes.items())
+    axes = [(name, list(values)) for name, values in axes]
+    product = spec.get('product', 'cartesian')
+    assert product in ('cartesian', 'zip'), "product must be cartesian or zip"
+    if product == 'zip':
+        assert len(set(len(values) for _, values in axes)) == 1, "zipped axes need equal lengths"
+    metrics = list(spec.get('metrics', MODELS[spec['model']][1]))
+    for metric in metrics:
+        assert metric in MODELS[spec['model']][1], "unknown metric %s" % metric
+    return {'model': spec['model'], 'axes': axes, 'product': product,
+            'fixed': dict(spec.get('fixed', {})), 'metrics': metrics}
+
+
+class Sweep:
+
+    def __init__(self, spec, outdir, chunkSize=100000, processes=None, cache=None):
+        """Sweep Initialization
+        Args:
+            spec: sweep spec, see the module comment
+            outdir: directory of the manifest and the chunk files
+            chunkSize: number of grid points per chunk
+            processes: size of the process pool, all cores by default, 1 runs in process
+            cache: resultcache.ResultCache the chunks are looked up in and stored to
+        """
+        self.spec = _normalizeSpec(spec)
+        self.outdir = outdir
+        self.chunkSize = chunkSize
+        self.processes = processes
+        self.cache = cache
+        context = contextValues(self.spec['model'], self.spec['fixed'].get('profile', 'default'))
+        self.key = hashlib.sha1(json.dumps([self.spec, chunkSize], sort_keys=True, default=_jsonValue) + repr(context)).hexdigest()
+
+        lengths = [len(values) for _, values in self.spec['axes']]
+        if self.spec['product'] == 'cartesian':
+            self.shape = tuple(lengths)
+            self.size = int(np.prod(lengths))
+        else:
+            self.shape = (lengths[0],)
+            self.size = lengths[0]
+        self.numofChunks = (self.size+chunkSize-1)//chunkSize
+
+
+    def chunkParams(self, chunk):
+        """Returns the flat indices and the model parameter arrays of a chunk"""
+        index = np.arange(chunk*self.chunkSize, min((chunk+1)*self.chunkSize, self.size))
+        if self.spec['product'] == 'cartesian':
+            positions = np.unravel_index(index, self.shape)
+        else:
+            positions = [index]*len(self.spec['axes'])
+        params = dict(self.spec['fixed'])
+        for (name, values), position in zip(self.spec['axes'], positions):
+            params[name] = np.asarray(values)[position]
+        return index, params
+
+    def chunkPath(self, chunk):
+        return os.path.join(self.outdir, 'chunk-%06d.npz' % chunk)
+
+    def pendingChunks(self):
+        return [chunk for chunk in range(self.numofChunks) if not os.path.exists(self.chunkPath(chunk))]
+
+
+    def _writeManifest(self):
+        path = os.path.join(self.outdir, 'manifest.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            assert manifest['key'] == self.key, "%s holds a different sweep or one of other settings" % self.outdir
+            return
+        with open(path+'.tmp', 'w') as f:
+            json.dump({'key': self.key, 'spec': self.spec, 'chunkSize': self.chunkSize,
+                       'shape': self.shape, 'size': self.size, 'numofChunks': self.numofChunks},
+                      f, indent=2, default=_jsonValue)
+        os.rename(path+'.tmp', path)
+
+    def run(self):
+        """Evaluates every chunk not on disk yet
+        Returns:
+            number of chunks evaluated by this call
+        """
+        if not os.path.isdir(self.outdir):
+            os.makedirs(self.outdir)
+        self._writeManifest()
+        pending = self.pendingChunks()
+        if self.processes == 1 or len(pending) <= 1:
+            for chunk in pending:
+                _runChunk((self, chunk))
+        else:
+            pool = multiprocessing.Pool(self.processes)
+            try:
+                for _ in pool.imap_unordered(_runChunk, [(self, chunk) for chunk in pending]):
+                    pass
+            finally:
+                pool.close()
+                pool.join()
+        return len(pending)
+
+
+def _runChunk(task):
+    sweep, chunk = task
+    index, params = sweep.chunkParams(chunk)
+    if sweep.cache is not None:
+        columns = sweep.cache.evaluate(sweep.spec['model'], params, sweep.spec['metrics'])
+    else:
+        columns = MODELS[sweep.spec['model']][0](params, sweep.spec['metrics'])
+    for name, _ in sweep.spec['axes']:
+        columns[name] = params[name]
+    columns['index'] = index
+    # write under a temporary name first so that a killed worker never leaves a partial chunk
+    path = sweep.chunkPath(chunk)
+    with open(path+'.tmp', 'wb') as f:
+        np.savez(f, **columns)
+    os.rename(path+'.tmp', path)
+
+
+def iterSweep(outdir):
+    """Yields the columns of every chunk on disk as a dict of arrays"""
+    for path in sorted(glob.glob(os.path.join(outdir, 'chunk-*.npz'))):
+        with np.load(path) as chunk:
+            yield dict((name, chunk[name]) for name in chunk.files)
+
+def loadSweep(outdir):
+    """Returns the concatenated columns of every chunk on disk"""
+    chunks = list(iterSweep(outdir))
+    if not chunks:
+        return {}
+    return dict((name, np.concatenate([chunk[name] for chunk in chunks])) for name in chunks[0])
@@ -0,0 +1,6 @@
+# the tests import the model packages and root modules as the scripts at
+# the repository root do
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
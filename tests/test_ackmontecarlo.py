@@ -0,0 +1,64 @@
+# AckMonteCarlo against the random ACK timeout draws of LoRaWANEnergyModel
+
+# import libraries
+import math
+import random
+
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.ackmontecarlo import AckMonteCarlo
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+
+
+def _model():
+    return LoRaWANEnergyModel(dr=5, ackmode=1, pl=100, p_c=.3, t_notif=600000)
+
+
+def test_seedReproducesResults():
+    first = AckMonteCarlo(_model(), seed=7).run(10000)
+    assert AckMonteCarlo(_model(), seed=7).run(10000) == first
+    assert AckMonteCarlo(_model(), seed=8).run(10000)['aveCurrent']['mean'] != first['aveCurrent']['mean']
+    # the chunks consume the same stream of draws, their moments are combined exactly
+    chunked = AckMonteCarlo(_model(), seed=7).run(10000, chunkSize=999)
+    for name in ('aveCurrent', 'activeTime'):
+        assert chunked[name]['mean'] == pytest.approx(first[name]['mean'], rel=1e-12)
+        assert chunked[name]['variance'] == pytest.approx(first[name]['variance'], rel=1e-9)
+
+
+def test_confidenceInterval():
+    results = AckMonteCarlo(_model(), seed=1).run(20000, confidence=.95)
+    for name in ('aveCurrent', 'activeTime'):
+        lo, hi = results[name]['ci']
+        assert (lo+hi)/2 == pytest.approx(results[name]['mean'], rel=1e-12)
+        assert (hi-lo)/2 == pytest.approx(1.959964*math.sqrt(results[name]['variance']/20000), rel=1e-6)
+
+
+def test_meanMatchesScalarDraws():
+    # every evaluation of the scalar model is one replication of the draws
+    random.seed(3)
+    model = _model()
+    samples = []
+    for _ in range(2000):
+        model.P_c = .3
+        samples.append(model.calcAveCurrentandTime())
+    samples = np.array(samples)
+    results = AckMonteCarlo(_model(), seed=3).run(200000)
+    for i, name in enumerate(('aveCurrent', 'activeTime')):
+        bound = 4*math.sqrt(results[name]['variance']*(1/2000.0 + 1/200000.0))
+        assert abs(samples[:, i].mean() - results[name]['mean']) < bound
+
+
+def test_needsAcknowledgement():
+    with pytest.raises(AssertionError):
+        AckMonteCarlo(LoRaWANEnergyModel(ackmode=0))
+
+
+def test_ackTimeoutWindowFromProfile():
+    lora = _model()
+    lora.profile = lora.profile.replace(T_ackTOMin=2500, T_ackTOMax=2500)
+    results = AckMonteCarlo(lora, seed=1).run(1000)
+    # a window of one value leaves nothing random
+    assert results['aveCurrent']['variance'] == pytest.approx(0, abs=1e-30)
+    lora.expectedAckTO = True
+    assert results['aveCurrent']['mean'] == pytest.approx(lora.calcAveCurrentandTime()[0], rel=1e-12)
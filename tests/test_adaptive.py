@@ -0,0 +1,51 @@
+# adaptive sampling and the LoRaWAN vs NB-IoT crossovers against the scalar models
+
+# import libraries
+import numpy as np
+import pytest
+
+import adaptive
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+def _difference(x, axis, lorawan, nbiot):
+    lora = LoRaWANEnergyModel(expectedAckTO=True, **dict(lorawan, **{axis: x}))
+    return lora.calcLifetime() - NBIoTEnergyModel(**dict(nbiot, **{axis: x})).calcLifetime()
+
+
+def test_integralAxisTakesWholeBytes():
+    # a fractional payload from the sampling is a whole number of bytes for the models
+    curves = adaptive.ModelCurves([('nbiot', {'t_notif': 60000., 'p_c': .3})], 'pl')
+    expected = NBIoTEnergyModel(pl=35, t_notif=60000, p_c=.3).calcLifetime()
+    np.testing.assert_allclose(curves([35.0, 35.4, 34.6]), expected, rtol=1e-12)
+    assert curves.evaluations == 3
+    assert set(['dr', 'cr', 'pl', 'N_dev', 'ackmode']) == adaptive.INTEGRAL
+
+
+def test_refineIntegralSamplesIntegers():
+    curves = adaptive.ModelCurves([('lorawan', {'dr': 5}), ('nbiot', {})], 'pl')
+    x, y = adaptive.refine(curves, 1, 242, 'linear', integral=True)
+    assert x[0] == 1 and x[-1] == 242
+    assert np.all(x == np.round(x)) and np.all(np.diff(x) > 0)
+    assert y.shape == (len(x), 2)
+
+
+def test_payloadCrossoverIsFirstIntegerPast():
+    lorawan, nbiot = {'dr': 6, 't_notif': 6000000}, {'t_notif': 6000000, 'p_c': .3}
+    crossovers = adaptive.findCrossovers('pl', 1, 115, lorawan=lorawan, nbiot=nbiot)
+    assert crossovers['x'].tolist() == [63] and crossovers['x'].dtype.kind == 'i'
+    assert not crossovers['lorawanAbove'][0]
+    assert _difference(62, 'pl', lorawan, nbiot) > 0 > _difference(63, 'pl', lorawan, nbiot)
+    lora = LoRaWANEnergyModel(pl=63, expectedAckTO=True, **lorawan)
+    assert crossovers['lorawan'][0] == pytest.approx(lora.calcLifetime(), rel=1e-12)
+
+
+def test_notificationCrossoversHaveEqualLifetimes():
+    lorawan, nbiot = {'dr': 5, 'pl': 20}, {'pl': 20}
+    crossovers = adaptive.findCrossovers('t_notif', 1e4, 1e8, lorawan=lorawan, nbiot=nbiot)
+    assert crossovers['converged'].all()
+    assert crossovers['lorawanAbove'].tolist() == [False, True]
+    for x, lifetime in zip(crossovers['x'], crossovers['lorawan']):
+        assert NBIoTEnergyModel(t_notif=x, **nbiot).calcLifetime() == pytest.approx(lifetime, rel=1e-9)
+        assert _difference(x, 't_notif', lorawan, nbiot) == pytest.approx(0, abs=1e-9*lifetime)
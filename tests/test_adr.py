@@ -0,0 +1,70 @@
+# ADREvaluator against the batch model, and the collision probability it reports
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.adr import ADREvaluator, ArrayTrace, FixedDR, SemtechADR, SyntheticTrace
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+
+
+def test_fixedDRMatchesBatchModel():
+    # every uplink is heard, the policy and the baseline of its data rate are the model
+    trace = ArrayTrace(np.full((4, 50), 10.0))
+    adr = ADREvaluator(trace, FixedDR(), dr=5, pl=[10, 20, 30, 40], t_notif=600000, p_c=.05)
+    results = adr.run()
+    lora = LoRaWANBatchModel(dr=5, pl=np.array([10, 20, 30, 40]), t_notif=600000, p_c=.05)
+    np.testing.assert_allclose(results['lifetime'], lora.calcLifetime(), rtol=1e-12)
+    np.testing.assert_allclose(results['baselines']['lifetime'][5], lora.calcLifetime(), rtol=1e-12)
+    assert results['drShare'].tolist() == [0, 0, 0, 0, 0, 1]
+    assert not results['collisionLimited'].any()
+
+
+def test_overloadReportsClampedCollisionProbability():
+    # the fixed point of the whole fleet at DR0 lies above what the models use
+    rng = np.random.RandomState(1)
+    trace = SyntheticTrace(rng.uniform(-15, 5, 5000), 40, seed=1)
+    adr = ADREvaluator(trace, FixedDR(), dr=0, pl=20, t_notif=60000)
+    limit = adr.profile.maxCollisionProbability()
+    heard, unheard, fixedUnheard, _ = adr.replay()
+    fixedP_c = adr.calcCollisionProbability(trace.numofUplinks - fixedUnheard)
+    assert fixedP_c[0] > limit
+
+    results = adr.run()
+    baselines = results['baselines']
+    np.testing.assert_allclose(baselines['collisionProbability'], np.minimum(fixedP_c, limit), rtol=1e-12)
+    assert baselines['collisionLimited'].tolist() == (fixedP_c > limit).tolist()
+    assert results['collisionProbability'].max() <= limit
+    assert results['collisionLimited'][0]
+    # the heard uplinks at DR0 cost what the model costs at the clamped P_c
+    lora = LoRaWANBatchModel(dr=0, pl=20, t_notif=60000, p_c=limit)
+    always = fixedUnheard[0] == 0
+    assert always.any()
+    np.testing.assert_allclose(baselines['lifetime'][0][always], lora.calcLifetime(), rtol=1e-12)
+
+    rows = adr.summary(results)
+    assert rows[0]['collisionLimited']
+    assert rows[1]['scenario'] == 'DR0'
+    assert rows[1]['collisionProbability'] == limit
+    assert rows[1]['collisionLimited']
+
+
+def test_givenCollisionProbabilityIsClamped():
+    trace = ArrayTrace(np.full((2, 10), 10.0))
+    adr = ADREvaluator(trace, FixedDR(), dr=5, p_c=.9)
+    limit = adr.profile.maxCollisionProbability()
+    results = adr.run()
+    assert results['collisionProbability'].tolist() == [limit]*6
+    assert results['collisionLimited'].all()
+    lora = LoRaWANBatchModel(dr=5, pl=20, t_notif=3600000, p_c=.9)
+    np.testing.assert_allclose(results['lifetime'], lora.calcLifetime(), rtol=1e-12)
+
+
+def test_semtechADRRaisesTheDataRate():
+    # a strong link climbs to the highest data rate and outlives the fixed DR0
+    trace = ArrayTrace(np.full((3, 200), 5.0))
+    adr = ADREvaluator(trace, SemtechADR(), dr=0, p_c=.01)
+    results = adr.run()
+    assert (results['drChanges'] > 0).all()
+    assert results['drShare'][5] > .5
+    assert (results['lifetime'] > results['baselines']['lifetime'][0]).all()
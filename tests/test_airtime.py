@@ -0,0 +1,52 @@
+# airtime table against the closed form of LoRaWANEnergyModel
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel import airtime
+from LoRaWANEnergyModel import chipprofile
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel, MAX_PL
+
+
+@pytest.fixture
+def tableDir(tmpdir, monkeypatch):
+    # build the tables in a fresh directory, not the user's cache
+    monkeypatch.setattr(airtime, 'AIRTIME_DIR', str(tmpdir))
+    monkeypatch.setattr(airtime, '_tables', {})
+    return str(tmpdir)
+
+
+def _closedForm(model):
+    return [getattr(model, field) for field in airtime.FIELDS]
+
+
+@pytest.mark.parametrize('profile', [chipprofile.get('default'),
+                                     chipprofile.get('default').replace(CRC=0, numofPreambleSymbols=12.0)])
+def test_tableMatchesClosedForm(tableDir, profile):
+    table = airtime.getTable(profile.CRC, profile.numofPreambleSymbols)
+    for dr in range(7):
+        for cr in range(1, 5):
+            for pl in range(MAX_PL[dr]+1):
+                model = LoRaWANEnergyModel(dr=dr, cr=cr, pl=pl, profile=profile)
+                assert table[dr, cr-1, pl].tolist() == pytest.approx(_closedForm(model), rel=1e-15)
+
+
+def test_tableIsSavedAndReopened(tableDir):
+    built = np.array(airtime.getTable())
+    airtime._tables.clear()
+    reopened = airtime.getTable()
+    assert isinstance(reopened, np.memmap)
+    assert np.array_equal(reopened, built)
+
+
+def test_lookupOffTable(tableDir):
+    # fractional and oversized payloads fall back to the closed form
+    model = LoRaWANEnergyModel(dr=5, cr=2, pl=20)
+    row = airtime.lookup(5, 2, 20.0)
+    assert [row[field] for field in airtime.FIELDS] == pytest.approx(_closedForm(model), rel=1e-15)
+    arrays = airtime.lookupArrays([5, 5], 2, [20, 20.5])
+    fractional = airtime.calcAirtime(5, 2, 20.5)
+    for i, field in enumerate(airtime.FIELDS):
+        assert arrays[field][0] == pytest.approx(row[field], rel=1e-15)
+        assert arrays[field][1] == fractional[i]
@@ -0,0 +1,20 @@
+# benchmark setups and the baseline comparison
+
+# import libraries
+import benchmark
+
+
+def test_setupsBuildFreshFixtures():
+    for name, setup in benchmark.BENCHMARKS:
+        first, second = setup(), setup()
+        assert first is not second, name
+        assert first() > 0 and second() > 0, name
+    # no benchmark keeps a fixture as a default argument
+    for name, setup in benchmark.BENCHMARKS:
+        assert not setup.__defaults__, name
+
+
+def test_compareFlagsRegressions():
+    baseline = {'results': {'a': {'evalsPerSec': 100.0}, 'b': {'evalsPerSec': 100.0}}}
+    current = {'results': {'a': {'evalsPerSec': 95.0}, 'b': {'evalsPerSec': 80.0}, 'c': {'evalsPerSec': 1.0}}}
+    assert benchmark.compareResults(current, baseline, .1) == ['b']
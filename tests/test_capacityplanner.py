@@ -0,0 +1,80 @@
+# capacityplanner.calcCollisionProbability against fixed point iteration, and
+# the planner against a fresh plan and the batch model
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.capacityplanner import CapacityPlanner, calcCollisionProbability
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+
+
+def _iterate(load, frameOk, ackShare, m):
+    # from P_c = 0 the iteration increases to the lowest fixed point
+    P_c, previous = 0.0, None
+    while P_c != previous:
+        q = 1 - (1-P_c)*frameOk
+        attempts = sum(q**k for k in range(m+1))
+        P_c, previous = -np.expm1(-2*load*(1 - ackShare + ackShare*attempts)), P_c
+    return P_c
+
+
+@pytest.mark.parametrize('load, frameOk, ackShare, m', [(.01, .99, 1, 7), (.05, .9, .5, 7), (.1, 1, 1, 3),
+                                                       (.19, .99, 1, 7), (.3, .95, .2, 1), (1e-6, .5, 1, 15)])
+def test_collisionProbabilityMatchesIteration(load, frameOk, ackShare, m):
+    expected = _iterate(load, frameOk, ackShare, m)
+    assert calcCollisionProbability(load, frameOk, ackShare, m) == pytest.approx(expected, rel=1e-9)
+
+
+def test_collisionProbabilityBroadcasts():
+    load = np.array([[.01], [.05]])
+    ackShare = np.array([0, .5, 1])
+    P_c = calcCollisionProbability(load, .99, ackShare, 7)
+    assert P_c.shape == (2, 3)
+    assert P_c[1, 2] == pytest.approx(_iterate(.05, .99, 1, 7), rel=1e-9)
+
+
+def _plan(numofDevices, t_notif, seed=1):
+    rng = np.random.RandomState(seed)
+    return CapacityPlanner(rng.uniform(0, 10000, (numofDevices, 2)), [[2500, 2500], [7500, 7500]],
+                           pl=rng.randint(10, 51, numofDevices), t_notif=t_notif)
+
+
+def test_devicesMatchBatchModel():
+    planner = _plan(2000, 600000)
+    load, P_c, devices = planner.calcLoad()
+    served = planner.served
+    assert np.array_equal(planner.P_c[served], P_c.ravel()[planner.gateway[served]*6 + planner.DR[served]])
+    lora = LoRaWANBatchModel(dr=planner.DR[served], pl=planner.PL[served], t_notif=600000, p_c=planner.P_c[served])
+    np.testing.assert_allclose(planner.lifetime[served], lora.calcLifetime(), rtol=1e-12)
+    summary = planner.summary()
+    assert summary['collisionLimited'] == 0
+    assert summary['maxCollisionProbability'] == P_c.max()
+    assert summary['served'] == served.sum() == devices.sum()
+
+
+def test_overloadReportsClampedCollisionProbability():
+    # the fixed point of the busiest data rates lies above what the models use
+    planner = _plan(20000, 10000)
+    limit = planner.profile.maxCollisionProbability()
+    _, P_c, devices = planner.calcLoad()
+    assert (P_c > limit).any()
+    summary = planner.summary()
+    assert summary['maxCollisionProbability'] == limit
+    assert summary['collisionLimited'] == ((P_c > limit) & (devices > 0)).sum()
+    served = planner.served
+    assert planner.P_c[served].max() == limit
+    lora = LoRaWANBatchModel(dr=planner.DR[served], pl=planner.PL[served], t_notif=10000, p_c=planner.P_c[served])
+    np.testing.assert_allclose(planner.lifetime[served], lora.calcLifetime(), rtol=1e-12)
+
+
+def test_gatewayChangesMatchFreshPlan():
+    planner = _plan(3000, 60000)
+    g = planner.addGateway((5000, 5000))
+    rng = np.random.RandomState(1)
+    fresh = CapacityPlanner(rng.uniform(0, 10000, (3000, 2)), [[2500, 2500], [7500, 7500], [5000, 5000]],
+                            pl=rng.randint(10, 51, 3000), t_notif=60000)
+    assert np.array_equal(planner.gateway, fresh.gateway)
+    np.testing.assert_allclose(planner.lifetime, fresh.lifetime, rtol=1e-12)
+    planner.removeGateway(g)
+    np.testing.assert_allclose(planner.lifetime, _plan(3000, 60000).lifetime, rtol=1e-12)
@@ -0,0 +1,55 @@
+# command line output against direct calls of the models
+
+# import libraries
+import csv
+import json
+
+import pytest
+
+import cli
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+def _rows(capsys, argv):
+    assert cli.main(argv) == 0
+    return list(csv.DictReader(capsys.readouterr()[0].splitlines()))
+
+
+def test_nbiotPointMatchesLibrary(capsys):
+    rows = _rows(capsys, ['lifetime', 'nbiot', '--pl', '20', '--t-notif', '60000'])
+    assert rows[0]['pl'] == '20'
+    assert float(rows[0]['lifetime']) == NBIoTEnergyModel(pl=20, t_notif=60000).calcLifetime()
+
+
+def test_lorawanPointsMatchLibrary(capsys):
+    rows = _rows(capsys, ['energy-per-bit', 'lorawan', '--dr', '0', '5', '--pl', '20', '51',
+                          '--t-notif', '600000', '--expected-ack-to'])
+    assert len(rows) == 4
+    for row in rows:
+        lora = LoRaWANEnergyModel(dr=int(row['dr']), pl=int(row['pl']), t_notif=600000, expectedAckTO=True)
+        assert float(row['energyperBit']) == lora.calcEnergyperBit()
+
+
+@pytest.mark.parametrize('model', ['nbiot', 'lorawan'])
+def test_sweepMatchesLibrary(capsys, model):
+    argv = ['sweep', model, '--pl', '10:50:3', '--t-notif', '1e4:1e8:4:log', '--metrics', 'lifetime',
+            '--format', 'jsonl']
+    if model == 'lorawan':
+        argv += ['--dr', '5', '--ackmode', '0']
+    assert cli.main(argv) == 0
+    rows = [json.loads(line) for line in capsys.readouterr()[0].splitlines()]
+    assert sorted(set(row['pl'] for row in rows)) == [10, 30, 50]
+    for row in rows:
+        if model == 'nbiot':
+            expected = NBIoTEnergyModel(pl=row['pl'], t_notif=row['t_notif']).calcLifetime()
+        else:
+            expected = LoRaWANEnergyModel(dr=5, ackmode=0, pl=row['pl'], t_notif=row['t_notif']).calcLifetime()
+        assert row['lifetime'] == pytest.approx(expected, rel=1e-12)
+
+
+def test_integralParameters():
+    assert cli.parseValues(['20', '1:4:3'], int) == [20, 1, 3, 4]
+    with pytest.raises(AssertionError):
+        cli.parseValues(['20.5'], int)
+    assert cli.parseValues(['20.5', '1:2:3'], float) == [20.5, 1.0, 1.5, 2.0]
@@ -0,0 +1,61 @@
+# DepletionSimulator against the steady state lifetime of the batch models
+
+# import libraries
+import numpy as np
+import pytest
+
+from depletion import DepletionSimulator, YEAR
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+
+
+DAY = 24*3600000.0
+
+
+@pytest.mark.parametrize('technology, arguments', [
+    ('lorawan', dict(dr=5, pl=20, t_notif=600000, p_c=.1)),
+    ('lorawan', dict(dr=0, pl=51, t_notif=3600000, ackmode=0)),
+    ('nbiot', dict(pl=100, t_notif=1e6, p_c=.2))])
+def test_meanChargeMatchesCalcLifetime(technology, arguments):
+    model = {'lorawan': LoRaWANBatchModel, 'nbiot': NBIoTBatchModel}[technology](**arguments)
+    factors = np.array([1, .5, .25])
+    sim = DepletionSimulator(technology, 3, [(YEAR, arguments)], capacityFactor=factors, stochastic=False)
+    timetoEmpty = sim.run(phase=0)['timetoEmpty']
+    # the battery empties at a notification, at most one period before the steady state estimate
+    expected = model.calcLifetime()*factors
+    assert np.all(timetoEmpty <= expected + 1e-9)
+    assert np.all(timetoEmpty >= expected - arguments['t_notif']/YEAR)
+
+
+def test_scheduleAveragesThePower():
+    hourly = dict(dr=5, pl=20, t_notif=600000)
+    busy = dict(dr=5, pl=20, t_notif=60000)
+    lifetimes = [LoRaWANBatchModel(**arguments).calcLifetime() for arguments in (hourly, busy)]
+    sim = DepletionSimulator('lorawan', 1, [(DAY, hourly), (DAY, busy)], stochastic=False)
+    expected = 1/(.5/lifetimes[0] + .5/lifetimes[1])
+    assert sim.run(phase=0)['timetoEmpty'][0] == pytest.approx(expected, abs=2*DAY/YEAR)
+
+
+def test_selfDischarge():
+    arguments = dict(dr=5, pl=20, t_notif=600000)
+    lifetime = LoRaWANBatchModel(**arguments).calcLifetime()
+    sim = DepletionSimulator('lorawan', 1, [(DAY, arguments)], selfDischarge=.05, stochastic=False)
+    assert sim.run(phase=0)['timetoEmpty'][0] == pytest.approx(1/(1/lifetime + .05), abs=arguments['t_notif']/YEAR)
+
+
+def test_horizon():
+    sim = DepletionSimulator('lorawan', 2, [(DAY, dict(dr=5, pl=20, t_notif=600000))], stochastic=False)
+    with np.errstate(invalid='ignore'):
+        result = sim.run(horizon=YEAR, phase=0)
+    assert np.all(np.isinf(result['timetoEmpty']))
+    assert result['depleted'] == 0
+
+
+def test_stochasticWithoutRetransmissions():
+    # without acknowledgement a notification is never repeated, nothing is left to draw
+    arguments = dict(dr=5, pl=20, t_notif=600000, p_c=.3, ackmode=0)
+    lifetime = LoRaWANBatchModel(**arguments).calcLifetime()
+    result = DepletionSimulator('lorawan', 100, [(YEAR, arguments)], seed=1).run()
+    # the random phases shift the notifications by up to one period
+    assert np.all(np.abs(result['timetoEmpty'] - lifetime) <= arguments['t_notif']/YEAR)
+    assert result['P10'] < result['P90']
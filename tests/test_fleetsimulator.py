@@ -0,0 +1,61 @@
+# FleetSimulator against the pure ALOHA collision probability
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.capacityplanner import calcCollisionProbability
+from LoRaWANEnergyModel.fleetsimulator import CollisionCurve, FleetSimulator, detectCollisions
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+
+
+T_NOTIF = 60000
+
+
+def _simulated(numofDevices, ackmode, periods, seeds):
+    # the phases of a fleet are fixed for a run, average a few fleets
+    runs = []
+    for seed in seeds:
+        sim = FleetSimulator(numofDevices, dr=5, pl=20, t_notif=T_NOTIF, ackmode=ackmode, seed=seed)
+        runs.append(sim.run(periods*T_NOTIF))
+    return sim, runs
+
+
+def _analytic(sim, numofDevices, ackmode):
+    load = numofDevices*sim.T_trans[0]/(sim.numofChannels*float(T_NOTIF))
+    frameOk = sim.P_dataOk[0]*sim.P_ackOk[0]
+    return calcCollisionProbability(load, frameOk, ackmode, sim.profile.numofRetransMax)
+
+
+def test_detectCollisions():
+    start = np.array([0., 5., 20., 0., 30.])
+    end = np.array([10., 8., 25., 10., 40.])
+    key = np.array([0, 0, 0, 1, 1])
+    assert detectCollisions(start, end, key).tolist() == [True, True, False, False, False]
+
+
+def test_unacknowledgedMatchesAloha():
+    sim, runs = _simulated(1000, 0, 50, range(1, 5))
+    P_c = np.mean([run['collisionProbability'] for run in runs])
+    assert P_c == pytest.approx(_analytic(sim, 1000, 0), rel=.03)
+    for run in runs:
+        assert run['retransmissions'] == 0
+        assert run['frames'] == run['notifications']
+
+
+def test_acknowledgedMatchesAlohaFixedPoint():
+    sim, runs = _simulated(300, 1, 50, range(1, 5))
+    P_c = np.mean([run['collisionProbability'] for run in runs])
+    # the fixed point assumes independent retransmission times, so the bound is looser
+    assert P_c == pytest.approx(_analytic(sim, 300, 1), rel=.1)
+    assert P_c > _analytic(sim, 300, 0)
+    for run in runs:
+        assert run['retransmissions'] > 0
+        assert 0 < run['deliveryRatio'] <= 1
+
+
+def test_collisionCurveAsPcModel():
+    curve = CollisionCurve([1000, 100], [.3, .05])
+    assert curve(550) == pytest.approx(.175)
+    lora = LoRaWANEnergyModel(dr=5, pl=20, t_notif=T_NOTIF, N_dev=550, pcModel=curve)
+    assert lora.P_c == pytest.approx(.175)
@@ -0,0 +1,40 @@
+# frontier.skyline against a pairwise scan, and the rows of a frontier
+
+# import libraries
+import numpy as np
+import pytest
+
+import frontier
+
+
+def _bruteForce(values):
+    """Indices of the rows no other distinct row is at least as good as in every column"""
+    return np.array([i for i, row in enumerate(values)
+                     if not any(np.all(other >= row) and np.any(other != row) for other in values)], dtype=int)
+
+
+@pytest.mark.parametrize('n', [0, 1, 50, 1500])
+@pytest.mark.parametrize('d', [1, 2, 3, 4])
+def test_skylineMatchesBruteForce(n, d):
+    rng = np.random.RandomState(n*10+d)
+    # few distinct values, so that many rows tie in some or all columns
+    values = rng.randint(0, 12, size=(n, d)).astype(float)
+    assert np.array_equal(frontier.skyline(values), _bruteForce(values))
+
+
+def test_skylineSenses():
+    rng = np.random.RandomState(1)
+    values = rng.rand(700, 3)
+    senses = [1, -1, -1]
+    assert np.array_equal(frontier.skyline(values, senses), _bruteForce(values*senses))
+
+
+def test_rowsCastParameters():
+    space = [('lorawan', [('dr', [0, 5]), ('pl', [20]), ('ackmode', [0])]), ('nbiot', [('pl', [20, 100])])]
+    columns = frontier.ParetoFrontier(space, ['lifetime', 'energyperBit']).run()
+    rows = list(frontier.iterRows(columns))
+    assert len(rows) == len(columns['technology']) > 0
+    for row in rows:
+        # the payload is a number of bytes, and a row has only its technology's parameters
+        assert isinstance(row['pl'], int)
+        assert set(row) - set(frontier.OBJECTIVES) == set(['technology'] + frontier.PARAMETERS[row['technology']])
@@ -0,0 +1,83 @@
+# inventory rows against the scalar models, and the rows that cannot be evaluated
+
+# import libraries
+import json
+from StringIO import StringIO
+
+import pytest
+
+import inventory
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+INVENTORY = """id,technology,dr,pl,t_notif,p_c,p_e
+a,lorawan,5,20,600000,,
+b,nbiot,,20,60000,0.3,
+c,LoRaWAN,0,51,3600000,0.1,
+d,zigbee,,20,60000,,
+e,lorawan,0,52,60000,,
+f,nbiot,,20.5,60000,,
+g,nbiot,,inf,60000,,
+h,lorawan,5,20,60000,1.5,
+i,nbiot,,20,60000,,1
+j,lorawan,7,20,60000,,
+k,nbiot,,abc,60000,,
+l,nbiot,,200,,,
+"""
+
+ERRORS = {'d': "unknown technology 'zigbee'",
+          'e': 'max PL bytes 51 at DR 0',
+          'f': "pl must be an integer, got '20.5'",
+          'g': "pl must be an integer, got 'inf'",
+          'h': 'p_c must be a probability',
+          'i': 'p_e must be below 1 for NB-IoT',
+          'j': 'Only DR values from 0 to 6 are supported',
+          'k': "pl is not a number: 'abc'"}
+
+
+def _evaluate(text, format='csv', chunkSize=100000):
+    output, errors = StringIO(), StringIO()
+    counts = inventory.evaluateInventory(StringIO(text), output, format, 'jsonl', errors, chunkSize)
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    failed = [json.loads(line) for line in errors.getvalue().splitlines()]
+    return counts, rows, failed
+
+
+@pytest.mark.parametrize('chunkSize', [1, 5, 100000])
+def test_rowsMatchScalarModels(chunkSize):
+    counts, rows, failed = _evaluate(INVENTORY, chunkSize=chunkSize)
+    assert counts == {'rows': 12, 'evaluated': 4, 'errors': 8}
+    assert [row['id'] for row in rows] == ['a', 'b', 'c', 'l']
+    assert [row['row'] for row in rows] == [1, 2, 3, 12]
+    models = [LoRaWANEnergyModel(dr=5, pl=20, t_notif=600000, expectedAckTO=True),
+              NBIoTEnergyModel(pl=20, t_notif=60000, p_c=.3),
+              LoRaWANEnergyModel(dr=0, pl=51, t_notif=3600000, p_c=.1, expectedAckTO=True),
+              NBIoTEnergyModel(pl=200)]
+    for row, model in zip(rows, models):
+        assert row['lifetime'] == pytest.approx(model.calcLifetime(), rel=1e-10)
+        assert row['energyperBit'] == pytest.approx(model.calcEnergyperBit(), rel=1e-10)
+
+
+def test_errorRows():
+    _, _, failed = _evaluate(INVENTORY)
+    assert dict((error['id'], error['error']) for error in failed) == ERRORS
+    assert [error['row'] for error in failed] == range(4, 12)
+
+
+def test_jsonLines():
+    text = '\n'.join(['{"id": "a", "technology": "nbiot", "pl": 20, "t_notif": 60000}',
+                      'not json', '[1, 2]', '',
+                      '{"id": "b", "technology": "lorawan", "dr": 5, "pl": 20.0, "ackmode": 2}'])
+    counts, rows, failed = _evaluate(text, 'jsonl')
+    assert counts == {'rows': 4, 'evaluated': 1, 'errors': 3}
+    assert rows[0]['lifetime'] == pytest.approx(NBIoTEnergyModel(pl=20, t_notif=60000).calcLifetime(), rel=1e-10)
+    assert [(error['row'], error['error']) for error in failed] == \
+        [(2, 'not a JSON object'), (3, 'not a JSON object'), (5, 'ackmode must be 0 or 1')]
+
+
+def test_integralPayload():
+    technology, arguments = inventory.parseRecord({'technology': 'nbiot', 'pl': '20.0', 't_notif': '6e4'})
+    assert technology == 'nbiot'
+    assert arguments == {'pl': 20, 't_notif': 60000.0}
+    assert isinstance(arguments['pl'], int)
@@ -0,0 +1,42 @@
+# LoRaWANBatchModel against LoRaWANEnergyModel in expected ACK timeout mode
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel, MAX_PL
+
+
+GRID = [dict(dr=dr, cr=cr, pl=pl, t_notif=t_notif, p_c=p_c, ackmode=ackmode)
+        for dr in range(7) for cr in (1, 4) for pl in (1, MAX_PL[dr]) for t_notif in (60000, 3600000)
+        for p_c in (0, .05) for ackmode in (0, 1)]
+
+
+def _batch(grid, **kwargs):
+    columns = dict((name, np.array([point[name] for point in grid])) for name in grid[0])
+    columns.update(kwargs)
+    return LoRaWANBatchModel(**columns).evaluate()
+
+
+def test_batchMatchesScalar():
+    results = _batch(GRID)
+    for i, point in enumerate(GRID):
+        model = LoRaWANEnergyModel(expectedAckTO=True, **point)
+        assert results['lifetime'][i] == pytest.approx(model.calcLifetime(), rel=1e-12)
+        assert results['energyperBit'][i] == pytest.approx(model.calcEnergyperBit(), rel=1e-12)
+        assert results['dataDelivered'][i] == pytest.approx(model.dataDelivered, rel=1e-12)
+        assert results['capacity'][i] == pytest.approx(model.calcAlohaCapcity(), rel=1e-12)
+
+
+def test_batchMatchesScalarForDeviceCounts():
+    N_dev = np.array([1, 10, 200, 2000])
+    results = LoRaWANBatchModel(dr=5, pl=20, t_notif=600000, N_dev=N_dev).evaluate()
+    for i, devices in enumerate(N_dev):
+        model = LoRaWANEnergyModel(dr=5, pl=20, t_notif=600000, N_dev=devices, expectedAckTO=True)
+        assert results['lifetime'][i] == pytest.approx(model.calcLifetime(), rel=1e-12)
+
+
+def test_broadcastShape():
+    lora = LoRaWANBatchModel(dr=[0, 5], pl=20, t_notif=np.logspace(4, 8, 5)[:, None])
+    assert lora.calcLifetime().shape == (5, 2)
@@ -0,0 +1,92 @@
+# LoRaWANEnergyModel closed forms against its reference loops, and its cached results
+
+# import libraries
+import pytest
+
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+
+
+CONFIGURATIONS = [dict(dr=5, pl=20, p_c=.01, t_notif=600000),
+                  dict(dr=0, pl=51, p_c=.3),
+                  dict(dr=3, pl=100)]
+
+
+@pytest.mark.parametrize('kwargs', CONFIGURATIONS)
+@pytest.mark.parametrize('P_c, BER', [(None, None), (.2, 1e-4), (0, 1e-5), (.05, None)])
+def test_retransExpectationMatchesReference(kwargs, P_c, BER):
+    model = LoRaWANEnergyModel(expectedAckTO=True, **kwargs)
+    reference = LoRaWANEnergyModel(expectedAckTO=True, reference=True, **kwargs)
+    expected = reference.calcRetransExpectation(P_c, BER)
+    assert model.calcRetransExpectation(P_c, BER) == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize('kwargs', CONFIGURATIONS + [dict(dr=5, pl=20, ackmode=0, p_c=.01)])
+def test_resultsMatchReference(kwargs):
+    model = LoRaWANEnergyModel(expectedAckTO=True, **kwargs)
+    reference = LoRaWANEnergyModel(expectedAckTO=True, reference=True, **kwargs)
+    assert model.calcLifetime() == pytest.approx(reference.calcLifetime(), rel=1e-12)
+    assert model.calcEnergyperBit() == pytest.approx(reference.calcEnergyperBit(), rel=1e-12)
+    assert model.dataDelivered == pytest.approx(reference.dataDelivered, rel=1e-12)
+
+
+def test_parameterAssignmentInvalidatesResults():
+    model = LoRaWANEnergyModel(dr=5, pl=20, p_c=.01, expectedAckTO=True)
+    model.calcLifetime()
+    charges = model.calcRetransCharges()
+
+    # the charges do not depend on P_c, the results do
+    model.P_c = .05
+    assert model._results is None
+    assert model.calcRetransCharges() is charges
+    assert model.calcLifetime() == LoRaWANEnergyModel(dr=5, pl=20, p_c=.05, expectedAckTO=True).calcLifetime()
+
+    model.T_notif = 600000
+    assert model._retransCharges is None
+    assert model.calcLifetime() == \
+        LoRaWANEnergyModel(dr=5, pl=20, p_c=.05, t_notif=600000, expectedAckTO=True).calcLifetime()
+
+    # the airtime follows the payload
+    model._PL = 200
+    fresh = LoRaWANEnergyModel(dr=5, pl=200, p_c=.05, t_notif=600000, expectedAckTO=True)
+    assert model.T_trans == fresh.T_trans
+    assert model.calcEnergyperBit() == fresh.calcEnergyperBit()
+
+
+def test_profileAssignmentInvalidatesResults():
+    model = LoRaWANEnergyModel(dr=5, pl=20, p_c=.01, expectedAckTO=True)
+    default = model.profile
+    lifetime = model.calcLifetime()
+
+    model.I_sleep = default.I_sleep*2
+    assert model.profile is not default
+    assert LoRaWANEnergyModel().profile is default
+    assert model.calcLifetime() < lifetime
+    fresh = LoRaWANEnergyModel(dr=5, pl=20, p_c=.01, expectedAckTO=True, profile=model.profile)
+    assert model.calcLifetime() == fresh.calcLifetime()
+
+    model.profile = default
+    assert model.calcLifetime() == lifetime
+
+
+def test_ackTimeoutFromProfile():
+    model = LoRaWANEnergyModel(dr=5, pl=20, p_c=.3)
+    assert model.profile.T_ackTOMin <= model.drawAckTimeout() <= model.profile.T_ackTOMax
+    lifetime = LoRaWANEnergyModel(dr=5, pl=20, p_c=.3, expectedAckTO=True).calcLifetime()
+
+    # a window of one value makes the draw deterministic, at the value of the profile
+    model.profile = model.profile.replace(T_ackTOMin=2500, T_ackTOMax=2500)
+    assert model.drawAckTimeout() == 2500
+    fixed = LoRaWANEnergyModel(dr=5, pl=20, p_c=.3, expectedAckTO=True, profile=model.profile)
+    assert fixed.drawAckTimeout() == 2500.0
+    assert model.calcLifetime() == fixed.calcLifetime()
+    assert fixed.calcLifetime() != lifetime
+
+
+def test_cachedResultsAreReused():
+    model = LoRaWANEnergyModel(dr=5, pl=20, p_c=.01, t_notif=600000)
+    # the ACK timeouts are drawn once, when the results are computed
+    lifetime = model.calcLifetime()
+    results = model._results
+    assert model.calcEnergyperBit() > 0 and model.dataDelivered > 0
+    assert model._results is results
+    assert model.calcLifetime() == lifetime
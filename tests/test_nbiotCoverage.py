@@ -0,0 +1,45 @@
+# nbiotCoverage solvers against the stepping search of the original script
+
+# import libraries
+import numpy as np
+import pytest
+
+from NBIoTEnergyModel import nbiotCoverage
+
+
+R_AVES = [.1, .3, .5, .9, 1.0, 1.5]
+
+
+def _stepping(R_ave, step=.001):
+    """The original search, R_t stepped up from R_ave until the offered load
+    no longer exceeds it, here with threshold 0 instead of .1"""
+    R_t = R_ave+step
+    while nbiotCoverage.calcR_tResidual(R_t, R_ave) > 0:
+        R_t += step
+    return R_t
+
+
+@pytest.mark.parametrize('R_ave', R_AVES)
+def test_solverMatchesStepping(R_ave):
+    solution = nbiotCoverage.solveR_t(R_ave)
+    assert solution['converged']
+    stepped = _stepping(R_ave)
+    assert stepped-.001-1e-9 <= solution['R_t'] <= stepped
+    # below one arrival per RAO there may be no retries, R_t is R_ave then
+    assert abs(solution['residual']) < 1e-9 or (solution['R_t'] == R_ave and solution['residual'] < 0)
+
+
+def test_curveMatchesSolver():
+    curve = nbiotCoverage.solveR_tCurve(R_AVES[::-1])
+    assert np.all(curve['converged'])
+    for i, R_ave in enumerate(R_AVES[::-1]):
+        solution = nbiotCoverage.solveR_t(R_ave)
+        assert curve['R_t'][i] == pytest.approx(solution['R_t'], rel=1e-9)
+        assert curve['P_out'][i] == pytest.approx(solution['P_out'], rel=1e-6, abs=1e-15)
+
+
+def test_overloadIsNotConverged():
+    # the queueing probabilities are not finite beyond the channel capacity
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        assert not nbiotCoverage.solveR_t(1e9)['converged']
+        assert not nbiotCoverage.solveR_tCurve([1e9])['converged'][0]
@@ -0,0 +1,39 @@
+# NBIoTBatchModel against NBIoTEnergyModel
+
+# import libraries
+import numpy as np
+import pytest
+
+from NBIoTEnergyModel.nbiotbatch import NBIoTBatchModel
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+from test_nbiotenergymodel import GRID
+
+
+@pytest.mark.parametrize('trueDivision', [False, True])
+def test_batchMatchesScalar(trueDivision):
+    columns = dict((name, np.array([point[name] for point in GRID])) for name in GRID[0])
+    results = NBIoTBatchModel(trueDivision=trueDivision, **columns).evaluate()
+    for i, point in enumerate(GRID):
+        model = NBIoTEnergyModel(trueDivision=trueDivision, **point)
+        assert results['lifetime'][i] == pytest.approx(model.calcLifetime(), rel=1e-10)
+        assert results['energyperBit'][i] == pytest.approx(model.calcEnergyperBit(), rel=1e-10)
+        assert results['energyperPacket'][i] == pytest.approx(model.calcEnergyperPacket(), rel=1e-10)
+
+
+def test_broadcastShapeAndProfile():
+    profile = 'alt1'
+    batch = NBIoTBatchModel(pl=np.array([20, 200])[:, None], t_notif=np.logspace(4, 8, 5), profile=profile)
+    lifetime = batch.calcLifetime()
+    assert lifetime.shape == (2, 5)
+    model = NBIoTEnergyModel(pl=200, t_notif=1e6, profile=profile)
+    assert lifetime[1, 2] == pytest.approx(model.calcLifetime(), rel=1e-10)
+
+
+def test_complexStepDerivative():
+    # the sensitivity API differentiates the batch model with a complex step
+    t_notif, step = 600000.0, 1e-20
+    derivative = NBIoTBatchModel(pl=20, t_notif=t_notif+1j*step).calcLifetime().imag/step
+    h = t_notif*1e-6
+    difference = (NBIoTBatchModel(pl=20, t_notif=t_notif+h).calcLifetime()
+                  - NBIoTBatchModel(pl=20, t_notif=t_notif-h).calcLifetime())/(2*h)
+    assert derivative == pytest.approx(difference, rel=1e-6)
@@ -0,0 +1,41 @@
+# NBIoTEnergyModel closed form against its reference loops and the original model
+
+# import libraries
+import pytest
+
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+GRID = [dict(pl=pl, t_notif=t_notif, p_c=p_c, p_e=p_e)
+        for pl in (1, 100, 242) for t_notif in (1e4, 1e6, 1e8) for p_c in (0, .1) for p_e in (0, .05)]
+
+# lifetimes (years) of the original model, which divides the message sizes
+# and the backoff counter to the floor, and with trueDivision=True
+LIFETIMES = [(dict(pl=20, t_notif=60000, p_c=.5, p_e=.2), 1.298491457195636, 1.288899675002376),
+             (dict(pl=200, t_notif=3.6e6, p_c=.3, p_e=0), 66.20666132350355, 66.01297869911404),
+             (dict(pl=35, t_notif=60000, p_c=.3), 1.3633294029451808, 1.3589815973135049),
+             (dict(pl=1, t_notif=1e4), 0.09688998716617447, 0.09684430299366624)]
+
+
+@pytest.mark.parametrize('kwargs', GRID)
+@pytest.mark.parametrize('trueDivision', [False, True])
+def test_closedFormMatchesReference(kwargs, trueDivision):
+    model = NBIoTEnergyModel(trueDivision=trueDivision, **kwargs)
+    reference = NBIoTEnergyModel(reference=True, trueDivision=trueDivision, **kwargs)
+    assert model.calcLifetime() == pytest.approx(reference.calcLifetime(), rel=1e-8)
+    assert model.calcEnergyperBit() == pytest.approx(reference.calcEnergyperBit(), rel=1e-8)
+
+
+@pytest.mark.parametrize('kwargs, original, trueDivision', LIFETIMES)
+def test_lifetimeBeforeAndAfterTrueDivision(kwargs, original, trueDivision):
+    # the reference loops reproduce the original model bit for bit
+    assert NBIoTEnergyModel(reference=True, **kwargs).calcLifetime() == original
+    assert NBIoTEnergyModel(**kwargs).calcLifetime() == pytest.approx(original, rel=1e-9)
+    assert NBIoTEnergyModel(trueDivision=True, **kwargs).calcLifetime() == pytest.approx(trueDivision, rel=1e-9)
+
+
+def test_payloadTypeDoesNotChangeDivision():
+    for trueDivision in (False, True):
+        model = NBIoTEnergyModel(pl=35, t_notif=60000, p_c=.3, trueDivision=trueDivision)
+        floating = NBIoTEnergyModel(pl=35.0, t_notif=60000, p_c=.3, trueDivision=trueDivision)
+        assert floating.calcLifetime() == model.calcLifetime()
@@ -0,0 +1,47 @@
+# NotificationSummary against models built for every notification period
+
+# import libraries
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.lorawanbatch import LoRaWANBatchModel
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+
+
+T_NOTIFS = [1e4, 6e4, 6e5, 3.6e6, 8.64e7, 1e8]
+
+
+@pytest.mark.parametrize('kwargs', [dict(dr=5, pl=20, p_c=.01), dict(dr=0, pl=51, p_c=.3),
+                                    dict(dr=3, pl=100, ackmode=0), dict(dr=6, pl=242, profile='alt1')])
+def test_summaryMatchesFreshModels(kwargs):
+    summary = LoRaWANEnergyModel(expectedAckTO=True, t_notif=600000, **kwargs).calcNotificationSummary()
+    lifetime = summary.calcLifetime(T_NOTIFS)
+    energyperBit = summary.calcEnergyperBit(T_NOTIFS)
+    aveCurrent = summary.calcAveCurrent(T_NOTIFS)
+    for i, t_notif in enumerate(T_NOTIFS):
+        model = LoRaWANEnergyModel(expectedAckTO=True, t_notif=t_notif, **kwargs)
+        assert lifetime[i] == pytest.approx(model.calcLifetime(), rel=1e-10)
+        assert energyperBit[i] == pytest.approx(model.calcEnergyperBit(), rel=1e-10)
+        assert aveCurrent[i] == pytest.approx(model.calcAveCurrentandTime()[0], rel=1e-10)
+
+
+def test_batchSummaryMatchesBatchModels():
+    dr = np.arange(6)[:, None]
+    summary = LoRaWANBatchModel(dr=dr, pl=20, p_c=.05, t_notif=600000).calcNotificationSummary()
+    fresh = LoRaWANBatchModel(dr=dr, pl=20, p_c=.05, t_notif=np.array(T_NOTIFS))
+    np.testing.assert_allclose(summary.calcLifetime(T_NOTIFS), fresh.calcLifetime(), rtol=1e-10)
+    np.testing.assert_allclose(summary.calcEnergyperBit(T_NOTIFS), fresh.calcEnergyperBit(), rtol=1e-10)
+
+
+def test_saturatedPeriods():
+    model = LoRaWANEnergyModel(dr=0, pl=51, p_c=.3, expectedAckTO=True)
+    summary = model.calcNotificationSummary()
+    short = summary.T_active/2
+    assert summary.isSaturated(short)
+    assert np.isnan(summary.calcLifetime(short))
+    assert summary.calcAveCurrent(short, 'busy') == pytest.approx(summary.Q_active/summary.T_active, rel=1e-12)
+    # extrapolate is what the model returns for such a period
+    model.T_notif = short
+    assert summary.calcLifetime(short, 'extrapolate') == pytest.approx(model.calcLifetime(), rel=1e-10)
+    with pytest.raises(AssertionError):
+        summary.calcLifetime(short, 'clip')
@@ -0,0 +1,54 @@
+# RASimulator against the analytic preamble collision probability
+
+# import libraries
+import math
+
+import numpy as np
+import pytest
+
+from NBIoTEnergyModel import nbiotCoverage
+from NBIoTEnergyModel.rasimulator import RASimulator
+
+
+def _poissonP_c(sim, R_t):
+    # a tagged attempt shares its RAO with Poisson(R_t*T_RAO) others, each
+    # on its preamble with probability 1/numofPreambles
+    return -math.expm1(-R_t*sim.T_RAO/sim.profile.numofPreambles)
+
+
+def test_lowLoadMatchesPoissonP_c():
+    sim = RASimulator(numofDevices=500000, t_notif=1000000, seed=1)
+    results = sim.run(200000)
+    P_c = _poissonP_c(sim, results['R_t'])
+    sigma = math.sqrt(P_c*(1-P_c)/results['attempts'])
+    assert abs(results['P_c'] - P_c) < 4*sigma
+    # few retries at this load, the RA load is the arrival rate
+    assert results['R_t'] == pytest.approx(sim.R_ave, rel=.1)
+    # the grants of a RAO are rarely all taken
+    assert results['P_e'] < 1e-3
+
+
+def test_highLoadMatchesCoverageModel():
+    sim = RASimulator(numofDevices=2000000, t_notif=1000000, seed=1)
+    results = sim.run(100000)
+    # the retries are not Poisson, the analytic values hold to a few percent
+    assert results['P_c'] == pytest.approx(_poissonP_c(sim, results['R_t']), rel=.03)
+    assert results['P_c'] == pytest.approx(nbiotCoverage.calcP_c(results['R_t']), rel=.05)
+    assert results['R_t'] > sim.R_ave
+
+
+def test_grantErrors():
+    sim = RASimulator(numofDevices=100000, t_notif=1000000, p_err=.2, seed=2)
+    results = sim.run(200000)
+    sigma = math.sqrt(.2*.8/(results['attempts']*(1-results['P_c'])))
+    assert abs(results['P_e'] - .2) < 4*sigma
+    # an arrival is in outage after N_maxRAtry retries all failed
+    assert results['P_out'] < 1e-3
+    assert np.sum(results['deviceEnergy']) == pytest.approx(results['energyperArrival']*results['arrivals'], rel=1e-9)
+
+
+def test_seedReproducesResults():
+    first = RASimulator(numofDevices=100000, seed=3).run(50000)
+    second = RASimulator(numofDevices=100000, seed=3).run(50000)
+    assert first['P_c'] == second['P_c']
+    assert np.array_equal(first['deviceEnergy'], second['deviceEnergy'])
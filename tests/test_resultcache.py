@@ -0,0 +1,66 @@
+# ResultCache chunks against the evaluators of sweep.py and changed chip profiles
+
+# import libraries
+import numpy as np
+import pytest
+
+import resultcache
+import sweep
+from LoRaWANEnergyModel import chipprofile
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = resultcache.ResultCache(str(tmpdir.join('cache.sqlite')), maxEntries=3)
+    yield cache
+    cache.close()
+
+
+def test_profileChangeInvalidatesCache(cache):
+    params = {'dr': np.array([0, 5]), 'pl': 20, 't_notif': 600000}
+    default = cache.evaluate('LoRaWANEnergyModel', params, ['lifetime'])
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert np.array_equal(cache.evaluate('LoRaWANEnergyModel', params, ['lifetime'])['lifetime'], default['lifetime'])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # an equal profile hits, a changed one evaluates again
+    params['profile'] = chipprofile.get('default').replace()
+    cache.evaluate('LoRaWANEnergyModel', params, ['lifetime'])
+    assert (cache.hits, cache.misses) == (2, 1)
+    params['profile'] = chipprofile.get('default').replace(battery=1200)
+    halved = cache.evaluate('LoRaWANEnergyModel', params, ['lifetime'])
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert np.allclose(halved['lifetime'], default['lifetime']/2, rtol=1e-12)
+
+
+@pytest.mark.parametrize('model, params', [
+    ('NBIoTEnergyModel', {'pl': np.array([[20], [200]]), 't_notif': np.logspace(4, 8, 5), 'p_c': .1}),
+    ('LoRaWANEnergyModel', {'dr': np.arange(6), 'pl': 20, 't_notif': 600000.0, 'ackmode': 0})])
+def test_chunksMatchEvaluator(cache, model, params):
+    expected = sweep.MODELS[model][0](dict(params), sweep.MODELS[model][1])
+    for _ in range(2):
+        columns = cache.evaluate(model, params)
+        assert sorted(columns) == sorted(expected)
+        for metric in expected:
+            assert np.array_equal(columns[metric], np.broadcast_to(expected[metric], columns[metric].shape))
+            assert columns[metric].shape == np.broadcast(*[np.asarray(value) for value in params.values()]).shape
+    assert (cache.hits, cache.misses) == (1, 1)
+    # an integral parameter given as floats is the same chunk
+    floats = dict(params, pl=np.asarray(params['pl'], float))
+    cache.evaluate(model, floats)
+    assert cache.hits == 2
+
+
+def test_sweepRerunHitsAndEviction(cache, tmpdir):
+    spec = {'model': 'NBIoTEnergyModel', 'axes': [('t_notif', list(np.logspace(4, 8, 10)))], 'fixed': {'pl': 20}}
+    sweep.Sweep(spec, str(tmpdir.join('first')), chunkSize=4, processes=1, cache=cache).run()
+    assert (cache.hits, cache.misses) == (0, 3)
+    sweep.Sweep(spec, str(tmpdir.join('second')), chunkSize=4, processes=1, cache=cache).run()
+    assert (cache.hits, cache.misses) == (3, 3)
+    first, second = sweep.loadSweep(str(tmpdir.join('first'))), sweep.loadSweep(str(tmpdir.join('second')))
+    assert np.array_equal(first['lifetime'], second['lifetime'])
+
+    # other chunks of the grid are new entries beyond maxEntries
+    sweep.Sweep(spec, str(tmpdir.join('third')), chunkSize=5, processes=1, cache=cache).run()
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['evictions'] == 2
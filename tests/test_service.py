@@ -0,0 +1,106 @@
+# EvaluationService against the scalar models, its cache, and the HTTP server
+
+# import libraries
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import service
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel import nbiotCoverage
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+
+
+def test_parseQueryFillsDefaults():
+    technology, arguments = service.parseQuery({'technology': 'NBIoT', 'pl': '35', 'id': 'x'})
+    assert technology == 'nbiot'
+    assert arguments == {'pl': 35, 't_notif': 1000000, 'p_c': 0, 'p_e': 0}
+    assert isinstance(arguments['pl'], int)
+    # equal queries after the defaults are filled in are equal
+    assert service.parseQuery({'technology': 'lorawan', 'dr': 3}) == service.parseQuery({'technology': 'lorawan'})
+    assert service.parseQuery({'technology': 'coverage', 'r_ave': '2'}) == ('coverage', {'r_ave': 2.0})
+
+
+@pytest.mark.parametrize('query, reason', [([1, 2], 'not a JSON object'),
+                                           ({'technology': 'zigbee'}, "unknown technology 'zigbee'"),
+                                           ({'technology': 'nbiot', 'pl': 35.5}, 'pl must be an integer, got 35.5'),
+                                           ({'technology': 'lorawan', 'dr': 0, 'pl': 52}, 'max PL bytes 51 at DR 0'),
+                                           ({'technology': 'coverage'}, 'r_ave is not a number: None'),
+                                           ({'technology': 'coverage', 'r_ave': 0}, 'r_ave must be positive')])
+def test_parseQueryErrors(query, reason):
+    with pytest.raises(ValueError) as error:
+        service.parseQuery(query)
+    assert str(error.value) == reason
+
+
+def test_resultsMatchScalarModels():
+    queries = [{'technology': 'lorawan', 'dr': 5, 'pl': 20, 't_notif': 600000, 'id': 1},
+               {'technology': 'nbiot', 'pl': 35, 't_notif': 60000, 'p_c': .3},
+               {'technology': 'lorawan', 'dr': 0, 'pl': 51, 'p_c': .1, 'ackmode': 0},
+               {'technology': 'coverage', 'r_ave': 2.0},
+               {'technology': 'nbiot', 'pl': 'abc'}]
+    results = service.EvaluationService().evaluate(queries)
+    models = [LoRaWANEnergyModel(dr=5, pl=20, t_notif=600000, expectedAckTO=True),
+              NBIoTEnergyModel(pl=35, t_notif=60000, p_c=.3),
+              LoRaWANEnergyModel(dr=0, pl=51, p_c=.1, ackmode=0, expectedAckTO=True)]
+    for result, model in zip(results, models):
+        assert result['lifetime'] == pytest.approx(model.calcLifetime(), rel=1e-10)
+        assert result['energyperBit'] == pytest.approx(model.calcEnergyperBit(), rel=1e-10)
+    assert results[0]['id'] == 1
+    assert results[0]['capacity'] == pytest.approx(models[0].calcAlohaCapcity(), rel=1e-10)
+    coverage = nbiotCoverage.solveR_tCurve([2.0])
+    for metric in service.METRICS['coverage']:
+        assert results[3][metric] == coverage[metric][0]
+    assert results[4] == {'error': "pl is not a number: 'abc'"}
+
+
+def test_nonFiniteMetricsAreNull():
+    # beyond the channel capacity the RA load has no finite outage probability
+    with np.errstate(invalid='ignore'):
+        result = service.EvaluationService().evaluate([{'technology': 'coverage', 'r_ave': 1000.0}])[0]
+    assert result['P_out'] is None
+    assert result['converged'] is False
+    json.dumps(result, allow_nan=False)
+    assert service._jsonValue(np.float64(np.inf)) is None
+    assert service._jsonValue(np.int64(3)) == 3
+
+
+def test_cacheAndSharedEvaluation():
+    evaluator = service.EvaluationService()
+    query = {'technology': 'nbiot', 'pl': 100}
+    # an equal query with the defaults spelled out is evaluated once
+    first = evaluator.evaluate([query, dict(query, t_notif=1000000, id='b')])
+    assert first[1] == dict(first[0], id='b')
+    assert evaluator.counts['evaluated'] == 1
+    assert evaluator.evaluate([query]) == first[:1]
+    metrics = evaluator.metrics()
+    assert (metrics['hits'], metrics['evaluated'], metrics['batches'], metrics['cacheEntries']) == (1, 1, 1, 1)
+
+
+def test_cacheEvictsLeastRecentlyUsed():
+    cache = service.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_serverAnswersQueries():
+    evaluator = service.EvaluationService(window=.001)
+    server = service.EvaluationServer(('127.0.0.1', 0), evaluator)
+    thread = threading.Thread(target=server.serve_forever, args=(.01,))
+    thread.start()
+    try:
+        client = service.ServiceClient(*server.server_address)
+        single = client.evaluate({'technology': 'nbiot', 'pl': 35, 'id': 'x'})
+        assert single == dict(evaluator.evaluate([{'technology': 'nbiot', 'pl': 35}])[0], id='x')
+        assert client.evaluate([{'technology': 'nbiot', 'pl': 35.5}]) == [{'error': 'pl must be an integer, got 35.5'}]
+        assert client.metrics()['requests'] == 3
+        client.close()
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
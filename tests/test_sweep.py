@@ -0,0 +1,87 @@
+# Sweep chunks against the scalar models, and resuming an interrupted sweep
+
+# import libraries
+import json
+import os
+
+import numpy as np
+import pytest
+
+from LoRaWANEnergyModel.lorawanenergymodel import LoRaWANEnergyModel
+from NBIoTEnergyModel import chipprofile as nbiotProfile
+from NBIoTEnergyModel.nbiotenergymodel import NBIoTEnergyModel
+import sweep
+
+
+NBIOT_SPEC = {'model': 'NBIoTEnergyModel',
+              'axes': [('pl', [20, 105, 200]), ('t_notif', [60000, 600000, 6000000])],
+              'fixed': {'p_c': .1},
+              'metrics': ['lifetime', 'energyperBit']}
+
+
+def _scalarNBIoT(columns, **kwargs):
+    for i in range(len(columns['index'])):
+        nbiot = NBIoTEnergyModel(pl=int(columns['pl'][i]), t_notif=int(columns['t_notif'][i]), **kwargs)
+        assert columns['lifetime'][i] == pytest.approx(nbiot.calcLifetime(), rel=1e-9)
+        assert columns['energyperBit'][i] == pytest.approx(nbiot.calcEnergyperBit(), rel=1e-9)
+
+
+def test_nbiotChunksMatchScalarModel(tmpdir):
+    outdir = str(tmpdir.join('nbiot'))
+    sweep.Sweep(NBIOT_SPEC, outdir, chunkSize=4, processes=1).run()
+    columns = sweep.loadSweep(outdir)
+    assert sorted(columns['index']) == range(9)
+    _scalarNBIoT(columns, p_c=.1)
+
+
+def test_lorawanChunksMatchScalarModel(tmpdir):
+    spec = {'model': 'LoRaWANEnergyModel', 'product': 'zip',
+            'axes': [('dr', [0, 3, 5]), ('t_notif', [60000, 600000, 6000000])],
+            'fixed': {'pl': 20, 'ackmode': 0}, 'metrics': ['lifetime']}
+    outdir = str(tmpdir.join('lorawan'))
+    sweep.Sweep(spec, outdir, chunkSize=2, processes=1).run()
+    columns = sweep.loadSweep(outdir)
+    for i in range(3):
+        lora = LoRaWANEnergyModel(dr=int(columns['dr'][i]), t_notif=int(columns['t_notif'][i]), pl=20, ackmode=0)
+        assert columns['lifetime'][i] == pytest.approx(lora.calcLifetime(), rel=1e-9)
+
+
+def test_resumeEvaluatesOnlyMissingChunks(tmpdir):
+    outdir = str(tmpdir.join('resume'))
+    assert sweep.Sweep(NBIOT_SPEC, outdir, chunkSize=2, processes=1).run() == 5
+    before = sweep.loadSweep(outdir)
+    # an interrupted run leaves chunks missing, and at most a temporary file
+    os.remove(os.path.join(outdir, 'chunk-000001.npz'))
+    os.remove(os.path.join(outdir, 'chunk-000003.npz'))
+    resumed = sweep.Sweep(NBIOT_SPEC, outdir, chunkSize=2, processes=1)
+    assert resumed.pendingChunks() == [1, 3]
+    assert resumed.run() == 2
+    assert resumed.run() == 0
+    after = sweep.loadSweep(outdir)
+    for name in before:
+        assert np.array_equal(after[name], before[name])
+
+
+def test_resumeRefusesOtherSettings(tmpdir):
+    outdir = str(tmpdir.join('other'))
+    sweep.Sweep(NBIOT_SPEC, outdir, chunkSize=2, processes=1).run()
+    with pytest.raises(AssertionError):
+        sweep.Sweep(NBIOT_SPEC, outdir, chunkSize=3, processes=1).run()
+    spec = dict(NBIOT_SPEC, fixed={'p_c': .1, 'profile': 'alt1'})
+    with pytest.raises(AssertionError):
+        sweep.Sweep(spec, outdir, chunkSize=2, processes=1).run()
+
+
+def test_profileObjectInSpec(tmpdir):
+    profile = nbiotProfile.get('default').replace(battery=1200)
+    spec = dict(NBIOT_SPEC, fixed={'p_c': .1, 'profile': profile})
+    outdir = str(tmpdir.join('profile'))
+    run = sweep.Sweep(spec, outdir, chunkSize=4, processes=1)
+    run.run()
+    with open(os.path.join(outdir, 'manifest.json')) as f:
+        assert json.load(f)['spec']['fixed']['profile']['battery'] == 1200
+    _scalarNBIoT(sweep.loadSweep(outdir), p_c=.1, profile=profile)
+    # the key follows the profile's values, not the object
+    assert sweep.Sweep(spec, outdir, chunkSize=4).key == run.key
+    other = dict(spec, fixed={'p_c': .1, 'profile': profile.replace(battery=1300)})
+    assert sweep.Sweep(other, outdir, chunkSize=4).key != run.key
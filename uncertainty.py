@@ -0,0 +1,186 @@
+# uncertainty propagation of the measured chip parameters through the energy models
+#
+#     distributions = {'I_trans': Uniform(83.0, 90.0),
+#                      'I_sleep': LogNormal(.0001, .5),
+#                      'T_postproc': Normal(268.0, 20.0, low=0)}
+#     result = propagate('lorawan', distributions, n=1000000, seed=1, dr=5, pl=20, t_notif=600000)
+#     print 'P10 %.2f P90 %.2f years' % (result['lifetime']['P10'], result['lifetime']['P90'])
+#
+# Any parameter sensitivity.getParameters lists can get a distribution:
+# chip profile fields and continuous constructor arguments.
+# The samples are drawn as uniform points in the unit hypercube, by Latin
+# hypercube ('lhs'), randomly shifted Halton points ('halton') or plain
+# random numbers ('random'), and mapped through the inverse CDF of each
+# distribution. They are evaluated chunk by chunk with the batch models,
+# the profile fields of a chunk are arrays along the sample axis. Only the
+# metric samples are kept, 8 bytes per sample and metric, for the exact
+# quantiles. A Latin hypercube is drawn per chunk, so every chunk is
+# stratified on its own.
+
+# import libraries
+import math
+
+import numpy as np
+
+import sensitivity
+
+
+class Uniform:
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def ppf(self, u):
+        return self.low + (self.high - self.low)*u
+
+class Normal:
+    """Normal distribution, truncated to [low, high] if they are given"""
+
+    def __init__(self, mean, sd, low=None, high=None):
+        self.mean = mean
+        self.sd = sd
+        self.lowCDF = _normalCDF((low - mean)/float(sd)) if low is not None else 0.0
+        self.highCDF = _normalCDF((high - mean)/float(sd)) if high is not None else 1.0
+
+    def ppf(self, u):
+        return self.mean + self.sd*normalPPF(self.lowCDF + (self.highCDF - self.lowCDF)*u)
+
+class LogNormal:
+    """Log-normal distribution of a median and the standard deviation sigma of its log"""
+
+    def __init__(self, median, sigma):
+        self.median = median
+        self.sigma = sigma
+
+    def ppf(self, u):
+        return self.median*np.exp(self.sigma*normalPPF(u))
+
+class Triangular:
+
+    def __init__(self, low, mode, high):
+        self.low = low
+        self.mode = mode
+        self.high = high
+
+    def ppf(self, u):
+        width = float(self.high - self.low)
+        split = (self.mode - self.low)/width
+        return np.where(u < split, self.low + np.sqrt(u*width*(self.mode - self.low)),
+                        self.high - np.sqrt((1 - u)*width*(self.high - self.mode)))
+
+
+def _normalCDF(z):
+    return .5*math.erfc(-z/math.sqrt(2))
+
+# rational approximation of the normal quantile, P. J. Acklam, relative error below 1.2e-9
+_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+      -3.066479806614716e+01, 2.506628277459239e+00)
+_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+      -1.328068155288572e+01)
+_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00,
+      4.374664141464968e+00, 2.938163982698783e+00)
+_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+
+def _polynomial(coefficients, x):
+    result = 0.0
+    for coefficient in coefficients:
+        result = result*x + coefficient
+    return result
+
+def normalPPF(u):
+    """Standard normal quantile of probabilities u in (0, 1)"""
+    u = np.asarray(u, dtype=float)
+    tail = np.minimum(u, 1 - u)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.sqrt(-2*np.log(tail))
+        z = _polynomial(_C, q)/(_polynomial(_D, q)*q + 1)
+        z = np.where(u < .5, z, -z)
+        r = (u - .5)**2
+        central = (u - .5)*_polynomial(_A, r)/(_polynomial(_B, r)*r + 1)
+    return np.where(tail >= .02425, central, z)
+
+
+def latinHypercube(n, dimensions, rng):
+    """n points of a Latin hypercube in the unit cube, shape (n, dimensions)"""
+    strata = np.argsort(rng.random_sample((dimensions, n)), axis=1).T
+    return (strata + rng.random_sample((n, dimensions)))/n
+
+_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97,
+           101, 103, 107, 109, 113)
+
+def halton(start, n, dimensions, shift):
+    """Points start to start+n of the Halton sequence, shifted by shift modulo 1"""
+    assert dimensions <= len(_PRIMES), "halton supports up to %d dimensions" % len(_PRIMES)
+    points = np.empty((n, dimensions))
+    for j, base in enumerate(_PRIMES[:dimensions]):
+        index = np.arange(start + 1, start + n + 1)
+        radicalInverse = np.zeros(n)
+        scale = 1.0/base
+        while index.any():
+            radicalInverse += scale*(index % base)
+            index //= base
+            scale /= base
+        points[:, j] = radicalInverse
+    return (points + shift) % 1.0
+
+SAMPLERS = ('lhs', 'halton', 'random')
+
+
+def propagate(model, distributions, n=100000, sampler='lhs', seed=None, quantiles=(10, 50, 90),
+              chunkSize=100000, keepSamples=False, **kwargs):
+    """Lifetime and energy per bit distributions of uncertain parameters
+    Args:
+        model: 'lorawan' or 'nbiot'
+        distributions: dict of parameter name to a distribution with a ppf method
+        n: number of samples
+        sampler: 'lhs', 'halton' or 'random'
+        seed: int seed or numpy RandomState
+        quantiles: percentiles to report, as keys 'P10', 'P50', ...
+        chunkSize: samples evaluated at once
+        keepSamples: also return the metric samples
+        kwargs: scalar batch model arguments of the operating point
+    Returns:
+        dict of metric -> dict with mean, std, min, max and the quantiles
+    """
+    assert model in sensitivity.MODELS, "model must be one of %s" % ', '.join(sorted(sensitivity.MODELS))
+    assert sampler in SAMPLERS, "sampler must be one of %s" % ', '.join(SAMPLERS)
+    spec = sensitivity.MODELS[model]
+    names = sorted(distributions)
+    for name in names:
+        assert name in sensitivity.getParameters(model), "%s is not a continuous %s parameter" % (name, model)
+        assert name not in kwargs, "%s is given both a value and a distribution" % name
+    for name, value in kwargs.items():
+        assert name == 'profile' or np.ndim(value) == 0, "the operating point %s must be a scalar" % name
+    rng = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+    profile = spec['chipprofile'].get(kwargs.pop('profile', 'default'))
+    shift = rng.random_sample(len(names))
+
+    samples = dict((metric, np.empty(n)) for metric in sensitivity.METRICS)
+    for start in range(0, n, chunkSize):
+        m = min(chunkSize, n - start)
+        if sampler == 'lhs':
+            u = latinHypercube(m, len(names), rng)
+        elif sampler == 'halton':
+            u = halton(start, m, len(names), shift)
+        else:
+            u = rng.random_sample((m, len(names)))
+        values = dict((name, distributions[name].ppf(u[:, j])) for j, name in enumerate(names))
+
+        arguments = dict(kwargs)
+        arguments.update((name, values[name]) for name in names if name in spec['constructor'])
+        arguments['profile'] = profile.replace(**dict((name, values[name]) for name in names
+                                                      if name in spec['profile']))
+        batch = spec['model'](**arguments)
+        samples['lifetime'][start:start+m] = batch.calcLifetime()
+        samples['energyperBit'][start:start+m] = batch.calcEnergyperBit()
+
+    result = {}
+    for metric, values in samples.items():
+        summary = {'mean': values.mean(), 'std': values.std(), 'min': values.min(), 'max': values.max()}
+        for quantile, value in zip(quantiles, np.percentile(values, quantiles)):
+            summary['P%g' % quantile] = value
+        if keepSamples:
+            summary['samples'] = values
+        result[metric] = summary
+    return result